@@ -108,7 +108,8 @@ export async function GET(req: NextRequest) {
               0,
             ],
           },
-          attendeesCount: { $size: { $ifNull: ["$attendees", []] } },
+          // $size reads the whole array: run attendees_count.py backfill before deploying, so this is only a fallback
+          attendeesCount: { $ifNull: ["$attendees_count", { $size: { $ifNull: ["$attendees", []] } }] },
         },
       },
       { $match: { overlap: { $gte: minOverlap } } },
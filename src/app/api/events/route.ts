@@ -48,17 +48,31 @@ export async function POST(request: NextRequest) {
     const client = await clientPromise;
     const db = client.db(DB_NAME);
     
-    const updateOperation = action === "attend" 
-      ? { $addToSet: { attendees: userId } } // addToSet prevents duplicates
-      : { $pull: { attendees: userId } };
-    
+    // The filter only matches when the change is real (not yet attending / still attending),
+    // so the array and attendees_count move together in one atomic update and repeats are no-ops.
+    // The count is set from the new array rather than $inc'd, so an event the backfill
+    // (webscrapper_system/mongodb_sortingSystem/attendees_count.py) has not reached yet
+    // gets its real size instead of 1.
+    const _id = new ObjectId(eventId);
+    const attending = action === "attend";
+    const current = { $ifNull: ["$attendees", []] };
+    const next = attending
+      ? { $concatArrays: [current, [userId]] }
+      : { $filter: { input: current, cond: { $ne: ["$$this", userId] } } };
     const result = await db.collection(EVENTS_COLL).updateOne(
-      { _id: new ObjectId(eventId) },
-      updateOperation
+      attending ? { _id, attendees: { $ne: userId } } : { _id, attendees: userId },
+      [
+        { $set: { attendees: next } },
+        { $set: { attendees_count: { $size: "$attendees" } } },
+      ]
     );
     
     if (result.matchedCount === 0) {
-      return NextResponse.json({ error: "Event not found" }, { status: 404 });
+      // either already in the requested state or no such event
+      const exists = await db.collection(EVENTS_COLL).countDocuments({ _id }, { limit: 1 });
+      if (!exists) {
+        return NextResponse.json({ error: "Event not found" }, { status: 404 });
+      }
     }
     
     return NextResponse.json({ 
@@ -7,6 +7,16 @@ import { DB_NAME, USERS_COLL } from "@/lib/config";
 
 // Config
 const DEFAULT_LIMIT = 10;
+// Written by webscrapper_system/mongodb_sortingSystem/precompute_matches.py
+const MATCHES_COLL = "user_matches";
+const PRECOMPUTED_TOP_N = 50;
+
+type PrecomputedDoc = {
+  _id: ObjectId;
+  matches: { _id: ObjectId; overlap: number; jaccard: number; cosine: number }[];
+  count: number;
+  source_updatedAt?: Date | null;
+};
 
 export interface MatchDTO {
   id: string;
@@ -81,7 +91,47 @@ export async function GET(req: NextRequest) {
     if (!A.length) return NextResponse.json({ error: "user has no skills" }, { status: 400 });
     const aSize = A.length;
 
-    // 2) Aggregation pipeline
+    // 2) Precomputed neighbours: a single _id read, valid while the user's profile is unchanged
+    const pre = await db.collection<PrecomputedDoc>(MATCHES_COLL).findOne({ _id });
+    const fresh =
+      pre && (pre.source_updatedAt?.getTime?.() ?? null) === (me.updatedAt?.getTime?.() ?? null);
+    if (pre && fresh) {
+      const picked = pre.matches.filter((m) => m.overlap >= minOverlap).slice(0, limit);
+      // a full list cut at PRECOMPUTED_TOP_N may be missing rows past it; fall through then
+      if (picked.length === limit || pre.count < PRECOMPUTED_TOP_N) {
+        const docs = await users
+          .find(
+            { _id: { $in: picked.map((m) => m._id) } },
+            { projection: { password: 0 } }
+          )
+          .toArray();
+        const byId = new Map(docs.map((d) => [d._id.toString(), d]));
+        const mine = new Set(A);
+        const rows: MatchDTO[] = picked.flatMap((m) => {
+          const r = byId.get(m._id.toString());
+          if (!r) return [];
+          const skills: string[] = Array.isArray(r.skills) ? r.skills : [];
+          return [{
+            id: r._id.toString(),
+            firstname: r.firstname ?? "",
+            lastname: r.lastname ?? "",
+            email: r.email ?? "",
+            bio: r.bio ?? "",
+            photo: r.photo ?? "",
+            state: r.state ?? "",
+            industry: r.industry ?? "",
+            experienceyears: r.experienceyears ?? "",
+            overlap: m.overlap,
+            jaccard: Number(m.jaccard.toFixed(3)),
+            cosine: Number(m.cosine.toFixed(3)),
+            commonSkills: skills.filter((s) => mine.has(s)),
+          }];
+        });
+        return NextResponse.json(rows, { status: 200 });
+      }
+    }
+
+    // 3) Aggregation pipeline
     const pipeline: Document[] = [
       { $match: { _id: { $ne: _id }, skills: { $exists: true, $ne: [] } } },
       { $match: { skills: { $in: A } } },
@@ -113,7 +163,8 @@ export async function GET(req: NextRequest) {
         },
       },
       { $match: { overlap: { $gte: minOverlap } } },
-      { $sort: { overlap: -1, jaccard: -1, updatedAt: -1 } },
+      // same order as precompute_matches.py, so a stale precomputed row and the live path agree
+      { $sort: { overlap: -1, jaccard: -1, cosine: -1, updatedAt: -1 } },
       {
         $project: {
           password: 0,
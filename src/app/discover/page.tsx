@@ -37,6 +37,10 @@ function isValidMatch(x: unknown): x is MatchDTO {
 // Total number of random photos in public/images_dir (user_0002.jpg to user_0100.jpg)
 const TOTAL_RANDOM_PHOTOS = 99;
 
+// Resized copies built by webscrapper_system/usermaker/downloadImages.py (see images_dir/manifest.json)
+const PHOTO_VARIANT_SIZE = 128;
+const PHOTO_VARIANT_FORMAT = "webp";
+
 // Function to get a consistent random photo for a user
 function getRandomPhotoForUser(userId: string): string {
   let hash = 0;
@@ -47,7 +51,13 @@ function getRandomPhotoForUser(userId: string): string {
   }
   const photoNumber = (Math.abs(hash) % TOTAL_RANDOM_PHOTOS) + 2;
   const paddedNumber = photoNumber.toString().padStart(4, "0");
-  return `/images_dir/user_${paddedNumber}.jpg`;
+  return `/images_dir/variants/user_${paddedNumber}-${PHOTO_VARIANT_SIZE}.${PHOTO_VARIANT_FORMAT}`;
+}
+
+// Variant missing (not generated yet) -> original JPEG -> generic placeholder
+function fallbackPhoto(src: string): string {
+  const m = src.match(/\/images_dir\/variants\/(user_\d{4})-\d+\.\w+$/);
+  return m ? `/images_dir/${m[1]}.jpg` : "/caffeine.jpeg";
 }
 
 // Function to check if a photo URL is valid/accessible
@@ -208,7 +218,11 @@ export default function DiscoverPage() {
                   src={getPhotoForUser(current)}
                   alt={`${current.firstname} ${current.lastname}`}
                   className="h-full w-full object-cover"
-                  onError={e => { (e.currentTarget as HTMLImageElement).src = "/caffeine.jpeg"; }}
+                  onError={e => {
+                    const img = e.currentTarget as HTMLImageElement;
+                    const next = fallbackPhoto(img.getAttribute("src") || "");
+                    if (img.getAttribute("src") !== next) img.src = next;
+                  }}
                 />
                 <div className="absolute bottom-0 left-0 right-0 bg-gradient-to-t from-black/60 to-transparent p-4 text-white">
                   <h2 className="text-xl font-semibold">{current.firstname} {current.lastname}</h2>
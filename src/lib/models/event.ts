@@ -4,6 +4,7 @@ const eventSchema = new mongoose.Schema({
   id: { type: Number, required: true, unique: true },
   name: { type: String, required: true },
   time: { type: String, required: true },
+  starts_at: { type: Date, index: true },      // UTC start parsed from `time`; unset for recurring listings
   host: { type: String, required: true },
   venue: { type: String, default: "undefined" },
   address: { type: String, default: "undefined" },
@@ -12,6 +13,7 @@ const eventSchema = new mongoose.Schema({
   map_url: { type: String, default: "Map link not found" },
   tags: { type: [String], default: [] },       
   attendees: { type: [String], default: [] },  
+  attendees_count: { type: Number, default: 0 }, // = attendees.length, maintained by POST /api/events
 }, { timestamps: true });
 
 const Event = mongoose.models.Event || mongoose.model("Event", eventSchema);
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+`attendees_count` on events: the attendee tiebreak without shipping the array.
+
+The rankers only need len(attendees), but projecting `attendees` moves every
+user id of every candidate event over the wire. The app now keeps a counter
+next to the array: POST /api/events (src/app/api/events/route.ts) joins with
+a filter on `attendees: {$ne: user}` and leaves with `attendees: user`, and
+both are pipeline updates that rewrite the array and set the count to its new
+size, so the two change in the same single-document update and a repeated
+join / leave is a no-op.
+
+This migration sets the field on existing events. It is a pipeline update
+computed server-side from the current array, so a join racing the backfill
+cannot be lost, and it only touches documents whose count is missing or off.
+
+Deploy order: run `backfill` before shipping the route change. Until then
+readers still rank correctly: the pipelines use $ifNull(attendees_count,
+$size(attendees)) like events/query/route.ts, and client-side loaders pass
+their cursor through with_counts(), which looks up size(attendees) for the
+documents that lack the field, one batch at a time (no extra query once
+every event is backfilled). The join / leave update sets the counter from
+the array it just changed, so an event it touches before the backfill gets
+the right count too instead of 1 / -1.
+
+`python attendees_count.py backfill`  set attendees_count = size(attendees)
+`python attendees_count.py check`     count events whose counter disagrees
+"""
+import os
+import sys
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = os.getenv("DB_NAME", "cappuconnect")
+EVENTS_COLL = os.getenv("EVENTS_COLLECTION", "events")
+
+SIZE = {"$size": {"$ifNull": ["$attendees", []]}}
+DRIFTED = {"$expr": {"$ne": [{"$ifNull": ["$attendees_count", None]}, SIZE]}}
+# the counter, or the array size for events the backfill has not reached yet
+COUNT_EXPR = {"$ifNull": ["$attendees_count", SIZE]}
+BATCH = 1000   # documents per fallback lookup
+
+# --- helpers ---
+def fill_counts(coll, docs):
+    """set attendees_count = size(attendees) on the docs that lack it, one query for all of them"""
+    missing = [d["_id"] for d in docs if d.get("attendees_count") is None]
+    if missing:
+        pipeline = [{"$match": {"_id": {"$in": missing}}}, {"$project": {"n": SIZE}}]
+        sizes = {d["_id"]: d["n"] for d in coll.aggregate(pipeline)}
+        for d in docs:
+            if d.get("attendees_count") is None:
+                d["attendees_count"] = sizes.get(d["_id"], 0)
+    return docs
+
+def with_counts(coll, docs, batch=BATCH):
+    """yield docs (projected without `attendees`) with attendees_count always set"""
+    buf = []
+    for d in docs:
+        buf.append(d)
+        if len(buf) >= batch:
+            yield from fill_counts(coll, buf)
+            buf = []
+    yield from fill_counts(coll, buf)
+
+# --- jobs ---
+def backfill(coll):
+    res = coll.update_many(DRIFTED, [{"$set": {"attendees_count": SIZE}}])
+    print(f"✅ attendees_count set on {res.modified_count} events")
+    return res.modified_count
+
+def check(coll):
+    bad = coll.count_documents(DRIFTED)
+    print(f"{'✅' if not bad else '❌'} {bad} events with a missing or stale attendees_count")
+    return bad
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "backfill"
+    coll = MongoClient(MONGODB_URI)[DB_NAME][EVENTS_COLL]
+    if cmd == "check":
+        check(coll)
+    elif cmd == "backfill":
+        backfill(coll)
+    else:
+        print("usage: python attendees_count.py backfill|check")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Batch event recommendations for every user -> `user_event_recs`.
+
+sort_events.py ranks events for one USER_ID per run. This loads the events
+collection once, packs every event's canonical tag ids (vocab.py) into a
+uint64 bit matrix and places it, with the tiebreak columns, in
+multiprocessing shared memory. Worker processes attach to those blocks
+instead of receiving pickled copies, score batches of users with popcounts,
+and bulk-write each user's top K with their own MongoClient:
+
+    {_id: <user _id>, events: [{_id, id, overlap, jaccard, cosine}, ...],
+     count, computedAt}
+
+Ordering and time window are the ones sort_events.py uses
+(overlap, jaccard, cosine, attendees count, soonest start, id). A completed
+run also drops the recs of users it did not write (deleted, or left with no
+known skills), i.e. every doc computed before the run started.
+
+`python batch_events.py [WORKERS]`
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient, ReplaceOne
+from dotenv import load_dotenv
+
+from attendees_count import with_counts
+from event_time import window_filter
+from sort_events import starts_key
+from skill_bits import SkillBits, popcount
+from vocab import get_vocab
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = os.getenv("DB_NAME", "cappuconnect")
+USERS_COLL  = "users_tag_spam"
+EVENTS_COLL = "events"
+RECS_COLL   = "user_event_recs"
+
+TOP_K       = 50
+MIN_OVERLAP = 1
+WORKERS     = os.cpu_count() or 1
+CHUNK       = 2000   # users per task
+BATCH       = 1000   # bulk_write batch size
+WINDOW_DAYS = 14     # only events starting in the next N days (+ undated); None = every event
+
+# --- helpers ---
+def viewer_ids(vocab, u):
+    """canonical term ids for a user from `skills`, same as sort_events.viewer_terms"""
+    return vocab.encode(u.get("skills", []))
+
+def load_events(events, vocab, window_days=None, now=None):
+    """packed tag bits + per-event columns, in collection order (events with no known tags skipped)"""
+    sb = SkillBits(vocab=vocab.terms)
+    window_days = WINDOW_DAYS if window_days is None else window_days  # read at call time, not import
+    q = window_filter(now, window_days) if window_days is not None else {}
+    oids, attendees, starts, ids, rows = [], [], [], [], []
+    proj = {"tags": 1, "tag_ids": 1, "attendees_count": 1, "id": 1, "starts_at": 1}
+    for ev in with_counts(events, events.find(q, proj)):
+        terms = ev.get("tag_ids") or vocab.encode(ev.get("tags", []))
+        if not terms:
+            continue
+        rows.append(sb.pack(vocab.decode(terms)))
+        oids.append(np.frombuffer(ev["_id"].binary, dtype=np.uint8))
+        attendees.append(ev["attendees_count"])
+        starts.append(starts_key(ev.get("starts_at")))
+        ids.append(ev.get("id") or 0)
+    bits = np.vstack(rows) if rows else np.zeros((0, sb.words), dtype=np.uint64)
+    starts = np.array(starts, dtype=np.float64).reshape(-1, 2)
+    return {
+        "bits": bits,
+        "sizes": popcount(bits),
+        "attendees": np.array(attendees, dtype=np.int64),
+        "dated": starts[:, 0].copy(),
+        "soon": starts[:, 1].copy(),
+        "ids": np.array(ids, dtype=np.int64),
+        "oids": np.vstack(oids) if oids else np.zeros((0, 12), dtype=np.uint8),
+    }
+
+def share(arrays):
+    """copy each array into its own shared-memory block; returns (blocks, specs for attach)"""
+    blocks, specs = [], {}
+    for name, arr in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        blocks.append(shm)
+        specs[name] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, specs
+
+def attach(specs):
+    """read-only numpy views over the parent's blocks (the handles must outlive the views)"""
+    blocks, arrays = [], {}
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        arr.flags.writeable = False
+        blocks.append(shm)
+        arrays[name] = arr
+    return blocks, arrays
+
+
+class EventScorer:
+    """ranks the shared event matrix for one viewer at a time"""
+    def __init__(self, arrays):
+        self.bits = arrays["bits"]
+        self.sizes = arrays["sizes"]
+        self.attendees = arrays["attendees"]
+        self.dated = arrays["dated"]
+        self.soon = arrays["soon"]
+        self.ids = arrays["ids"]
+        self.oids = arrays["oids"]
+
+    def pack(self, term_ids):
+        v = np.zeros(self.bits.shape[1], dtype=np.uint64)
+        for t in term_ids:
+            w = t // 64
+            if w < len(v):  # terms added to the vocabulary after the events were loaded match nothing
+                v[w] |= np.uint64(1) << np.uint64(t % 64)
+        return v
+
+    def top(self, term_ids, k=TOP_K):
+        """(rows, overlap, jaccard, cosine) best first, sort_events.py order"""
+        a = len(term_ids)
+        overlap = popcount(self.bits & self.pack(term_ids))
+        rows = np.nonzero(overlap >= MIN_OVERLAP)[0]
+        o = overlap[rows]
+        b = self.sizes[rows]
+        jac = o / (a + b - o)
+        cos = o / np.sqrt(a * b)
+        # lexsort is stable and the last key is primary; negate for descending
+        order = np.lexsort((-self.ids[rows], -self.soon[rows], -self.dated[rows],
+                            -self.attendees[rows], -cos, -jac, -o))[:k]
+        return rows[order], o[order], jac[order], cos[order]
+
+    def recs_doc(self, uid, term_ids, now, k=TOP_K):
+        rows, o, j, c = self.top(term_ids, k)
+        events = [
+            {"_id": ObjectId(self.oids[r].tobytes()), "id": int(self.ids[r]),
+             "overlap": int(ov), "jaccard": float(jv), "cosine": float(cv)}
+            for r, ov, jv, cv in zip(rows.tolist(), o.tolist(), j.tolist(), c.tolist())
+        ]
+        return {"_id": uid, "events": events, "count": len(events), "computedAt": now}
+
+# --- worker side ---
+_blocks = None
+_scorer = None
+_recs = None
+
+def init_worker(specs, uri, db_name):
+    global _blocks, _scorer, _recs
+    _blocks, arrays = attach(specs)
+    _scorer = EventScorer(arrays)
+    _recs = MongoClient(uri)[db_name][RECS_COLL]  # one client per process (not fork-safe to share)
+
+def score_chunk(users):
+    """users: [(_id, term ids)] -> number of rec docs written"""
+    now = datetime.now(timezone.utc)
+    ops = []
+    for uid, term_ids in users:
+        doc = _scorer.recs_doc(uid, term_ids, now)
+        ops.append(ReplaceOne({"_id": uid}, doc, upsert=True))
+        if len(ops) >= BATCH:
+            _recs.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        _recs.bulk_write(ops, ordered=False)
+    return len(users)
+
+# --- jobs ---
+def user_chunks(users, vocab, size=CHUNK):
+    chunk = []
+    for u in users.find({"skills": {"$exists": True, "$ne": []}}, {"skills": 1}):
+        term_ids = viewer_ids(vocab, u)
+        if term_ids:
+            chunk.append((u["_id"], term_ids))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run(db, uri, workers=WORKERS):
+    vocab = get_vocab()
+    started = datetime.now(timezone.utc)
+    started = started.replace(microsecond=started.microsecond // 1000 * 1000)  # BSON dates are ms
+    t0 = time.perf_counter()
+    arrays = load_events(db[EVENTS_COLL], vocab)
+    blocks, specs = share(arrays)
+    t1 = time.perf_counter()
+    print(f"Loaded {len(arrays['ids'])} events ({arrays['bits'].nbytes / 1024:.0f} KiB of tag bits) "
+          f"in {t1 - t0:.2f}s; {workers} workers")
+
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(specs, uri, db.name)) as pool:
+            # bounded in-flight window so the user cursor isn't drained into memory up front
+            pending = set()
+            for chunk in user_chunks(db[USERS_COLL], vocab):
+                pending.add(pool.submit(score_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    finished = next(as_completed(pending))
+                    pending.remove(finished)
+                    done += finished.result()
+            for f in as_completed(pending):
+                done += f.result()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    # every live user with known skills was just rewritten; anything older belongs to a deleted user
+    stale = db[RECS_COLL].delete_many({"computedAt": {"$lt": started}}).deleted_count
+    db[RECS_COLL].create_index("events._id")
+    t2 = time.perf_counter()
+    print(f"✅ {done} users | {stale} stale recs dropped | {t2 - t1:.2f}s | {done / max(t2 - t1, 1e-9):.0f} users/s")
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS
+    run(MongoClient(MONGODB_URI)[DB_NAME], MONGODB_URI, workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the matching paths.
+
+Loads seeded synthetic data (synthetic.py) into a local mongod
+($BENCH_MONGODB_URI, database cappuconnect_bench) or, with --mock, into
+mongomock, then times each path for a fixed sample of viewers:
+
+    users_scan / users_index / users_bits / users_lsh   sorting.py matchers
+    users_partition                                     per-state shards (sharding.py)
+    users_idf / users_idf_full                          idf_scoring.py, MaxScore vs exhaustive
+    events_client / events_server                       sort_events.py rankers
+    events_batch                                        batch_events.py scorer
+
+Each path runs in a fresh process so peak RSS is its own. Setup (building
+an index, loading a matrix) is timed separately from the per-viewer
+queries. Per path we report setup time, p50/p99 query latency, queries/s
+and peak RSS; --json writes them out and --baseline diffs against an
+earlier file, so regressions show up as numbers.
+
+    python benchmark.py --scale 100k
+    python benchmark.py --scale 1k --mock --paths users_bits,events_server
+    python benchmark.py --scale 100k --json today.json --baseline last_week.json
+"""
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+import synthetic
+
+SCALES = {               # users, events
+    "1k":   (1_000, 1_000),
+    "10k":  (10_000, 5_000),
+    "100k": (100_000, 10_000),
+    "1m":   (1_000_000, 50_000),
+}
+PATHS = ["users_scan", "users_index", "users_bits", "users_lsh", "users_partition",
+         "users_idf", "users_idf_full", "events_client", "events_server", "events_batch"]
+QUERIES = 50
+SEED    = synthetic.SEED
+
+# --- helpers ---
+def peak_rss_mb():
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / (1024 * 1024) if sys.platform == "darwin" else r / 1024  # bytes on macOS, KiB elsewhere
+
+def open_db(mock, n_users, n_events, seed):
+    """bench database; under --mock every process regenerates the same seeded data"""
+    if mock:
+        import mongomock
+        db = mongomock.MongoClient()[synthetic.BENCH_DB]
+        synthetic.load(db, n_users, n_events, seed)
+        return db
+    from pymongo import MongoClient
+    return MongoClient(synthetic.BENCH_URI)[synthetic.BENCH_DB]
+
+def viewer_ids(n_users, queries, seed):
+    picks = random.Random(seed).sample(range(n_users), min(queries, n_users))
+    return [synthetic.oid_for(1, i, seed) for i in picks]
+
+def setup_path(name, db):
+    """one-off state for a path (index, matrix...), or None"""
+    users, events = db[synthetic.USERS_COLL], db[synthetic.EVENTS_COLL]
+    if name == "users_index":
+        from skill_index import SkillIndex
+        index = SkillIndex()
+        index.build(users)
+        return index
+    if name == "users_bits":
+        from skill_bits import SkillBits
+        return SkillBits.from_collection(users)
+    if name == "users_lsh":
+        from minhash_lsh import MinHashLSH
+        return MinHashLSH.from_collection(users)
+    if name == "users_partition":
+        from sharding import PartitionedBits
+        return PartitionedBits.from_collection(users)
+    if name.startswith("users_idf"):
+        from idf_scoring import WeightedIndex, rebuild_stats
+        rebuild_stats(db)
+        return WeightedIndex.from_collection(users)
+    if name == "events_batch":
+        from batch_events import EventScorer, load_events
+        from vocab import get_vocab
+        return EventScorer(load_events(events, get_vocab(), now=synthetic.NOW))
+    return None
+
+def query_path(name, db, state, viewer):
+    """rank for one viewer doc; returns the number of result rows"""
+    import sorting
+    import sort_events
+    from ranking import top_k
+
+    users, events = db[synthetic.USERS_COLL], db[synthetic.EVENTS_COLL]
+    if name.startswith("users_"):
+        sorting.ALICE_ID = viewer["_id"]
+        A = sorting.norm_skills(viewer.get("skills", []))
+        if name.startswith("users_idf"):
+            rows, *_ = state.query(A, exclude=viewer["_id"], k=sorting.TOP_N, prune=name == "users_idf")
+            return len(rows)
+        if name == "users_scan":
+            cands = sorting.match_with_scan(users, A)
+        elif name == "users_index":
+            cands = sorting.match_with_index(users, A, index=state)
+        elif name == "users_bits":
+            cands = sorting.match_with_bits(users, A, sb=state)
+        elif name == "users_partition":
+            cands = sorting.match_with_partition(users, A, viewer, parts=state)
+        else:
+            cands = sorting.match_with_lsh(users, A, lsh=state)
+        return len(sorting.build_rows(users, A, top_k(cands, sorting.TOP_N)))
+
+    A = sort_events.viewer_terms(viewer)
+    if name == "events_batch":
+        rows, *_ = state.top(sorted(A), sort_events.LIMIT)
+        return len(rows)
+    q = sort_events.event_query(A, synthetic.NOW)
+    if name == "events_client":
+        return len(sort_events.rank_client(events, A, q))
+    return len(sort_events.rank_server(events, A, q))
+
+def run_path(name, mock, n_users, n_events, seed, queries):
+    """runs in its own process"""
+    db = open_db(mock, n_users, n_events, seed)
+    rss_base = peak_rss_mb()
+    viewers = list(db[synthetic.USERS_COLL].find(
+        {"_id": {"$in": viewer_ids(n_users, queries, seed)}},
+        {"skills": 1, "state": 1, "industry": 1},
+    ))
+
+    t0 = time.perf_counter()
+    state = setup_path(name, db)
+    setup_s = time.perf_counter() - t0
+
+    lat, rows = [], 0
+    for v in viewers:
+        t = time.perf_counter()
+        rows += query_path(name, db, state, v)
+        lat.append(time.perf_counter() - t)
+    total = sum(lat)
+    ms = np.asarray(lat) * 1000 if lat else np.zeros(1)
+    return {
+        "path": name,
+        "queries": len(lat),
+        "rows": rows,
+        "setup_s": round(setup_s, 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "qps": round(len(lat) / total, 1) if total else None,
+        "rss_base_mb": round(rss_base, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def print_table(results, baseline=None):
+    base = {r["path"]: r for r in (baseline or {}).get("results", [])}
+    print(f"\n{'path':14s} {'setup s':>8s} {'p50 ms':>9s} {'p99 ms':>9s} {'q/s':>8s} {'peak MB':>8s}")
+    for r in results:
+        line = (f"{r['path']:14s} {r['setup_s']:8.2f} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} "
+                f"{r['qps'] or 0:8.1f} {r['peak_rss_mb']:8.1f}")
+        b = base.get(r["path"])
+        if b and b.get("p50_ms"):
+            line += f"   p50 {100 * (r['p50_ms'] / b['p50_ms'] - 1):+.0f}% vs baseline"
+        print(line)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--scale", choices=SCALES, default="1k")
+    ap.add_argument("--paths", default=",".join(PATHS), help="comma-separated subset of " + ", ".join(PATHS))
+    ap.add_argument("--queries", type=int, default=QUERIES)
+    ap.add_argument("--seed", type=int, default=SEED)
+    ap.add_argument("--mock", action="store_true", help="in-memory mongomock instead of a local mongod")
+    ap.add_argument("--skip-load", action="store_true", help="reuse data already in the bench database")
+    ap.add_argument("--json", help="write results here")
+    ap.add_argument("--baseline", help="earlier --json file to compare p50 against")
+    args = ap.parse_args()
+
+    n_users, n_events = SCALES[args.scale]
+    paths = [p for p in args.paths.split(",") if p]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        print(f"❌ unknown paths: {', '.join(sorted(unknown))}")
+        return
+
+    if not args.mock and not args.skip_load:
+        t0 = time.perf_counter()
+        db = open_db(False, n_users, n_events, args.seed)
+        synthetic.load(db, n_users, n_events, args.seed)
+        print(f"✅ loaded {n_users} users + {n_events} events in {time.perf_counter() - t0:.1f}s")
+
+    results = []
+    ctx = get_context("spawn")  # fresh interpreter per path: clean peak RSS, no shared caches
+    for name in paths:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            r = pool.submit(run_path, name, args.mock, n_users, n_events, args.seed, args.queries).result()
+        results.append(r)
+        print(f"  {name}: p50 {r['p50_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.json:
+        out = {"scale": args.scale, "users": n_users, "events": n_events, "seed": args.seed,
+               "queries": args.queries, "mock": args.mock, "results": results}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
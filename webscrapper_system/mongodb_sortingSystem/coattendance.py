@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Co-attendance graph: how many events each pair of users both attend.
+
+Built in one streaming pass over `events.attendees` (user _id strings, as
+written by POST /api/events). Pairs are buffered as packed int64 keys in fixed-size
+chunks and folded into sorted (edge key, count) arrays, so memory follows the
+number of distinct edges, not the number of pairs seen. The result is a
+symmetric CSR adjacency:
+
+    users[i]            user _id string for node i
+    indptr, indices     neighbours of i are indices[indptr[i]:indptr[i + 1]]
+    counts              shared events per edge, neighbours sorted by count desc
+
+so a neighbour lookup is a slice. Memory stays bounded by two caps: events
+with more than MAX_EVENT_ATTENDEES attendees add no edges (a 2,000-person
+conference says little about who knows whom and costs 2M pairs), and each
+user keeps at most MAX_DEGREE strongest neighbours.
+
+`refresh` re-reads the attendee arrays, diffs them against what the graph
+has already counted and applies +1 / -1 edge deltas to a small pending map,
+indexed by node on both ends so a lookup merges in only its own deltas;
+the pending map is folded into the CSR once it exceeds PENDING_MAX edges.
+
+sorting.py's MATCHER = "coattend" blends it with the skill scores:
+    score = (1 - BLEND) * cosine + BLEND * log1p(shared) / log1p(max shared for the viewer)
+
+`python coattendance.py build`    full pass over events -> GRAPH_PATH
+`python coattendance.py refresh`  apply attendance changes since the last build / refresh
+`python coattendance.py info`
+"""
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = os.getenv("DB_NAME", "cappuconnect")
+EVENTS_COLL = os.getenv("EVENTS_COLLECTION", "events")
+GRAPH_PATH  = os.getenv("COATTEND_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "coattendance.npz"))
+
+MAX_EVENT_ATTENDEES = 200      # larger events add no edges
+MAX_DEGREE          = 500      # strongest neighbours kept per user
+CHUNK_PAIRS         = 1 << 20  # pairs buffered before folding
+PENDING_MAX         = 50_000   # pending edge deltas before they are folded into the CSR
+BLEND               = 0.3      # weight of co-attendance in the blended score
+
+# --- helpers ---
+def attendee_set(ev):
+    return sorted({a for a in ev.get("attendees") or [] if isinstance(a, str) and a})
+
+def fold(keys, counts, new_keys, new_counts):
+    """merge (key, count) runs, summing duplicate keys"""
+    k = np.concatenate([keys, new_keys])
+    c = np.concatenate([counts, new_counts])
+    uk, inv = np.unique(k, return_inverse=True)
+    return uk, np.bincount(inv, weights=c, minlength=len(uk)).astype(np.int64)
+
+def cap_degree(rows, cols, counts, n, max_degree):
+    """neighbours of each row sorted by count desc (then index), at most max_degree -> CSR"""
+    order = np.lexsort((cols, -counts, rows))
+    rows, cols, counts = rows[order], cols[order], counts[order]
+    starts = np.searchsorted(rows, np.arange(n))
+    rank = np.arange(len(rows)) - starts[rows]
+    keep = rank < max_degree
+    rows, cols, counts = rows[keep], cols[keep], counts[keep]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(indptr, rows + 1, 1)
+    return np.cumsum(indptr), cols.astype(np.int32), counts.astype(np.int32)
+
+
+class CoAttendance:
+    def __init__(self):
+        self.users = []                          # node -> user _id string
+        self.node = {}                           # user _id string -> node
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros(0, dtype=np.int32)
+        self.pending = {}                        # node -> {neighbour node: count delta}, both directions
+        self.n_pending = 0                       # undirected edges in `pending`
+        self.seen = {}                           # event _id string -> attendees counted
+        self.skipped_events = 0
+
+    def __len__(self):
+        return len(self.users)
+
+    def _node(self, uid):
+        i = self.node.get(uid)
+        if i is None:
+            i = self.node[uid] = len(self.users)
+            self.users.append(uid)
+        return i
+
+    # --- building ---
+    @classmethod
+    def build(cls, events, max_event=MAX_EVENT_ATTENDEES, max_degree=MAX_DEGREE, chunk=CHUNK_PAIRS):
+        g = cls()
+        keys = np.zeros(0, dtype=np.int64)
+        counts = np.zeros(0, dtype=np.int64)
+        buf = np.zeros(chunk, dtype=np.int64)
+        fill = 0
+        for ev in events.find({"attendees.0": {"$exists": True}}, {"attendees": 1}):
+            people = attendee_set(ev)
+            g.seen[str(ev["_id"])] = people
+            if len(people) > max_event:
+                g.skipped_events += 1
+                continue
+            ids = np.array([g._node(u) for u in people], dtype=np.int64)
+            a, b = np.triu_indices(len(ids), k=1)
+            lo, hi = np.minimum(ids[a], ids[b]), np.maximum(ids[a], ids[b])
+            pair = (lo << 32) | hi
+            while len(pair):
+                take = min(len(pair), chunk - fill)
+                buf[fill:fill + take] = pair[:take]
+                fill += take
+                pair = pair[take:]
+                if fill == chunk:
+                    keys, counts = fold(keys, counts, buf[:fill], np.ones(fill, dtype=np.int64))
+                    fill = 0
+        if fill:
+            keys, counts = fold(keys, counts, buf[:fill], np.ones(fill, dtype=np.int64))
+        g._set_edges(keys, counts, max_degree)
+        return g
+
+    def _set_edges(self, keys, counts, max_degree=MAX_DEGREE):
+        """undirected (lo << 32 | hi) edges -> symmetric capped CSR"""
+        lo, hi = (keys >> 32).astype(np.int64), (keys & 0xFFFFFFFF).astype(np.int64)
+        rows = np.concatenate([lo, hi])
+        cols = np.concatenate([hi, lo])
+        cnt = np.concatenate([counts, counts])
+        self.indptr, self.indices, self.counts = cap_degree(rows, cols, cnt, len(self.users), max_degree)
+
+    def _edges(self):
+        """current CSR as undirected (key, count) arrays, each edge once"""
+        n = len(self.indptr) - 1
+        rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        cols = self.indices.astype(np.int64)
+        # an edge capped away on one side still survives from the other
+        keys = (np.minimum(rows, cols) << 32) | np.maximum(rows, cols)
+        keys, first = np.unique(keys, return_index=True)
+        return keys, self.counts[first].astype(np.int64)
+
+    # --- incremental ---
+    def add_pair(self, a, b, delta):
+        if a == b:
+            return
+        row = self.pending.setdefault(a, {})
+        v = row.get(b, 0) + delta
+        self.n_pending += (v != 0) - (b in row)
+        for x, y in ((a, b), (b, a)):
+            row = self.pending.setdefault(x, {})
+            if v:
+                row[y] = v
+            else:
+                row.pop(y, None)
+                if not row:
+                    del self.pending[x]
+
+    def apply_event(self, event_id, people, max_event=MAX_EVENT_ATTENDEES):
+        """diff one event's attendee list against what was counted and queue edge deltas"""
+        old = self.seen.get(event_id, [])
+        new = sorted(set(people))
+        if old == new:
+            return 0
+        was, now = set(old), set(new)
+        old_ok, new_ok = len(old) <= max_event, len(new) <= max_event
+        changes = 0
+        if old_ok and new_ok:
+            stay = [self._node(u) for u in sorted(was & now)]
+            for u in sorted(now - was):
+                i = self._node(u)
+                for j in stay:
+                    self.add_pair(i, j, 1)
+                stay.append(i)
+                changes += 1
+            kept = [self._node(u) for u in sorted(was & now)]
+            gone = [self._node(u) for u in sorted(was - now)]
+            for k, i in enumerate(gone):
+                for j in kept + gone[k + 1:]:
+                    self.add_pair(i, j, -1)
+                changes += 1
+        else:
+            # crossing the popularity cap: remove everything the old list added, add the new one's
+            for people_, sign, ok in ((old, -1, old_ok), (new, 1, new_ok)):
+                if not ok:
+                    continue
+                ids = [self._node(u) for u in people_]
+                for x in range(len(ids)):
+                    for y in range(x + 1, len(ids)):
+                        self.add_pair(ids[x], ids[y], sign)
+            changes = len(was ^ now)
+        if new:
+            self.seen[event_id] = new
+        else:
+            self.seen.pop(event_id, None)
+        return changes
+
+    def refresh(self, events):
+        t0 = time.perf_counter()
+        changed = 0
+        live = set()
+        for ev in events.find({"attendees.0": {"$exists": True}}, {"attendees": 1}):
+            eid = str(ev["_id"])
+            live.add(eid)
+            changed += self.apply_event(eid, attendee_set(ev))
+        for eid in [e for e in self.seen if e not in live]:  # deleted events / emptied lists
+            changed += self.apply_event(eid, [])
+        if self.n_pending > PENDING_MAX:
+            self.compact()
+        print(f"✅ co-attendance refresh: {changed} attendance changes | {self.n_pending} pending edges "
+              f"in {time.perf_counter() - t0:.2f}s")
+        return changed
+
+    def compact(self, max_degree=MAX_DEGREE):
+        """fold pending deltas into the CSR"""
+        if not self.pending:
+            self._grow()
+            return
+        keys, counts = self._edges()
+        once = [((a << 32) | b, d) for a, row in self.pending.items() for b, d in row.items() if a < b]
+        pk = np.fromiter((k for k, _ in once), dtype=np.int64, count=len(once))
+        pc = np.fromiter((d for _, d in once), dtype=np.int64, count=len(once))
+        keys, counts = fold(keys, counts, pk, pc)
+        keep = counts > 0
+        self.pending, self.n_pending = {}, 0
+        self._set_edges(keys[keep], counts[keep], max_degree)
+
+    def _grow(self):
+        """nodes added since the last fold get empty CSR rows"""
+        n = len(self.users)
+        if len(self.indptr) < n + 1:
+            self.indptr = np.concatenate([self.indptr, np.full(n + 1 - len(self.indptr), self.indptr[-1])])
+
+    # --- lookups ---
+    def neighbours(self, uid, k=None):
+        """[(user _id string, shared events)] strongest first"""
+        i = self.node.get(uid)
+        if i is None:
+            return []
+        out = {}
+        if i + 1 < len(self.indptr):
+            lo, hi = self.indptr[i], self.indptr[i + 1]
+            out = dict(zip(self.indices[lo:hi].tolist(), self.counts[lo:hi].tolist()))
+        for j, d in self.pending.get(i, {}).items():
+            out[j] = out.get(j, 0) + d
+        ranked = sorted(((c, j) for j, c in out.items() if c > 0), key=lambda x: (-x[0], x[1]))
+        return [(self.users[j], c) for c, j in ranked[:k]]
+
+    # --- persistence ---
+    def save(self, path=GRAPH_PATH):
+        self.compact()
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, users=np.array(self.users, dtype=object), indptr=self.indptr, indices=self.indices,
+                 counts=self.counts, seen=np.array(json.dumps(self.seen)), skipped=self.skipped_events)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        z = np.load(path, allow_pickle=True)
+        g = cls()
+        g.users = z["users"].tolist()
+        g.node = {u: i for i, u in enumerate(g.users)}
+        g.indptr, g.indices, g.counts = z["indptr"], z["indices"], z["counts"]
+        g.seen = json.loads(str(z["seen"]))
+        g.skipped_events = int(z["skipped"])
+        return g
+
+    def info(self):
+        deg = np.diff(self.indptr)
+        return (f"{len(self.users)} users | {len(self.indices) // 2} edges | max degree "
+                f"{int(deg.max()) if len(deg) else 0} | {len(self.seen)} events counted, "
+                f"{self.skipped_events} over the attendee cap at build | {self.n_pending} pending")
+
+
+def blend_scores(graph, viewer, oids, cos, weight=BLEND):
+    """(1 - weight) * cosine + weight * normalized co-attendance, for rows identified by ObjectId"""
+    shared = dict(graph.neighbours(str(viewer)))
+    top = max(shared.values(), default=0)
+    co = np.array([math.log1p(shared.get(str(o), 0)) / math.log1p(top) if top else 0.0 for o in oids])
+    return (1 - weight) * np.asarray(cos, dtype=np.float64) + weight * co, co
+
+def neighbour_oids(graph, viewer):
+    out = []
+    for uid, _ in graph.neighbours(str(viewer)):
+        if ObjectId.is_valid(uid):
+            out.append(ObjectId(uid))
+    return out
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    events = MongoClient(MONGODB_URI)[DB_NAME][EVENTS_COLL]
+    if cmd == "info":
+        print(CoAttendance.load().info())
+        return
+    t0 = time.perf_counter()
+    if cmd == "build" or not os.path.exists(GRAPH_PATH):
+        g = CoAttendance.build(events)
+    else:
+        g = CoAttendance.load()
+        g.refresh(events)
+    g.save()
+    print(f"✅ {g.info()} ({time.perf_counter() - t0:.2f}s)")
+
+if __name__ == "__main__":
+    main()
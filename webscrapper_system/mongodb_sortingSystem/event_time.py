@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Event start times: the scraped display string -> a UTC `starts_at` datetime.
+
+The scrapers store `time` (and often `host`) as "Thu, Sep 25 · 6:00 PM EDT":
+no year, a timezone abbreviation. The year is inferred as the one closest
+to a reference date (the scrape / insert time) on which that date falls on
+the given weekday; abbreviations map to fixed UTC offsets. Recurring
+listings ("Every Tue", "Monthly") have no single start and stay undated.
+
+Rankers use `window_filter()` so past events are excluded by the query
+(index on starts_at) instead of being scanned and scored.
+
+`python event_time.py backfill`  set starts_at on existing events (reference = _id time)
+"""
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = os.getenv("DB_NAME", "cappuconnect")
+EVENTS_COLL = os.getenv("EVENTS_COLLECTION", "events")
+
+WINDOW_DAYS     = 14
+INCLUDE_UNDATED = True   # recurring listings have no start; keep them in the window
+BATCH           = 1000
+
+TZ_OFFSETS = {  # hours from UTC
+    "UTC": 0, "GMT": 0, "BST": 1, "WET": 0, "WEST": 1, "CET": 1, "CEST": 2, "EET": 2, "EEST": 3,
+    "EST": -5, "EDT": -4, "CST": -6, "CDT": -5, "MST": -7, "MDT": -6, "PST": -8, "PDT": -7,
+    "AKST": -9, "AKDT": -8, "HST": -10, "AST": -4, "ADT": -3, "NST": -3.5, "NDT": -2.5,
+    "IST": 5.5, "SGT": 8, "JST": 9, "KST": 9, "AEST": 10, "AEDT": 11, "NZST": 12, "NZDT": 13,
+}
+MONTHS   = {m: i for i, m in enumerate(["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                         "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)}
+WEEKDAYS = {d: i for i, d in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])}
+
+_TIME = re.compile(
+    r"^\s*(?:(?P<wd>[A-Z][a-z]{2}),\s*)?(?P<mon>[A-Z][a-z]{2})\s+(?P<day>\d{1,2})"
+    r"\s*·\s*(?P<h>\d{1,2}):(?P<m>\d{2})\s*(?P<ampm>AM|PM)\s*(?P<tz>[A-Z]{2,5})?\s*$"
+)
+
+# --- helpers ---
+def parse_event_time(s, ref=None):
+    """parse "Thu, Sep 25 · 6:00 PM EDT" -> aware UTC datetime, or None if not a single dated start"""
+    m = _TIME.match(s or "")
+    if not m or m["mon"] not in MONTHS:
+        return None
+    offset = TZ_OFFSETS.get(m["tz"] or "UTC")
+    if offset is None:
+        return None
+    hour = int(m["h"]) % 12 + (12 if m["ampm"] == "PM" else 0)
+    ref = ref or datetime.now(timezone.utc)
+
+    best = None
+    for year in (ref.year - 1, ref.year, ref.year + 1):
+        try:
+            local = datetime(year, MONTHS[m["mon"]], int(m["day"]), hour, int(m["m"]))
+        except ValueError:  # Feb 29 in a non-leap year, Sep 31...
+            continue
+        if m["wd"] in WEEKDAYS and local.weekday() != WEEKDAYS[m["wd"]]:
+            continue
+        utc = (local - timedelta(hours=offset)).replace(tzinfo=timezone.utc)
+        if best is None or abs(utc - ref) < abs(best - ref):
+            best = utc
+    return best
+
+def window_filter(now=None, days=WINDOW_DAYS, include_undated=INCLUDE_UNDATED):
+    """query fragment: events starting in [now, now + days), plus undated ones if asked"""
+    now = now or datetime.now(timezone.utc)
+    dated = {"starts_at": {"$gte": now, "$lt": now + timedelta(days=days)}}
+    if not include_undated:
+        return dated
+    return {"$or": [dated, {"starts_at": None}]}
+
+def ensure_indexes(coll):
+    coll.create_index("starts_at")
+
+# --- jobs ---
+def backfill(coll):
+    """parse every event's time string; the ObjectId timestamp (insert time) picks the year"""
+    ensure_indexes(coll)
+    ops, seen, dated = [], 0, 0
+    for ev in coll.find({}, {"time": 1, "starts_at": 1}):
+        seen += 1
+        starts = parse_event_time(ev.get("time"), ev["_id"].generation_time)
+        dated += starts is not None
+        stored = ev.get("starts_at")
+        if stored is not None and stored.tzinfo is None:
+            stored = stored.replace(tzinfo=timezone.utc)
+        if stored != starts:
+            ops.append(UpdateOne({"_id": ev["_id"]}, {"$set": {"starts_at": starts}}))
+        if len(ops) >= BATCH:
+            coll.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+    print(f"✅ {seen} events | {dated} dated | {seen - dated} undated (recurring / unparseable)")
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "backfill"
+    if cmd != "backfill":
+        print("usage: python event_time.py backfill")
+        return
+    backfill(MongoClient(MONGODB_URI)[DB_NAME][EVENTS_COLL])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Scraped event CSVs -> `events`.
+
+Streams eventbrite_webscraper/master_events.csv and master_events_2.csv row
+by row (earlier files win when an `id` repeats), splits the " | "-joined
+tags, normalizes them to the slugs the events collection stores
+(vocab.slugify, same as the parse_tags fixer) plus canonical tag_ids, and
+upserts on `id` in unordered bulk_write batches.
+
+meetup_events.csv is not a source: it has no tags column (id, name, time,
+location, host, url), and an untagged event can never be matched, so its
+rows would all be skipped. It needs a tagging step before it can be added.
+
+Each document carries a content_hash over its scraped fields; on a re-run a
+row whose hash matches the stored one is skipped, so only new or changed
+events are written. Attendees (and attendees_count) are never overwritten.
+When anything was written, similar_events.refresh updates `event_neighbors`.
+
+`python ingest_events.py [CSV ...]`
+"""
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
+from dotenv import load_dotenv
+
+import similar_events
+from event_time import ensure_indexes as ensure_time_index, parse_event_time
+from vocab import get_vocab, slugify
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = os.getenv("DB_NAME", "cappuconnect")
+EVENTS_COLL = os.getenv("EVENTS_COLLECTION", "events")
+
+SCRAPER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eventbrite_webscraper")
+SOURCES = [
+    os.path.join(SCRAPER_DIR, "master_events.csv"),
+    os.path.join(SCRAPER_DIR, "master_events_2.csv"),
+]
+
+BATCH = 1000
+TAG_SEP = "|"
+
+# scraped columns kept on the document
+FIELDS   = ["name", "time", "host", "venue", "address", "cleaned_url", "image_url", "map_url"]
+DEFAULTS = {"venue": "undefined", "address": "undefined",
+            "image_url": "Image not found", "map_url": "Map link not found"}
+
+# --- helpers ---
+def split_tags(raw):
+    """a " | "-joined tags cell -> unique slugs in first-seen order"""
+    out = []
+    for t in (raw or "").split(TAG_SEP):
+        s = slugify(t.strip())
+        if s and s not in out:
+            out.append(s)
+    return out
+
+def content_hash(doc):
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def row_to_doc(row, vocab):
+    """one CSV row -> the scraped part of an event document, or None if unusable"""
+    try:
+        event_id = int(str(row.get("id", "")).strip().strip('"'))
+    except ValueError:
+        return None
+    tags = split_tags(row.get("tags"))
+    if not tags:
+        return None  # untagged events are deleted from the collection anyway (delete_bad_tags_)
+    doc = {"id": event_id}
+    for f in FIELDS:
+        v = (row.get(f) or "").strip()
+        doc[f] = v or DEFAULTS.get(f, "")
+    doc["tags"] = tags
+    doc["tags_raw"] = (row.get("tags") or "").strip()
+    doc["content_hash"] = content_hash(doc)
+    doc["tag_ids"] = vocab.encode(tags, add=True)
+    doc["starts_at"] = parse_event_time(doc["time"])  # year inferred relative to now (scrape time)
+    return doc
+
+def stream_rows(paths):
+    """(path, row) for every CSV row, one file open at a time"""
+    for path in paths:
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    yield path, row
+        except OSError as e:
+            print(f"❌ skipping {path}: {e}")
+
+def stored_hashes(coll):
+    return {d["id"]: d.get("content_hash") for d in coll.find({"id": {"$exists": True}}, {"id": 1, "content_hash": 1})}
+
+def ensure_indexes(coll):
+    try:
+        coll.create_index("id", unique=True)  # event.ts declares id unique
+    except OperationFailure as e:
+        print(f"❌ could not create unique index on id: {e}")
+    coll.create_index("tag_ids")
+    ensure_time_index(coll)
+
+# --- jobs ---
+def ingest(coll, paths=SOURCES, vocab=None):
+    vocab = get_vocab() if vocab is None else vocab
+    vocab_size = len(vocab)
+    ensure_indexes(coll)
+    known = stored_hashes(coll)
+
+    counts = {"rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "duplicate": 0, "skipped": 0}
+    seen = set()
+    ops = []
+
+    def flush():
+        if ops:
+            coll.bulk_write(ops, ordered=False)
+            ops.clear()
+
+    t0 = time.perf_counter()
+    for path, row in stream_rows(paths):
+        counts["rows"] += 1
+        doc = row_to_doc(row, vocab)
+        if doc is None:
+            counts["skipped"] += 1
+            continue
+        if doc["id"] in seen:
+            counts["duplicate"] += 1
+            continue
+        seen.add(doc["id"])
+        if doc["id"] in known and known[doc["id"]] == doc["content_hash"]:
+            counts["unchanged"] += 1
+            continue
+        counts["updated" if doc["id"] in known else "inserted"] += 1
+        ops.append(UpdateOne({"id": doc["id"]}, {"$set": doc, "$setOnInsert": {"attendees": [], "attendees_count": 0}}, upsert=True))
+        if len(ops) >= BATCH:
+            flush()
+    flush()
+
+    elapsed = time.perf_counter() - t0
+    print(f"✅ {counts['rows']} rows in {elapsed:.2f}s ({counts['rows'] / max(elapsed, 1e-9):,.0f} rows/s) | "
+          f"inserted {counts['inserted']} | updated {counts['updated']} | unchanged {counts['unchanged']} | "
+          f"duplicate id {counts['duplicate']} | skipped {counts['skipped']} | "
+          f"{len(vocab) - vocab_size} new vocab terms")
+    return counts
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    paths = sys.argv[1:] or SOURCES
+    db = MongoClient(MONGODB_URI)[DB_NAME]
+    counts = ingest(db[EVENTS_COLL], paths)
+    if counts["inserted"] or counts["updated"]:
+        similar_events.refresh(db)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Optional instrumentation for the matching scripts (sorting.py, sort_events.py).
+
+Off unless MATCH_INSTRUMENT is set; when off, `start()` / `current()` hand
+back a no-op object whose `iter` / `timed` return their argument unchanged,
+so hot loops pay nothing beyond one call at setup.
+
+When on, a run records
+  - per-stage wall time (`with inst.stage("match"):`)
+  - time spent waiting on a cursor (`inst.iter(cursor, "cursor")`: network +
+    BSON decoding) and in wrapped helpers (`inst.timed(norm_skills, "normalize")`)
+  - counters (`inst.count("scanned", n)`)
+  - bytes received, round-trip time and number of commands, via a pymongo
+    CommandListener (pass `inst.listeners()` to MongoClient). cursor time
+    minus round-trip time is roughly what decoding cost. The driver does not
+    expose reply sizes, so the listener re-encodes each reply; that time is
+    reported as mongo.listener_s and taken out of every stage it ran in.
+  - optionally a cProfile dump and tracemalloc peak / top allocation sites
+    (MATCH_PROFILE=cprofile,tracemalloc)
+
+and `finish()` appends one JSON line to MATCH_METRICS_OUT or, with
+MATCH_METRICS_FORMAT=prom, rewrites it in Prometheus text format (point
+node_exporter's textfile collector at it; the file is replaced atomically,
+so a scrape never sees half of it).
+"""
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+import bson
+from pymongo import monitoring
+
+ENABLED = os.getenv("MATCH_INSTRUMENT", "").lower() not in ("", "0", "false", "off")
+PROFILE = {p.strip() for p in os.getenv("MATCH_PROFILE", "").lower().split(",") if p.strip()}
+FORMAT  = os.getenv("MATCH_METRICS_FORMAT", "json")   # "json" (append a line) | "prom" (overwrite)
+DEFAULT_OUT = {"json": "match_metrics.jsonl", "prom": "match_metrics.prom"}
+OUT     = os.getenv("MATCH_METRICS_OUT") or DEFAULT_OUT.get(FORMAT, DEFAULT_OUT["json"])
+TOP_ALLOCS = 10
+
+
+class BytesListener(monitoring.CommandListener):
+    """sums reply sizes and driver-measured round trips"""
+    def __init__(self):
+        self.commands = 0
+        self.bytes_received = 0
+        self.roundtrip_s = 0.0
+        self.failures = 0
+        self.overhead_s = 0.0   # our own time spent sizing replies
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.commands += 1
+        self.roundtrip_s += event.duration_micros / 1e6
+        # the driver has already decoded the reply; re-encode to size it (only paid when on)
+        t = time.perf_counter()
+        self.bytes_received += len(bson.encode(event.reply))
+        self.overhead_s += time.perf_counter() - t
+
+    def failed(self, event):
+        self.failures += 1
+        self.roundtrip_s += event.duration_micros / 1e6
+
+
+class _Off:
+    enabled = False
+    _ctx = nullcontext()
+
+    def listeners(self):
+        return []
+
+    def stage(self, name):
+        return self._ctx
+
+    def iter(self, it, name):
+        return it
+
+    def timed(self, fn, name):
+        return fn
+
+    def count(self, name, n=1):
+        pass
+
+    def finish(self, **labels):
+        return None
+
+
+class Instrument:
+    enabled = True
+
+    def __init__(self, script, profile=(), out=None, fmt=FORMAT):
+        self.script = script
+        if out is None:
+            out = OUT if fmt == FORMAT else DEFAULT_OUT.get(fmt, DEFAULT_OUT["json"])
+        self.out = out
+        self.fmt = fmt
+        self.stages = {}       # name -> [seconds, calls]
+        self.counters = {}
+        self.listener = BytesListener()
+        self.profiler = None
+        self.t0 = time.perf_counter()
+        if "cprofile" in profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.tracing = "tracemalloc" in profile
+        if self.tracing:
+            import tracemalloc
+            tracemalloc.start()
+
+    def listeners(self):
+        return [self.listener]
+
+    def _since(self, t, overhead):
+        """wall time since `t` minus what the listener spent meanwhile (overhead_s then)"""
+        return time.perf_counter() - t - (self.listener.overhead_s - overhead)
+
+    def _add(self, name, dt, calls=1):
+        s = self.stages.setdefault(name, [0.0, 0])
+        s[0] += dt
+        s[1] += calls
+
+    @contextmanager
+    def stage(self, name):
+        t, o = time.perf_counter(), self.listener.overhead_s
+        try:
+            yield
+        finally:
+            self._add(name, self._since(t, o))
+
+    def iter(self, it, name):
+        """yield from `it`, charging the time spent in next() to `name`"""
+        it = iter(it)
+        clock, lst, total, n = time.perf_counter, self.listener, 0.0, 0
+        try:
+            while True:
+                t, o = clock(), lst.overhead_s
+                try:
+                    x = next(it)
+                except StopIteration:
+                    total += clock() - t - (lst.overhead_s - o)
+                    return
+                total += clock() - t - (lst.overhead_s - o)
+                n += 1
+                yield x
+        finally:
+            self._add(name, total, n)
+
+    def timed(self, fn, name):
+        clock = time.perf_counter
+
+        def wrapper(*args, **kw):
+            t, o = clock(), self.listener.overhead_s
+            try:
+                return fn(*args, **kw)
+            finally:
+                self._add(name, self._since(t, o))
+        return wrapper
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, **labels):
+        lst = self.listener
+        rec = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "script": self.script,
+            **labels,
+            "total_s": round(time.perf_counter() - self.t0, 6),
+            "stages": {k: {"s": round(v[0], 6), "calls": v[1]} for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+            "mongo": {"commands": lst.commands, "failed": lst.failures,
+                      "bytes_received": lst.bytes_received, "roundtrip_s": round(lst.roundtrip_s, 6),
+                      "listener_s": round(lst.overhead_s, 6)},
+        }
+        if self.tracing:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCS]
+            tracemalloc.stop()
+            rec["memory"] = {"current_bytes": current, "peak_bytes": peak,
+                             "top": [{"where": str(s.traceback), "bytes": s.size, "count": s.count} for s in top]}
+        if self.profiler is not None:
+            self.profiler.disable()
+            path = os.path.splitext(self.out)[0] + f".{self.script}.prof"
+            self.profiler.dump_stats(path)
+            rec["profile"] = path  # `python -m pstats <path>` / snakeviz
+        return rec
+
+    def finish(self, **labels):
+        rec = self.record(**labels)
+        if self.fmt == "prom":
+            # textfile collectors read whenever they like: never let them see a partial file
+            tmp = self.out + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(to_prometheus(rec))
+            os.replace(tmp, self.out)
+        else:
+            with open(self.out, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, default=str) + "\n")
+        return rec
+
+
+def to_prometheus(rec):
+    """one record -> Prometheus text exposition format"""
+    base = f'script="{rec["script"]}"'
+    lines = [
+        "# TYPE match_run_seconds gauge",
+        f"match_run_seconds{{{base}}} {rec['total_s']}",
+        "# TYPE match_stage_seconds gauge",
+        *(f'match_stage_seconds{{{base},stage="{k}"}} {v["s"]}' for k, v in rec["stages"].items()),
+        "# TYPE match_stage_calls gauge",
+        *(f'match_stage_calls{{{base},stage="{k}"}} {v["calls"]}' for k, v in rec["stages"].items()),
+        "# TYPE match_docs gauge",
+        *(f'match_docs{{{base},kind="{k}"}} {v}' for k, v in rec["counters"].items()),
+        "# TYPE match_mongo_bytes_received gauge",
+        f"match_mongo_bytes_received{{{base}}} {rec['mongo']['bytes_received']}",
+        "# TYPE match_mongo_commands gauge",
+        f"match_mongo_commands{{{base}}} {rec['mongo']['commands']}",
+        "# TYPE match_mongo_roundtrip_seconds gauge",
+        f"match_mongo_roundtrip_seconds{{{base}}} {rec['mongo']['roundtrip_s']}",
+        "# TYPE match_listener_seconds gauge",
+        f"match_listener_seconds{{{base}}} {rec['mongo']['listener_s']}",
+    ]
+    if "memory" in rec:
+        lines += ["# TYPE match_memory_peak_bytes gauge",
+                  f"match_memory_peak_bytes{{{base}}} {rec['memory']['peak_bytes']}"]
+    return "\n".join(lines) + "\n"
+
+
+OFF = _Off()
+_current = OFF
+
+def start(script, enabled=ENABLED, profile=PROFILE):
+    """begin a run; returns the no-op instrument unless enabled"""
+    global _current
+    _current = Instrument(script, profile) if enabled else OFF
+    return _current
+
+def current():
+    return _current
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Resident matching service.
+
+sorting.py / sort_events.py are run-once scripts: new MongoClient, re-read
+.env, reload the viewer, re-scan the collection, exit. This keeps one pooled
+PyMongo client (blocking calls go through a thread pool so the event loop
+never waits on Mongo) and holds every user's and event's normalized terms in
+memory as packed bitsets (skill_bits.py), refreshed in the background.
+Rankings are cached per viewer (result_cache.py) and dropped only when a
+refresh changes who is in them, so repeat page loads skip scoring.
+
+    GET /users/{id}/matches?k=50     top users for a viewer (sorting.py order)
+    GET /users/{id}/events?k=50      top events for a viewer (sort_events.py order)
+    GET /stats                       startup / warm-up / recent steady-state latencies, cache counters
+
+Listens on MATCH_HOST:MATCH_PORT, or on a Unix socket if MATCH_SOCKET is set.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from math import sqrt
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aiohttp import web
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+from attendees_count import with_counts
+from event_time import window_filter
+from result_cache import ResultCache, skill_fingerprint
+from skill_bits import SkillBits, ts_ms
+from snapshot import Snapshot, ms_to_dt
+from sort_events import starts_key
+from sorting import norm_skills
+from vocab import get_vocab, slugify
+
+T_PROCESS = time.perf_counter()
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = os.getenv("DB_NAME", "cappuconnect")
+USERS_COLL  = "users_tag_spam"
+EVENTS_COLL = "events"
+
+HOST      = os.getenv("MATCH_HOST", "127.0.0.1")
+PORT      = int(os.getenv("MATCH_PORT", "8765"))
+SOCKET    = os.getenv("MATCH_SOCKET")          # e.g. /tmp/match.sock
+POOL_SIZE = int(os.getenv("MATCH_POOL", "8"))  # worker threads == max pooled connections in use
+SNAPSHOT  = os.getenv("MATCH_SNAPSHOT")        # snapshot.py dir: cold-start users from it, then catch up
+
+DEFAULT_K    = 50
+MAX_K        = 500
+MIN_OVERLAP  = 1
+REFRESH_S    = 30     # users changed since the watermark are re-read this often
+EVENTS_RELOAD_S = 300 # events are small; reload them wholesale
+DELETES_S    = 300    # deleted users are found with an _id-only scan this often
+WINDOW_DAYS  = 14     # upcoming events only (+ undated), like sort_events.py; None = all
+CACHE_SIZE   = int(os.getenv("MATCH_CACHE_SIZE", "10000"))  # cached rankings (LRU beyond this)
+CACHE_TTL_S  = int(os.getenv("MATCH_CACHE_TTL", "300"))
+LATENCY_WINDOW = 10000  # steady-state percentiles are over the most recent requests
+
+USER_DISPLAY  = {"firstname": 1, "lastname": 1, "email": 1, "photo": 1, "state": 1, "industry": 1}
+EVENT_DISPLAY = {"id": 1, "name": 1, "time": 1, "venue": 1, "address": 1, "host": 1,
+                 "image_url": 1, "cleaned_url": 1, "map_url": 1}
+
+
+def percentiles(samples, ps=(50, 95, 99)):
+    if not samples:
+        return {}
+    arr = np.asarray(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(arr, p)), 3) for p in ps}
+
+def best_key(scored):
+    """for ResultCache.invalidate: the best SkillBits.rank key any of the changed (skills, updated) now has against A"""
+    def best(A):
+        a, top = len(A), None
+        for B, updated in scored:
+            o = len(A & B)
+            if o < MIN_OVERLAP:
+                continue
+            key = (o, o / (a + len(B) - o), o / sqrt(a * len(B)), updated)
+            if top is None or key > top:
+                top = key
+        return top
+    return best
+
+
+class MatchService:
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="mongo")
+        self.client = None
+        self.db = None
+        self.users = None           # SkillBits over users_tag_spam (lowercase-normalized skills)
+        self.events = None          # SkillBits over events (canonical slugs)
+        self.ev_attendees = None    # per-event attendee counts (tiebreak)
+        self.ev_ties = None         # attendees, dated, -start, id: descending tiebreak columns
+        self.watermark = None
+        self.cache = ResultCache(CACHE_SIZE, CACHE_TTL_S)
+        self.timings = {}
+        # per kind: the first request (one-off costs), a request count and a bounded window of the rest
+        self.latency = {kind: {"first": None, "requests": 0, "recent": deque(maxlen=LATENCY_WINDOW)}
+                        for kind in ("users", "events")}
+
+    def record(self, kind, seconds):
+        lat = self.latency[kind]
+        if lat["first"] is None:
+            lat["first"] = seconds
+        else:
+            lat["recent"].append(seconds)
+        lat["requests"] += 1
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    # --- lifecycle ---
+    async def start(self):
+        t0 = time.perf_counter()
+        self.client = MongoClient(MONGODB_URI, maxPoolSize=POOL_SIZE)
+        self.db = self.client[DB_NAME]
+        await self.run(self.client.admin.command, "ping")
+        t1 = time.perf_counter()
+        users, events = await asyncio.gather(self.run(self._load_users), self.run(self._load_events))
+        self.users, self.watermark = users
+        self.events, self.ev_attendees, self.ev_ties = events
+        t2 = time.perf_counter()
+        self.timings = {
+            "startup_ms": round((t1 - T_PROCESS) * 1000, 1),   # imports + connect
+            "connect_ms": round((t1 - t0) * 1000, 1),
+            "warmup_ms": round((t2 - t1) * 1000, 1),           # users + events into memory
+            "users": len(self.users),
+            "events": len(self.events),
+        }
+        print(f"✅ ready: {self.timings}")
+
+    async def stop(self):
+        self.pool.shutdown(wait=False)
+        if self.client is not None:
+            self.client.close()
+
+    async def refresher(self):
+        last_events = last_deletes = time.monotonic()
+        while True:
+            await asyncio.sleep(REFRESH_S)
+            try:
+                changed = await self.run(self._changed_users)
+                if time.monotonic() - last_deletes >= DELETES_S:
+                    # deleted users never pass the watermark; their rows are emptied like a cleared profile
+                    changed += [{"_id": oid, "skills": []} for oid in await self.run(self._deleted_users)]
+                    last_deletes = time.monotonic()
+                if changed:
+                    # the matrix is copied and updated in the pool; the loop only swaps it in
+                    self._apply_users(*await self.run(self._updated_users, changed))
+                    print(f"↻ {len(changed)} users refreshed")
+                if time.monotonic() - last_events >= EVENTS_RELOAD_S:
+                    self.events, self.ev_attendees, self.ev_ties = await self.run(self._load_events)
+                    self.cache.invalidate_kind("events")
+                    last_events = time.monotonic()
+            except Exception as e:  # keep serving the last good snapshot
+                print(f"❌ refresh failed: {e!r}")
+
+    # --- loading (runs in the pool; results are swapped in on the loop thread) ---
+    def _load_users(self):
+        if SNAPSHOT and os.path.exists(os.path.join(SNAPSHOT, "meta.json")):
+            # memory-mapped columns; the first refresh pulls whatever changed after the snapshot
+            snap = Snapshot.load(SNAPSHOT)
+            mark = ms_to_dt(snap.meta["users_watermark_ms"])
+            return snap.user_bits(), mark.replace(tzinfo=None) if mark else None
+        watermark = None
+        docs = []
+        for d in self.db[USERS_COLL].find({"skills": {"$exists": True, "$ne": []}}, {"skills": 1, "updatedAt": 1}):
+            docs.append(d)
+            u = d.get("updatedAt")
+            if u is not None and (watermark is None or u > watermark):
+                watermark = u
+        return SkillBits.from_docs(docs), watermark
+
+    def _changed_users(self):
+        q = {"updatedAt": {"$gt": self.watermark}} if self.watermark is not None else {}
+        return list(self.db[USERS_COLL].find(q, {"skills": 1, "updatedAt": 1}))
+
+    def _deleted_users(self):
+        users = self.users
+        live = {d["_id"] for d in self.db[USERS_COLL].find({}, {"_id": 1})}
+        return [oid for oid, size in zip(users.ids, users.sizes.tolist()) if size and oid not in live]
+
+    def _updated_users(self, docs):
+        """a copy of the users matrix with `docs` applied in one batch, plus what to invalidate"""
+        users = self.users.copy()
+        ids, scored, items = set(), [], []
+        watermark = self.watermark
+        for d in docs:
+            new = norm_skills(d.get("skills", []))
+            ids.add(d["_id"])
+            items.append((d["_id"], new, d.get("updatedAt")))
+            if new:
+                scored.append((new, ts_ms(d.get("updatedAt"))))
+            u = d.get("updatedAt")
+            if u is not None and (watermark is None or u > watermark):
+                watermark = u
+        users.upsert_many(items)
+        return users, watermark, ids, scored
+
+    def _apply_users(self, users, watermark, ids, scored):
+        self.users, self.watermark = users, watermark
+        # entries listing a changed user (display fields / score) or viewed by one, and
+        # rankings a changed user now scores its way into
+        self.cache.invalidate("users", ids, best_key(scored))
+        self.cache.invalidate("events", ids)
+
+    def _load_events(self):
+        vocab = get_vocab()
+        q = window_filter(None, WINDOW_DAYS) if WINDOW_DAYS is not None else {}
+        proj = {"tags": 1, "tag_ids": 1, "attendees_count": 1, "id": 1, "starts_at": 1}
+        docs, attendees, starts, ids = [], [], [], []
+        coll = self.db[EVENTS_COLL]
+        for ev in with_counts(coll, coll.find(q, proj)):
+            terms = vocab.decode(ev["tag_ids"]) if ev.get("tag_ids") else [slugify(t) for t in ev.get("tags") or []]
+            if not any(terms):
+                continue
+            docs.append({"_id": ev["_id"], "skills": terms})
+            attendees.append(ev["attendees_count"])
+            starts.append(starts_key(ev.get("starts_at")))
+            ids.append(ev.get("id") or 0)
+        attendees = np.array(attendees, dtype=np.int64)
+        starts = np.array(starts, dtype=np.float64).reshape(-1, 2)
+        ties = (attendees, starts[:, 0], starts[:, 1], np.array(ids, dtype=np.int64))
+        return SkillBits.from_docs(docs, vocab=vocab.terms), attendees, ties
+
+    def _fetch(self, coll, ids, proj):
+        by_id = {d["_id"]: d for d in self.db[coll].find({"_id": {"$in": ids}}, proj)}
+        return [by_id.get(i) for i in ids]
+
+    def _fetch_viewer(self, oid):
+        me = self.db[USERS_COLL].find_one({"_id": oid}, {"skills": 1})
+        return norm_skills(me.get("skills", [])) if me else None
+
+    async def viewer_skills(self, oid):
+        """from memory when we have the user, else one read (e.g. a brand-new account)"""
+        r = self.users.row.get(oid)
+        if r is not None and self.users.sizes[r]:
+            return self.users.skills_of(r)
+        return await self.run(self._fetch_viewer, oid)
+
+    # --- queries ---
+    async def top_users(self, oid, k):
+        version = self.cache.version("users")  # a refresh landing while we await makes this result stale
+        A = await self.viewer_skills(oid)
+        if A is None:
+            return None
+        key = ("users", oid, skill_fingerprint(A), k, MIN_OVERLAP)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit
+        # O(n) numpy scan: off the loop (numpy releases the GIL); the matrix may be swapped meanwhile
+        users = self.users
+        rows, overlap, jac, cos = await self.run(users.rank, A, oid, MIN_OVERLAP, k)
+        ids = [users.ids[r] for r in rows.tolist()]
+        floor = None  # a full top-k is only entered by beating its last row, same order as rank()
+        if len(rows) == k:
+            floor = (int(overlap[-1]), float(jac[-1]), float(cos[-1]), int(users.updated[rows[-1]]))
+        docs = await self.run(self._fetch, USERS_COLL, ids, {**USER_DISPLAY, "skills": 1})
+        out = []
+        for d, o, j, c in zip(docs, overlap.tolist(), jac.tolist(), cos.tolist()):
+            if d is None:
+                continue
+            out.append({
+                **{f: d.get(f, "") for f in USER_DISPLAY},
+                "_id": str(d["_id"]),
+                "overlap": o, "jaccard": j, "cosine": c,
+                "common": sorted(A & norm_skills(d.get("skills", []))),
+            })
+        self.cache.put(key, out, terms=A, ids={oid, *ids}, floor=floor, version=version)
+        return out
+
+    async def top_events(self, oid, k):
+        version = self.cache.version("events")
+        skills = await self.viewer_skills(oid)
+        if skills is None:
+            return None
+        vocab = get_vocab()
+        A = set(vocab.decode(vocab.encode(skills)))  # same terms sort_events.py matches on
+        key = ("events", oid, skill_fingerprint(A), k, MIN_OVERLAP, WINDOW_DAYS)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit
+        ev, attendees, ties = self.events, self.ev_attendees, self.ev_ties
+        rows, overlap, jac, cos = await self.run(ev.rank, A, None, MIN_OVERLAP, k, ties)
+        ids = [ev.ids[r] for r in rows.tolist()]
+        docs = await self.run(self._fetch, EVENTS_COLL, ids, dict(EVENT_DISPLAY))
+        out = []
+        for r, d, o, j, c in zip(rows.tolist(), docs, overlap.tolist(), jac.tolist(), cos.tolist()):
+            if d is None:
+                continue
+            out.append({
+                **{f: d.get(f, "") for f in EVENT_DISPLAY},
+                "_id": str(d["_id"]),
+                "attendees_count": int(attendees[r]),
+                "overlap": o, "jaccard": j, "cosine": c,
+                "common": sorted(A & ev.skills_of(r)),
+            })
+        self.cache.put(key, out, terms=A, ids={oid}, version=version)
+        return out
+
+
+# --- http ---
+def parse_id(request):
+    try:
+        return ObjectId(request.match_info["id"])
+    except (InvalidId, TypeError):
+        raise web.HTTPBadRequest(text="invalid id")
+
+def parse_k(request):
+    try:
+        return max(1, min(MAX_K, int(request.query.get("k", DEFAULT_K))))
+    except ValueError:
+        raise web.HTTPBadRequest(text="invalid k")
+
+def make_app():
+    svc = MatchService()
+    app = web.Application()
+
+    async def users_handler(request):
+        t0 = time.perf_counter()
+        rows = await svc.top_users(parse_id(request), parse_k(request))
+        svc.record("users", time.perf_counter() - t0)
+        if rows is None:
+            raise web.HTTPNotFound(text="user not found")
+        return web.json_response(rows)
+
+    async def events_handler(request):
+        t0 = time.perf_counter()
+        rows = await svc.top_events(parse_id(request), parse_k(request))
+        svc.record("events", time.perf_counter() - t0)
+        if rows is None:
+            raise web.HTTPNotFound(text="user not found")
+        return web.json_response(rows)
+
+    async def stats_handler(request):
+        out = dict(svc.timings)
+        out["cache"] = svc.cache.stats()
+        for kind, lat in svc.latency.items():
+            # the first request of each kind pays one-off costs; report it apart from steady state
+            out[f"{kind}_first_ms"] = round(lat["first"] * 1000, 3) if lat["first"] is not None else None
+            out[f"{kind}_requests"] = lat["requests"]
+            out[f"{kind}_steady"] = percentiles(lat["recent"])
+        return web.json_response(out)
+
+    async def on_startup(app):
+        await svc.start()
+        app["refresher"] = asyncio.create_task(svc.refresher())
+
+    async def on_cleanup(app):
+        app["refresher"].cancel()
+        await svc.stop()
+        print(f"stats: {svc.timings} | users {percentiles(svc.latency['users']['recent'])} | "
+              f"events {percentiles(svc.latency['events']['recent'])}")
+
+    app.router.add_get("/users/{id}/matches", users_handler)
+    app.router.add_get("/users/{id}/events", events_handler)
+    app.router.add_get("/stats", stats_handler)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app["svc"] = svc
+    return app
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    if SOCKET:
+        web.run_app(make_app(), path=SOCKET)
+    else:
+        web.run_app(make_app(), host=HOST, port=PORT)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Keyset pagination over the user and event rankings.
+
+A page comes back with an opaque cursor: urlsafe base64 of the last row's
+position in the ranking,
+
+    users   (overlap, jaccard, cosine, updatedAt, _id)
+    events  (overlap, jaccard, cosine, attendees_count, dated, soonest, id, _id)
+
+(each descending, _id ascending as the final tiebreak so every row has a
+unique position) plus the row's offset as a hint. The first page scores
+everything once and caches the ordered candidate list (first MAX_RANKED
+rows) in a short-lived bounded ResultCache, so the next page is a slice
+found from the hint (or a bisect on the position if the list moved).
+
+If the entry expired or was evicted, or the cursor is past the cached
+prefix, the page is recomputed by seeking: candidates are rescored and
+only those positioned strictly after the cursor are ordered, from which
+the next PAGE_SIZE are taken. Offsets never enter the query, so a deep
+page costs no more than page 2.
+
+`python pagination.py users [PAGES]`   page through ALICE_ID's matches (sorting.py)
+`python pagination.py events [PAGES]`  page through USER_ID's events (sort_events.py)
+"""
+import base64
+import heapq
+import json
+import os
+import sys
+from bisect import bisect_right
+
+import numpy as np
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+import sort_events
+import sorting
+from result_cache import ResultCache, skill_fingerprint
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = "cappuconnect"
+
+PAGE_SIZE   = 20
+MAX_RANKED  = 1000   # rows kept per cached ranking; later pages seek
+CACHE_TTL_S = 120
+CACHE_MAX   = 500
+MIN_OVERLAP = 1
+
+CACHE = ResultCache(max_entries=CACHE_MAX, ttl_s=CACHE_TTL_S)
+
+# --- cursors ---
+def encode_cursor(kind, viewer, pos, offset):
+    raw = json.dumps({"v": 1, "k": kind, "u": str(viewer), "p": list(pos), "n": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, kind, viewer):
+    """-> (position tuple, offset hint); ValueError if it is not a cursor for this listing"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c = json.loads(raw)
+        pos, offset = tuple(c["p"]), int(c["n"])
+        ok = c.get("v") == 1 and c["k"] == kind and c["u"] == str(viewer)
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("malformed cursor")
+    if not ok:
+        raise ValueError("cursor belongs to another listing")
+    return pos, offset
+
+def after(cols, cur):
+    """rows whose (col0, col1, ...) sorts strictly after `cur` (vectorized lexicographic >)"""
+    gt = np.zeros(len(cols[0]), dtype=bool)
+    eq = np.ones(len(cols[0]), dtype=bool)
+    for col, v in zip(cols, cur):
+        gt |= eq & (col > v)
+        eq &= col == v
+    return gt
+
+def slice_page(ranked, complete, cur, offset, size):
+    """
+    (page, has_more, start offset) from a cached ranking, or None when the
+    cursor lies beyond what was cached and the caller has to seek
+    """
+    if cur is None:
+        start = 0
+    elif 0 < offset <= len(ranked) and ranked[offset - 1][0] == cur:
+        start = offset
+    else:
+        start = bisect_right([r[0] for r in ranked], cur)
+    if start >= len(ranked) and not complete:
+        return None
+    page = ranked[start:start + size]
+    return page, start + size < len(ranked) or not complete, start
+
+# --- users ---
+def user_positions(sb, A, viewer):
+    overlap, jac, cos = sb.score(sb.pack(A), len(A))
+    keep = overlap >= MIN_OVERLAP
+    if viewer in sb.row:
+        keep[sb.row[viewer]] = False
+    rows = np.nonzero(keep)[0]
+    ids = np.array([str(sb.ids[r]) for r in rows.tolist()])
+    cols = [-overlap[rows].astype(np.float64), -jac[rows], -cos[rows], -sb.updated[rows].astype(np.float64), ids]
+    return rows, cols
+
+def user_entry(sb, rows, cols, i):
+    """(position, (_id, skill count)) for candidate i"""
+    r = rows[i]
+    pos = (float(cols[0][i]), float(cols[1][i]), float(cols[2][i]), float(cols[3][i]), str(cols[4][i]))
+    return pos, (sb.ids[r], int(sb.sizes[r]))
+
+def page_users(users, viewer, A, cursor=None, size=PAGE_SIZE, sb=None, cache=CACHE):
+    """
+    one page of users ranked for skill set A: {"items": rows as sorting.build_rows,
+    "next": cursor or None, "source": "ranked" | "cache" | "seek"}
+    """
+    from skill_bits import SkillBits
+
+    cur, offset = decode_cursor(cursor, "users", viewer) if cursor else (None, 0)
+    key = ("page_users", viewer, skill_fingerprint(A), MIN_OVERLAP)
+    hit = cache.get(key)
+    source = "cache"
+    if hit is None and cursor is None:
+        sb = SkillBits.from_collection(users) if sb is None else sb
+        rows, cols = user_positions(sb, A, viewer)
+        order = np.lexsort(cols[::-1])[:MAX_RANKED + 1]
+        entries = [user_entry(sb, rows, cols, i) for i in order.tolist()]
+        hit = (entries[:MAX_RANKED], len(entries) <= MAX_RANKED)
+        cache.put(key, hit, terms=A, ids={viewer})
+        source = "ranked"
+    got = slice_page(*hit, cur, offset, size) if hit is not None else None
+    if got is None:
+        # evicted / expired / past the cached prefix: rescore, keep only rows after the cursor
+        sb = SkillBits.from_collection(users) if sb is None else sb
+        rows, cols = user_positions(sb, A, viewer)
+        idx = np.nonzero(after(cols, cur))[0] if cur is not None else np.arange(len(rows))
+        sub = [c[idx] for c in cols]
+        pick = idx[np.lexsort(sub[::-1])[:size + 1]] if len(idx) else idx
+        page = [user_entry(sb, rows, cols, i) for i in pick.tolist()]
+        page, more, start = page[:size], len(page) > size, offset
+        source = "seek"
+    else:
+        page, more, start = got
+
+    winners = [(sorting.rank_key(-int(p[0]), -p[1], -p[2], -int(p[3])), (oid, n, None)) for p, (oid, n) in page]
+    items = sorting.build_rows(users, A, winners)
+    nxt = encode_cursor("users", viewer, page[-1][0], start + len(page)) if more and page else None
+    return {"items": items, "next": nxt, "source": source}
+
+# --- events ---
+def event_position(key, oid):
+    return tuple(-float(x) for x in key) + (str(oid),)
+
+def page_events(events, viewer, A, cursor=None, size=PAGE_SIZE, now=None, cache=CACHE):
+    """one page of events ranked for term set A (sort_events.viewer_terms), same shape as page_users"""
+    cur, offset = decode_cursor(cursor, "events", viewer) if cursor else (None, 0)
+    key = ("page_events", viewer, skill_fingerprint(A), MIN_OVERLAP, sort_events.WINDOW_DAYS)
+    q = sort_events.event_query(A, now)
+    hit = cache.get(key)
+    source = "cache"
+    if hit is None and cursor is None:
+        scored = [(event_position(k, oid), (oid, tags, k)) for k, (oid, tags) in sort_events.score_events(events, A, q)]
+        ranked = heapq.nsmallest(MAX_RANKED + 1, scored, key=lambda e: e[0])
+        hit = (ranked[:MAX_RANKED], len(ranked) <= MAX_RANKED)
+        cache.put(key, hit, terms=A, ids={viewer})
+        source = "ranked"
+    got = slice_page(*hit, cur, offset, size) if hit is not None else None
+    if got is None:
+        later = ((p, item) for p, item in
+                 ((event_position(k, oid), (oid, tags, k)) for k, (oid, tags) in sort_events.score_events(events, A, q))
+                 if cur is None or p > cur)
+        page = heapq.nsmallest(size + 1, later, key=lambda e: e[0])
+        page, more, start = page[:size], len(page) > size, offset
+        source = "seek"
+    else:
+        page, more, start = got
+
+    shown = sort_events.fetch_display(events, [oid for _, (oid, _, _) in page])
+    items = [sort_events.event_row(shown[oid], A, tags, k) for _, (oid, tags, k) in page if oid in shown]
+    nxt = encode_cursor("events", viewer, page[-1][0], start + len(page)) if more and page else None
+    return {"items": items, "next": nxt, "source": source}
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    kind = sys.argv[1] if len(sys.argv) > 1 else "users"
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    db = MongoClient(MONGODB_URI)[DB_NAME]
+    users = db["users_tag_spam"]
+    if kind == "events":
+        viewer = sort_events.USER_ID
+        me = users.find_one({"_id": viewer}, {"skills": 1})
+        A, fetch = sort_events.viewer_terms(me or {}), lambda c: page_events(db["events"], viewer, A, c)
+    else:
+        viewer = sorting.ALICE_ID
+        me = users.find_one({"_id": viewer}, {"skills": 1})
+        A, fetch = sorting.norm_skills((me or {}).get("skills", [])), lambda c: page_users(users, viewer, A, c)
+    if not A:
+        print("❌ Viewer not found or has no skills.")
+        return
+    cursor = None
+    for n in range(1, pages + 1):
+        res = fetch(cursor)
+        print(f"\npage {n} ({res['source']}):")
+        for r in res["items"]:
+            name = r.get("name") or f"{r.get('firstname', '')} {r.get('lastname', '')}"
+            print(f"- {name.strip()[:40]:40s} | overlap={r['overlap']:2d} | jaccard={r['jaccard']:.3f} | "
+                  f"cosine={r['cosine']:.3f}")
+        cursor = res["next"]
+        if cursor is None:
+            break
+    print(f"\nnext cursor: {cursor}")
+
+if __name__ == "__main__":
+    main()
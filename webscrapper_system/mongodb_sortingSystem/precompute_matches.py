@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Precomputed top-N user matches -> `user_matches`.
+
+One document per user:
+    {_id: <user _id>, matches: [{_id, overlap, jaccard, cosine}, ...],
+     count, floor: [overlap, jaccard, cosine, updatedMs] of the last entry,
+     source_updatedAt: <user's updatedAt when computed>, computedAt}
+
+Ordering is the one sorting.py uses (overlap, jaccard, cosine, updatedAt).
+
+`python precompute_matches.py full`     rebuild everything (blocked all-pairs)
+`python precompute_matches.py refresh`  only users changed since the watermark
+`python precompute_matches.py watch`    refresh on change-stream events (replica set)
+
+On refresh a changed user's own row is recomputed, and so is every other
+row that either listed the changed user or would now admit it (its score
+reaches that row's floor). Everything else is left alone, so a match lookup
+stays a single _id read.
+
+The matrix and the floors it is compared against live in a MatchState:
+resident in watch mode, saved to STATE_PATH by one-shot runs. A refresh
+therefore reads only the users changed since the watermark (plus, one-shot,
+an _id-only scan to spot deletions; watch gets those from the stream). The
+state is tied to the last run by a token in matching_meta; if another run
+wrote since, it is read back from Mongo once.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient, ReplaceOne, DeleteOne
+from dotenv import load_dotenv
+
+from skill_bits import SkillBits
+from sorting import norm_skills
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI  = os.getenv("MONGODB_URI")
+DB_NAME      = "cappuconnect"
+# the collection the app reads (src/lib/config.ts), or the rows never match a user
+COLL_NAME    = os.getenv("USERS_COLLECTION", os.getenv("USER_TABLE", "users"))
+MATCHES_COLL = "user_matches"
+META_COLL    = "matching_meta"
+
+TOP_N       = 50
+MIN_OVERLAP = 1
+BLOCK       = 2048   # max rows per all-pairs block (fewer for large n, see PAIRS_MAX_MB)
+PAIRS_MAX_MB = int(os.getenv("PAIRS_MAX_MB", "512"))  # memory for one all-pairs block
+BATCH       = 1000   # bulk_write batch size
+WATCH_DEBOUNCE_S = 2.0
+STATE_PATH  = os.getenv("MATCHES_STATE_PATH",
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), "matches_state.npz"))
+
+# --- helpers ---
+def top_rows(sb, overlap, jac, cos, self_row, n=None):
+    """best n (default TOP_N) candidate rows for one viewer row, in sorting.py order"""
+    n = TOP_N if n is None else n
+    o = overlap.copy()
+    if self_row is not None:
+        o[self_row] = -1
+    cand = np.nonzero(o >= MIN_OVERLAP)[0]
+    if len(cand) > n:
+        # cheap cut on overlap first; ties at the threshold all stay in
+        thr = np.partition(o[cand], -n)[-n]
+        cand = cand[o[cand] >= thr]
+    order = np.lexsort((-sb.updated[cand], -cos[cand], -jac[cand], -o[cand]))
+    return cand[order[:n]]
+
+def match_doc(sb, row, rows, overlap, jac, cos, src_updated, now):
+    matches = [
+        {"_id": sb.ids[r], "overlap": int(overlap[r]), "jaccard": float(jac[r]), "cosine": float(cos[r])}
+        for r in rows.tolist()
+    ]
+    floor = None
+    if len(rows):
+        last = rows[-1]
+        floor = [int(overlap[last]), float(jac[last]), float(cos[last]), int(sb.updated[last])]
+    return {
+        "_id": sb.ids[row],
+        "matches": matches,
+        "count": len(matches),
+        "floor": floor,
+        "source_updatedAt": src_updated,
+        "computedAt": now,
+    }
+
+def flush(coll, ops):
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+        ops.clear()
+
+def load_bits(users):
+    """SkillBits plus each row's raw updatedAt (stored so the API can tell if a row is stale)"""
+    updated = {}
+    def docs():
+        for d in users.find({"skills": {"$exists": True, "$ne": []}}, {"skills": 1, "updatedAt": 1}):
+            updated[d["_id"]] = d.get("updatedAt")
+            yield d
+    sb = SkillBits.from_docs(docs())
+    return sb, updated
+
+def ensure_indexes(db):
+    db[MATCHES_COLL].create_index("matches._id")
+
+def set_watermark(db, state):
+    """record the run in meta; the token ties a saved MatchState to the rows it describes"""
+    state.token = str(ObjectId())
+    db[META_COLL].update_one(
+        {"_id": MATCHES_COLL},
+        {"$set": {"watermark": state.mark, "users": len(state.updated), "state_token": state.token,
+                  "updatedAt": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+class MatchState:
+    """
+    what refresh needs between runs: the skill matrix, each row's stored floor
+    and which users have a row. watch keeps it in memory; one-shot refreshes
+    save it to STATE_PATH, so neither re-reads every user or every floor.
+    """
+    def __init__(self, sb, updated, mark=None):
+        self.sb = sb
+        self.updated = updated          # _id -> raw updatedAt, live users with skills only
+        self.mark = mark
+        self.token = None
+        n = len(sb)
+        self.fo = np.full(n, -1, dtype=np.int64)  # -1: row not full yet, any positive score gets in
+        self.fj = np.zeros(n)
+        self.fc = np.zeros(n)
+        self.fu = np.zeros(n, dtype=np.int64)
+        self.present = np.zeros(n, dtype=bool)   # row has a user_matches doc
+
+    @classmethod
+    def from_db(cls, db):
+        """full read: every user plus every stored floor"""
+        sb, updated = load_bits(db[COLL_NAME])
+        meta = db[META_COLL].find_one({"_id": MATCHES_COLL}) or {}
+        state = cls(sb, updated, meta.get("watermark"))
+        for d in db[MATCHES_COLL].find({}, {"floor": 1, "count": 1}):
+            r = sb.row.get(d["_id"])
+            if r is not None:
+                state.present[r] = True
+                state.set_floor(r, d.get("floor"), d.get("count", 0))
+        state.token = meta.get("state_token")
+        return state
+
+    @classmethod
+    def open(cls, db, path=STATE_PATH):
+        """the saved state if it belongs to the last run, else a full read"""
+        meta = db[META_COLL].find_one({"_id": MATCHES_COLL}) or {}
+        if os.path.exists(path):
+            state = cls.load(path)
+            if state.token is not None and state.token == meta.get("state_token"):
+                return state
+        return cls.from_db(db)
+
+    def set_floor(self, r, floor, count):
+        if not floor or count < TOP_N:
+            self.fo[r] = -1
+        else:
+            self.fo[r], self.fj[r], self.fc[r], self.fu[r] = floor
+
+    def grow(self):
+        """floor columns for rows appended to sb since"""
+        pad = len(self.sb) - len(self.fo)
+        if pad > 0:
+            self.fo = np.append(self.fo, np.full(pad, -1, dtype=np.int64))
+            self.fj = np.append(self.fj, np.zeros(pad))
+            self.fc = np.append(self.fc, np.zeros(pad))
+            self.fu = np.append(self.fu, np.zeros(pad, dtype=np.int64))
+            self.present = np.append(self.present, np.zeros(pad, dtype=bool))
+
+    def apply(self, docs, removed=()):
+        """changed user docs (+ ids gone from the collection) into the matrix; returns changed, removed ids"""
+        items, changed, gone = [], set(), set(removed)
+        for d in docs:
+            skills = norm_skills(d.get("skills", []))
+            u = d.get("updatedAt")
+            if u is not None and (self.mark is None or u > self.mark):
+                self.mark = u
+            if skills:
+                self.updated[d["_id"]] = u
+                changed.add(d["_id"])
+            else:
+                gone.add(d["_id"])
+            items.append((d["_id"], skills, u))
+        # removed users keep an emptied row (scores 0, never admitted) until the next full rebuild
+        items += [(oid, set(), None) for oid in gone if oid in self.sb.row]
+        self.sb.upsert_many(items)
+        self.grow()
+        for oid in gone:
+            self.updated.pop(oid, None)
+        return changed, gone
+
+    # --- persistence ---
+    def save(self, path=STATE_PATH):
+        tmp = path + ".tmp.npz"
+        sb = self.sb
+        np.savez(tmp, ids=np.array(sb.ids, dtype=object), vocab=np.array(sorted(sb.vocab, key=sb.vocab.get), dtype=object),
+                 bits=sb.bits, sizes=sb.sizes, updated_ms=sb.updated,
+                 updated=np.array([self.updated.get(i) for i in sb.ids], dtype=object),
+                 live=np.array([i in self.updated for i in sb.ids]),
+                 fo=self.fo, fj=self.fj, fc=self.fc, fu=self.fu, present=self.present,
+                 mark=np.array(self.mark, dtype=object), token=np.array(self.token, dtype=object))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        z = np.load(path, allow_pickle=True)
+        sb = SkillBits(vocab=z["vocab"].tolist())
+        sb.ids = z["ids"].tolist()
+        sb.row = {i: r for r, i in enumerate(sb.ids)}
+        sb.bits, sb.sizes, sb.updated = z["bits"], z["sizes"], z["updated_ms"]
+        updated = {i: u for i, u, live in zip(sb.ids, z["updated"].tolist(), z["live"].tolist()) if live}
+        state = cls(sb, updated, z["mark"].item())
+        state.fo, state.fj, state.fc, state.fu, state.present = z["fo"], z["fj"], z["fc"], z["fu"], z["present"]
+        state.token = z["token"].item()
+        return state
+
+# --- jobs ---
+def full_rebuild(db):
+    users, out = db[COLL_NAME], db[MATCHES_COLL]
+    ensure_indexes(db)
+    t0 = time.perf_counter()
+    sb, updated = load_bits(users)
+    state = MatchState(sb, updated, max((u for u in updated.values() if u is not None), default=None))
+    t1 = time.perf_counter()
+
+    now = datetime.now(timezone.utc)
+    ops = []
+    for start, overlap, jac, cos in sb.all_pairs(BLOCK, PAIRS_MAX_MB):
+        for i in range(overlap.shape[0]):
+            row = start + i
+            rows = top_rows(sb, overlap[i], jac[i], cos[i], row)
+            doc = match_doc(sb, row, rows, overlap[i], jac[i], cos[i], updated[sb.ids[row]], now)
+            state.set_floor(row, doc["floor"], doc["count"])
+            ops.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+            if len(ops) >= BATCH:
+                flush(out, ops)
+    flush(out, ops)
+    state.present[:] = True
+
+    # rows for users that no longer exist / lost all their skills
+    gone = [d["_id"] for d in out.find({}, {"_id": 1}) if d["_id"] not in sb.row]
+    stale = len(gone)
+    for i in range(0, len(gone), BATCH):
+        out.delete_many({"_id": {"$in": gone[i:i + BATCH]}})
+    set_watermark(db, state)
+    t2 = time.perf_counter()
+    print(f"✅ {len(sb)} users | load {t1 - t0:.2f}s | score+write {t2 - t1:.2f}s | "
+          f"{len(sb) / max(t2 - t1, 1e-9):.0f} users/s | removed {stale} stale rows")
+    return state
+
+def changed_docs(db, state, extra_changed=()):
+    """users updated since the watermark plus the given ids, on the refresh projection"""
+    users = db[COLL_NAME]
+    q = {"updatedAt": {"$gt": state.mark}} if state.mark is not None else {}
+    if extra_changed:
+        q = {"$or": [q, {"_id": {"$in": list(extra_changed)}}]}
+    return list(users.find(q, {"skills": 1, "updatedAt": 1}))
+
+def refresh(db, extra_changed=(), state=None, deletions=True):
+    """
+    apply changed users to `state` (opened from STATE_PATH / Mongo when None) and
+    rewrite only the rows they affect. deletions=True finds deleted users with an
+    _id-only scan; watch passes False because the change stream reports them.
+    """
+    if not db[META_COLL].find_one({"_id": MATCHES_COLL}):
+        state = full_rebuild(db)
+        state.save()
+        return state
+    one_shot = state is None
+    t0 = time.perf_counter()
+    if one_shot:
+        state = MatchState.open(db)
+    users, out = db[COLL_NAME], db[MATCHES_COLL]
+
+    docs = changed_docs(db, state, extra_changed)
+    found = {d["_id"] for d in docs}
+    removed = {oid for oid in extra_changed if oid not in found}
+    if deletions:
+        live = {d["_id"] for d in users.find({}, {"_id": 1})}
+        removed |= {oid for oid in state.updated if oid not in live}
+    changed, removed = state.apply(docs, removed)
+    sb = state.sb
+    # users with skills but no row yet (e.g. no updatedAt to pass the watermark)
+    changed |= {sb.ids[r] for r in np.nonzero(~state.present & (sb.sizes > 0))[0].tolist()}
+
+    if not changed and not removed:
+        print("Nothing changed since the last run.")
+        return state
+
+    # rows that listed a changed/removed user must be recomputed
+    touched = changed | removed
+    affected = {d["_id"] for d in out.find({"matches._id": {"$in": list(touched)}}, {"_id": 1})}
+
+    # rows that would now admit a changed user
+    fo, fj, fc, fu = state.fo, state.fj, state.fc, state.fu
+    for oid in changed:
+        c = sb.row[oid]
+        o, j, cs = sb.score(sb.bits[c], int(sb.sizes[c]))
+        u = sb.updated[c]
+        beats = (o > fo) | ((o == fo) & ((j > fj) | ((j == fj) & ((cs > fc) | ((cs == fc) & (u >= fu))))))
+        beats &= o >= MIN_OVERLAP
+        beats[c] = False
+        affected.update(sb.ids[r] for r in np.nonzero(beats)[0].tolist())
+
+    now = datetime.now(timezone.utc)
+    ops = [DeleteOne({"_id": oid}) for oid in removed]
+    for oid in removed:
+        if oid in sb.row:
+            state.present[sb.row[oid]] = False
+            state.set_floor(sb.row[oid], None, 0)
+    redo = (affected | changed) - removed
+    for oid in redo:
+        row = sb.row.get(oid)
+        if row is None or oid not in state.updated:
+            ops.append(DeleteOne({"_id": oid}))
+            continue
+        overlap, jac, cos = sb.score(sb.bits[row], int(sb.sizes[row]))
+        rows = top_rows(sb, overlap, jac, cos, row)
+        doc = match_doc(sb, row, rows, overlap, jac, cos, state.updated[oid], now)
+        state.set_floor(row, doc["floor"], doc["count"])
+        state.present[row] = True
+        ops.append(ReplaceOne({"_id": oid}, doc, upsert=True))
+        if len(ops) >= BATCH:
+            flush(out, ops)
+    flush(out, ops)
+    set_watermark(db, state)
+    if one_shot:
+        state.save()
+    print(f"✅ changed {len(changed)} | removed {len(removed)} | rows rewritten {len(redo)} "
+          f"of {len(state.updated)} | {time.perf_counter() - t0:.2f}s")
+    return state
+
+def watch(db):
+    """refresh on change-stream events; needs a replica set (Atlas is fine)"""
+    pipeline = [{"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"updateDescription.updatedFields.skills": {"$exists": True}},
+        {"updateDescription.updatedFields.updatedAt": {"$exists": True}},
+    ]}}]
+    # one full read (or the saved state), then only the users the stream names
+    state = refresh(db)
+    print(f"Watching {COLL_NAME} for skill changes...")
+    with db[COLL_NAME].watch(pipeline) as stream:
+        pending = set()
+        deadline = None
+        while stream.alive:
+            change = stream.try_next()
+            if change is not None:
+                pending.add(change["documentKey"]["_id"])
+                deadline = deadline or time.monotonic() + WATCH_DEBOUNCE_S
+                continue
+            if pending and time.monotonic() >= deadline:
+                state = refresh(db, extra_changed=pending, state=state, deletions=False)
+                pending, deadline = set(), None
+            time.sleep(0.2)
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    mode = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    db = MongoClient(MONGODB_URI)[DB_NAME]
+    if mode == "full":
+        full_rebuild(db).save()
+    elif mode == "watch":
+        watch(db)
+    else:
+        refresh(db)
+
+if __name__ == "__main__":
+    main()
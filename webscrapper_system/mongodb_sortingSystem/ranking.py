@@ -0,0 +1,56 @@
+"""
+Streaming top-K ranking shared by sorting.py and sort_events.py.
+
+Both matchers only ever show the first LIMIT rows, so instead of building a
+display dict for every candidate and sorting the whole list we keep a
+bounded min-heap of the best K score tuples seen so far and build the
+expensive display fields (sorted common tags, names, URLs) for the winners
+only.
+
+Ties come out exactly like `list.sort(key=..., reverse=True)`: an equal key
+that arrived earlier ranks higher, so output order is identical to the full
+sort.
+"""
+import heapq
+from itertools import count
+
+
+class TopK:
+    def __init__(self, k):
+        self.k = k
+        self.heap = []          # (key, -seq, item); heap[0] is the current worst
+        self.seq = count()
+        self.seen = 0
+
+    def push(self, key, item=None):
+        """offer one candidate; returns False if it could not make the top K"""
+        self.seen += 1
+        entry = (key, -next(self.seq), item)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+            return True
+        if self.k and entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+            return True
+        return False
+
+    def floor(self):
+        """key of the worst kept candidate once the heap is full (else None)"""
+        if self.k and len(self.heap) >= self.k:
+            return self.heap[0][0]
+        return None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def results(self):
+        """[(key, item)] best first"""
+        return [(key, item) for key, _, item in sorted(self.heap, reverse=True)]
+
+
+def top_k(pairs, k):
+    """(key, item) iterable -> best k (key, item) pairs, same order as a full reverse sort"""
+    tk = TopK(k)
+    for key, item in pairs:
+        tk.push(key, item)
+    return tk.results()
@@ -0,0 +1,125 @@
+"""
+LRU + TTL cache for per-viewer rankings.
+
+Keys are (kind, viewer _id, skill fingerprint, params...), so a viewer whose
+skills changed simply stops matching the old entry. Memory is bounded by
+entry count (least recently used goes first) and every entry expires after
+a TTL, which also bounds staleness for anything the invalidation below
+cannot see (e.g. the event time window moving forward).
+
+Invalidation follows membership in the cached top-K: each entry remembers
+the terms it was scored on, the _ids it returned (and its viewer) and its
+floor, the rank key of its last row (None when fewer than K matched). A
+change to user U drops the entries that list U, whose scores may have
+moved, and the entries where U's new score against their terms reaches the
+floor, which U now enters. Any other U was below the floor before and still
+is, so that ranking is unchanged. `invalidate_kind` is the blunt version
+used when a whole collection is reloaded.
+
+Every invalidation also bumps the kind's version. A caller that awaits
+between scoring and `put` takes `version(kind)` before scoring and passes
+it to `put`; if anything was invalidated meanwhile the result may already
+be stale and is not cached.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 10000
+TTL_S       = 300
+
+
+def skill_fingerprint(terms):
+    """short stable digest of a normalized term set"""
+    h = hashlib.sha1("\x1f".join(sorted(map(str, terms))).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_s=TTL_S, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self.entries = OrderedDict()   # key -> (expires, value, terms, ids, floor)
+        self.versions = {}             # kind -> invalidations so far
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0,
+                         "stale_puts": 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        e = self.entries.get(key)
+        if e is None:
+            self.counters["misses"] += 1
+            return None
+        if e[0] <= self.clock():
+            del self.entries[key]
+            self.counters["expirations"] += 1
+            self.counters["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return e[1]
+
+    def version(self, kind):
+        return self.versions.get(kind, 0)
+
+    def put(self, key, value, terms=(), ids=(), floor=None, version=None):
+        """
+        `terms` / `ids` / `floor` are what the value depends on (see invalidate);
+        with `version` (from version(key[0]) before scoring) nothing is stored if
+        the kind was invalidated since
+        """
+        if version is not None and version != self.version(key[0]):
+            self.counters["stale_puts"] += 1
+            return False
+        self.entries[key] = (self.clock() + self.ttl_s, value, frozenset(terms), frozenset(ids), floor)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+        return True
+
+    def invalidate(self, kind, ids=(), best=None):
+        """
+        drop `kind` entries that returned / were viewed by one of `ids`, or whose
+        floor `best(terms)` reaches: the best rank key one of the changed items now
+        has against the entry's terms (None when none of them matches)
+        """
+        ids = set(ids)
+        if not ids:
+            return 0
+        self.versions[kind] = self.version(kind) + 1
+
+        def moved(terms, listed, floor):
+            if listed & ids:
+                return True
+            top = best(terms) if best is not None else None
+            return top is not None and (floor is None or top >= floor)
+
+        stale = [k for k, (_, _, t, i, f) in self.entries.items() if k[0] == kind and moved(t, i, f)]
+        for k in stale:
+            del self.entries[k]
+        self.counters["invalidations"] += len(stale)
+        return len(stale)
+
+    def invalidate_kind(self, kind):
+        """the underlying collection was reloaded wholesale: bump its version, drop its entries"""
+        self.versions[kind] = self.version(kind) + 1
+        stale = [k for k in self.entries if k[0] == kind]
+        for k in stale:
+            del self.entries[k]
+        self.counters["invalidations"] += len(stale)
+        return len(stale)
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+            "versions": dict(self.versions),
+        }
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Partition-aware user matching: one SkillBits shard per state (or per
+(state, industry) with BY_INDUSTRY), scored nearest-first.
+
+A query scores the viewer's own partition first. Only when it yields fewer
+than K users with MIN_OVERLAP shared skills does it widen, tier by tier:
+
+    BY_INDUSTRY = False   own state -> every other state
+    BY_INDUSTRY = True    own (state, industry) -> same state, other industries -> everyone else
+
+Partitions within a tier are scored concurrently on a thread pool (the
+NumPy popcount / lexsort work releases the GIL), each returning its own top
+K, and the tier's results are merged on the usual key. The final list is
+everything kept so far ranked on (overlap, jaccard, cosine, updatedAt), so
+with a well-filled home partition query cost follows partition size, not
+collection size.
+
+The compound index on (state, industry) serves the loading query and
+partition-scoped reads (`load_partition`). `PartitionedBits.lazy` only
+lists the partition keys up front and reads a shard through
+`load_partition` the first time a query reaches it, so a one-off run
+(sorting.py MATCHER = "partition") reads the viewer's own partition and
+nothing else unless it has to widen.
+
+`python sharding.py`  print partition sizes and time a query per partition
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+from ranking import top_k
+from skill_bits import SkillBits
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = "cappuconnect"
+COLL_NAME   = "users_tag_spam"
+
+BY_INDUSTRY = False   # partition on (state, industry) instead of state alone
+THREADS     = min(8, os.cpu_count() or 1)
+UNKNOWN     = ""      # partition value for users missing state / industry
+
+# --- helpers ---
+def ensure_indexes(coll):
+    coll.create_index([("state", 1), ("industry", 1)])
+
+def partition_of(doc, by_industry=BY_INDUSTRY):
+    state = doc.get("state") or UNKNOWN
+    return (state, doc.get("industry") or UNKNOWN) if by_industry else (state,)
+
+def load_partition(coll, key):
+    """docs of one partition through the (state, industry) index"""
+    def match(v):
+        return v if v != UNKNOWN else {"$in": [None, UNKNOWN]}  # missing, null or ""
+    q = {"state": match(key[0]), "skills": {"$exists": True, "$ne": []}}
+    if len(key) > 1:
+        q["industry"] = match(key[1])
+    return coll.find(q, {"skills": 1, "updatedAt": 1, "state": 1, "industry": 1})
+
+def partition_keys(coll, by_industry=BY_INDUSTRY):
+    """every partition key present in the collection (grouped on the (state, industry) index)"""
+    group = {"s": "$state", "i": "$industry"} if by_industry else {"s": "$state"}
+    keys = set()
+    for d in coll.aggregate([{"$group": {"_id": group}}]):
+        keys.add(partition_of({"state": d["_id"].get("s"), "industry": d["_id"].get("i")}, by_industry))
+    return keys
+
+
+class PartitionedBits:
+    def __init__(self, by_industry=BY_INDUSTRY, threads=THREADS):
+        self.by_industry = by_industry
+        self.shards = {}    # partition key -> SkillBits
+        self.where = {}     # _id -> partition key
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.coll = None    # set by lazy(): shards not in `shards` yet are read on first use
+        self.keys = set()   # every partition key, loaded or not
+
+    @classmethod
+    def from_docs(cls, docs, by_industry=BY_INDUSTRY, threads=THREADS):
+        pb = cls(by_industry, threads)
+        groups = {}
+        for d in docs:
+            groups.setdefault(partition_of(d, by_industry), []).append(d)
+        for key, group in groups.items():
+            shard = SkillBits.from_docs(group)
+            if len(shard):
+                pb.shards[key] = shard
+                pb.where.update((i, key) for i in shard.ids)
+        pb.keys = set(pb.shards)
+        return pb
+
+    @classmethod
+    def lazy(cls, coll, by_industry=BY_INDUSTRY, threads=THREADS):
+        """partition keys only; each shard is loaded through load_partition when first scored"""
+        ensure_indexes(coll)
+        pb = cls(by_industry, threads)
+        pb.coll = coll
+        pb.keys = partition_keys(coll, by_industry)
+        return pb
+
+    def _shard(self, key):
+        shard = self.shards.get(key)
+        if shard is None and self.coll is not None and key in self.keys:
+            shard = self.shards[key] = SkillBits.from_docs(load_partition(self.coll, key))
+            self.where.update((i, key) for i in shard.ids)
+        return shard
+
+    @classmethod
+    def from_collection(cls, coll, by_industry=BY_INDUSTRY, threads=THREADS):
+        ensure_indexes(coll)
+        q = {"skills": {"$exists": True, "$ne": []}}
+        proj = {"skills": 1, "updatedAt": 1, "state": 1, "industry": 1}
+        return cls.from_docs(coll.find(q, proj).sort([("state", 1), ("industry", 1)]), by_industry, threads)
+
+    def __len__(self):
+        """users in the loaded shards"""
+        return sum(len(s) for s in self.shards.values())
+
+    def sizes(self):
+        return {k: len(s) for k, s in sorted(self.shards.items())}
+
+    def upsert(self, doc, skills):
+        """(re)place a user, moving it if its state / industry changed"""
+        key = partition_of(doc, self.by_industry)
+        old = self.where.get(doc["_id"])
+        if old is not None and old != key:
+            self.shards[old].upsert(doc["_id"], set())  # emptied rows never reach min_overlap
+        shard = self._shard(key)
+        if shard is None:
+            shard = self.shards[key] = SkillBits()
+        self.keys.add(key)
+        shard.upsert(doc["_id"], skills, doc.get("updatedAt"))
+        self.where[doc["_id"]] = key
+
+    def tiers(self, home):
+        """partition keys grouped nearest-first for a viewer in partition `home`"""
+        keys = sorted(self.keys)
+        if not self.by_industry:
+            return [[k for k in keys if k == home], [k for k in keys if k != home]]
+        return [
+            [k for k in keys if k == home],
+            [k for k in keys if k[0] == home[0] and k != home],
+            [k for k in keys if k[0] != home[0]],
+        ]
+
+    def _score(self, key, A, exclude, min_overlap, k):
+        shard = self._shard(key)
+        if not shard:
+            return []
+        rows, overlap, jac, cos = shard.rank(A, exclude=exclude, min_overlap=min_overlap, k=k)
+        return [((o, j, c, int(shard.updated[r])), (shard.ids[r], int(shard.sizes[r]), None))
+                for r, o, j, c in zip(rows.tolist(), overlap.tolist(), jac.tolist(), cos.tolist())]
+
+    def rank(self, A, home, exclude=None, min_overlap=1, k=50):
+        """
+        best k (key, (_id, other_size, None)) pairs, widening past `home` only
+        while fewer than k were found. also returns the partition keys scored.
+        """
+        found, scored = [], []
+        for tier in self.tiers(home):
+            if not tier:
+                continue
+            if len(tier) == 1:
+                parts = [self._score(tier[0], A, exclude, min_overlap, k)]
+            else:
+                parts = self.pool.map(lambda key: self._score(key, A, exclude, min_overlap, k), tier)
+            for p in parts:
+                found.extend(p)
+            scored.extend(tier)
+            if len(found) >= k:
+                break
+        return top_k(found, k), scored
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    users = MongoClient(MONGODB_URI)[DB_NAME][COLL_NAME]
+    t0 = time.perf_counter()
+    pb = PartitionedBits.from_collection(users)
+    print(f"✅ {len(pb)} users in {len(pb.shards)} partitions ({time.perf_counter() - t0:.2f}s)")
+    for key, n in pb.sizes().items():
+        shard = pb.shards[key]
+        A = shard.skills_of(0)
+        t = time.perf_counter()
+        _, scored = pb.rank(A, key, exclude=shard.ids[0])
+        ms = (time.perf_counter() - t) * 1000
+        print(f"- {' / '.join(k or '?' for k in key):32s} {n:7d} users | {ms:7.2f} ms | "
+              f"{len(scored)} partitions scored")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+"Events like this one" -> `event_neighbors`.
+
+For every event, the TOP_N most similar *upcoming* events (starting from
+now on, or undated recurring ones) by canonical tag ids, ranked on
+(jaccard, cosine, overlap, id) descending:
+
+    {_id: <event _id>, id, neighbors: [{_id, id, overlap, jaccard, cosine}, ...],
+     count, floor: [jaccard, cosine, overlap, id] of the last entry, tags, target, computedAt}
+
+so the lookup is one _id read. The events x tags incidence matrix is kept
+as CSR (all events) plus CSC over the upcoming ones, both in shared memory
+(batch_events.share). Worker processes take blocks of BLOCK source rows and
+multiply them against the target columns: every (row, tag) pair gathers
+that tag's posting list and counting repeated (row, target) keys gives the
+block's overlaps, so only pairs sharing a tag are ever touched. A block is
+split further when the postings it would gather exceed BLOCK_MAX_MB.
+
+`refresh` is incremental, in the spirit of precompute_matches.py. It
+recomputes the lists of events whose tags changed or that are new, of
+events whose list mentions an event that changed, was deleted or stopped
+being a target (it started, or was rescheduled into the past), and of
+events that a new / changed / newly upcoming event now beats (its score
+reaches that list's floor). Each list stores its own event's `target` flag,
+so a changed `starts_at` (re-ingest, event_time.py backfill) is noticed
+even though the tags are the same. Everything else is left alone.
+ingest_events.py runs it after writing; schedule it as well so expiries
+are picked up.
+
+`python similar_events.py full`     recompute every list
+`python similar_events.py refresh`  only what changed since the last run
+`python similar_events.py show ID`  print the neighbours of event `id`
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo import MongoClient, ReplaceOne, DeleteOne
+from dotenv import load_dotenv
+
+from batch_events import attach, share
+from skill_bits import ts_ms
+from vocab import get_vocab
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI    = os.getenv("MONGODB_URI")
+DB_NAME        = os.getenv("DB_NAME", "cappuconnect")
+EVENTS_COLL    = os.getenv("EVENTS_COLLECTION", "events")
+NEIGHBORS_COLL = "event_neighbors"
+META_COLL      = "matching_meta"
+META_ID        = "similar_events"
+
+TOP_N   = 20
+BLOCK   = 256     # source rows per task
+WORKERS = os.cpu_count() or 1
+BATCH   = 1000    # bulk_write batch size
+PARALLEL_MIN = 2000  # fewer source rows than this are scored in-process
+POSTING_BYTES = 40   # int64 row, offset, key + np.unique's sorted copy, per gathered posting
+BLOCK_MAX_MB = int(os.getenv("NEIGHBORS_MAX_MB", "256"))  # gathered postings per block, per worker
+
+# --- helpers ---
+def load_events(events, vocab, now):
+    """CSR tag ids over every tagged event + CSC over the upcoming ones"""
+    oids, ids, starts, indptr, indices = [], [], [], [0], []
+    for ev in events.find({}, {"tags": 1, "tag_ids": 1, "id": 1, "starts_at": 1}):
+        terms = sorted(set(ev.get("tag_ids") or vocab.encode(ev.get("tags", []))))
+        if not terms:
+            continue
+        oids.append(ev["_id"])
+        ids.append(ev.get("id") or 0)
+        starts.append(ts_ms(ev["starts_at"]) if ev.get("starts_at") is not None else -1)
+        indices.extend(terms)
+        indptr.append(len(indices))
+    starts = np.array(starts, dtype=np.int64)
+    arrays = {
+        "indptr": np.array(indptr, dtype=np.int64),
+        "indices": np.array(indices, dtype=np.int64),
+        "ids": np.array(ids, dtype=np.int64),
+        "target": (starts < 0) | (starts >= ts_ms(now)),
+    }
+    arrays["sizes"] = np.diff(arrays["indptr"])
+    arrays.update(zip(("t_ptr", "t_rows"), columns(arrays, np.nonzero(arrays["target"])[0])))
+    return oids, arrays
+
+def columns(a, rows):
+    """CSC (tag -> rows) restricted to `rows`"""
+    n_tags = int(a["indices"].max()) + 1 if len(a["indices"]) else 0
+    lens = a["sizes"][rows]
+    r = np.repeat(rows, lens)
+    t = np.concatenate([a["indices"][a["indptr"][i]:a["indptr"][i + 1]] for i in rows]) if len(rows) else \
+        np.zeros(0, dtype=np.int64)
+    order = np.lexsort((r, t))
+    ptr = np.zeros(n_tags + 1, dtype=np.int64)
+    np.add.at(ptr, t + 1, 1)
+    return np.cumsum(ptr), r[order]
+
+def row_blocks(a, rows, col_ptr, max_mb=BLOCK_MAX_MB):
+    """split rows so the postings each block gathers fit in max_mb (a single row is never split)"""
+    budget = max(1, max_mb * 2**20 // POSTING_BYTES)
+    starts, ends = a["indptr"][rows], a["indptr"][rows + 1]
+    local = np.repeat(np.arange(len(rows)), ends - starts)
+    tags = np.concatenate([a["indices"][s:e] for s, e in zip(starts.tolist(), ends.tolist())]) if len(rows) else \
+        np.zeros(0, dtype=np.int64)
+    lens = np.append(np.diff(col_ptr), 0)  # tags past the CSC's last column gather nothing
+    cost = np.bincount(local, weights=lens[np.minimum(tags, len(lens) - 1)], minlength=len(rows))
+    start, acc = 0, 0
+    for i, c in enumerate(cost.tolist()):
+        if acc and acc + c > budget:
+            yield rows[start:i]
+            start, acc = i, 0
+        acc += c
+    if start < len(rows):
+        yield rows[start:]
+
+def block_overlap(a, rows, col_ptr, col_rows):
+    """
+    sparse product of rows' tags with a CSC: (local row, column, overlap)
+    for every pair sharing at least one tag, sorted by local row
+    """
+    starts, ends = a["indptr"][rows], a["indptr"][rows + 1]
+    local = np.repeat(np.arange(len(rows)), ends - starts)
+    tags = np.concatenate([a["indices"][s:e] for s, e in zip(starts.tolist(), ends.tolist())]) if len(rows) else \
+        np.zeros(0, dtype=np.int64)
+    keep = tags < len(col_ptr) - 1
+    local, tags = local[keep], tags[keep]
+    p0 = col_ptr[tags]
+    lens = col_ptr[tags + 1] - p0
+    total = int(lens.sum())
+    if not total:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    # gather every posting of every (row, tag) pair, then count repeats of (row, column)
+    offs = np.repeat(p0 - np.concatenate([[0], np.cumsum(lens)[:-1]]), lens) + np.arange(total)
+    n = int(col_rows.max()) + 1
+    keys, counts = np.unique(np.repeat(local, lens) * n + col_rows[offs], return_counts=True)
+    return keys // n, keys % n, counts
+
+def top_neighbours(a, rows, k=TOP_N):
+    """[(row, [(target row, overlap, jaccard, cosine), ...])] for source rows"""
+    out = []
+    for block in row_blocks(a, rows, a["t_ptr"]):
+        local, cand, ov = block_overlap(a, block, a["t_ptr"], a["t_rows"])
+        bounds = np.searchsorted(local, np.arange(len(block) + 1))
+        for i, r in enumerate(block.tolist()):
+            c, o = cand[bounds[i]:bounds[i + 1]], ov[bounds[i]:bounds[i + 1]]
+            c, o = c[c != r], o[c != r]
+            jac = o / (a["sizes"][r] + a["sizes"][c] - o)
+            cos = o / np.sqrt(a["sizes"][r] * a["sizes"][c])
+            order = np.lexsort((-a["ids"][c], -o, -cos, -jac))[:k]
+            out.append((r, [(int(c[x]), int(o[x]), float(jac[x]), float(cos[x])) for x in order]))
+    return out
+
+# --- workers ---
+_blocks, _arrays = None, None
+
+def init_worker(specs):
+    global _blocks, _arrays
+    _blocks, _arrays = attach(specs)
+
+def score_block(rows):
+    return top_neighbours(_arrays, np.asarray(rows, dtype=np.int64))
+
+def compute(arrays, rows, workers=WORKERS):
+    """top lists for the given source rows, on a process pool when there are many"""
+    rows = np.asarray(rows, dtype=np.int64)
+    blocks = [rows[i:i + BLOCK] for i in range(0, len(rows), BLOCK)]
+    if workers <= 1 or len(rows) < PARALLEL_MIN:
+        for b in blocks:
+            yield from top_neighbours(arrays, b)
+        return
+    shm, specs = share(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(specs,)) as pool:
+            for res in pool.map(score_block, [b.tolist() for b in blocks]):
+                yield from res
+    finally:
+        for b in shm:
+            b.close()
+            b.unlink()
+
+def neighbour_doc(oids, a, r, nbrs, now):
+    lst = [{"_id": oids[t], "id": int(a["ids"][t]), "overlap": o, "jaccard": j, "cosine": c} for t, o, j, c in nbrs]
+    floor = [lst[-1]["jaccard"], lst[-1]["cosine"], lst[-1]["overlap"], lst[-1]["id"]] if lst else None
+    tags = a["indices"][a["indptr"][r]:a["indptr"][r + 1]].tolist()
+    return {"_id": oids[r], "id": int(a["ids"][r]), "neighbors": lst, "count": len(lst),
+            "floor": floor, "tags": tags, "target": bool(a["target"][r]), "computedAt": now}
+
+def write(coll, oids, arrays, results, now):
+    ops, n = [], 0
+    for r, nbrs in results:
+        ops.append(ReplaceOne({"_id": oids[r]}, neighbour_doc(oids, arrays, r, nbrs, now), upsert=True))
+        n += 1
+        if len(ops) >= BATCH:
+            coll.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+    return n
+
+# --- jobs ---
+def full(db, workers=WORKERS, now=None):
+    now = now or datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    oids, a = load_events(db[EVENTS_COLL], get_vocab(), now)
+    coll = db[NEIGHBORS_COLL]
+    n = write(coll, oids, a, compute(a, np.arange(len(oids)), workers), now)
+    coll.delete_many({"_id": {"$nin": oids}})
+    db[META_COLL].update_one({"_id": META_ID}, {"$set": {"last_run": now}}, upsert=True)
+    print(f"✅ {n} neighbour lists ({int(a['target'].sum())} upcoming targets) in {time.perf_counter() - t0:.2f}s")
+    return n
+
+def refresh(db, workers=WORKERS, now=None):
+    now = now or datetime.now(timezone.utc)
+    meta = db[META_COLL].find_one({"_id": META_ID})
+    if not meta:
+        return full(db, workers, now)
+    t0 = time.perf_counter()
+    oids, a = load_events(db[EVENTS_COLL], get_vocab(), now)
+    row = {o: i for i, o in enumerate(oids)}
+    coll = db[NEIGHBORS_COLL]
+    stored = {d["_id"]: d for d in coll.find({}, {"tags": 1, "target": 1, "neighbors._id": 1, "floor": 1, "count": 1})}
+    if any("target" not in d for d in stored.values()):
+        return full(db, workers, now)  # lists written before the target flag was stored
+
+    changed = [i for i, o in enumerate(oids)
+               if o not in stored or stored[o].get("tags") != a["indices"][a["indptr"][i]:a["indptr"][i + 1]].tolist()]
+    # same tags, but started / rescheduled / newly dated: became a target or stopped being one
+    flipped = [i for i, o in enumerate(oids) if o in stored and stored[o]["target"] != bool(a["target"][i])]
+    deleted = [o for o in stored if o not in row]
+    removed = set(deleted) | {oids[i] for i in changed} | {oids[i] for i in flipped if not a["target"][i]}
+
+    todo = set(changed) | set(flipped)  # flipped ones only to store the new flag
+    for o, d in stored.items():
+        if o in row and any(x["_id"] in removed for x in d.get("neighbors", [])):
+            todo.add(row[o])
+
+    # sources that a new / changed / newly upcoming event now beats
+    fresh = np.array(sorted(i for i in set(changed) | set(flipped) if a["target"][i]), dtype=np.int64)
+    if len(fresh):
+        all_ptr, all_rows = columns(a, np.arange(len(oids)))
+        for block in row_blocks(a, fresh, all_ptr):
+            local, src, ov = block_overlap(a, block, all_ptr, all_rows)
+            for t, s, o in zip(block[local].tolist(), src.tolist(), ov.tolist()):
+                d = stored.get(oids[s])
+                if s == t or s in todo or d is None:
+                    continue
+                key = [o / (a["sizes"][s] + a["sizes"][t] - o), o / np.sqrt(a["sizes"][s] * a["sizes"][t]),
+                       o, int(a["ids"][t])]
+                if d.get("count", 0) < TOP_N or d.get("floor") is None or key > d["floor"]:
+                    todo.add(s)
+
+    n = write(coll, oids, a, compute(a, sorted(todo), workers), now)
+    if deleted:
+        coll.bulk_write([DeleteOne({"_id": o}) for o in deleted], ordered=False)
+    db[META_COLL].update_one({"_id": META_ID}, {"$set": {"last_run": now}}, upsert=True)
+    print(f"✅ {n} neighbour lists recomputed ({len(changed)} new/changed events, {len(flipped)} re-dated, "
+          f"{len(removed)} removed targets, "
+          f"{len(deleted)} deleted) in {time.perf_counter() - t0:.2f}s")
+    return n
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    db = MongoClient(MONGODB_URI)[DB_NAME]
+    if cmd == "full":
+        full(db)
+    elif cmd == "show" and len(sys.argv) > 2:
+        ev = db[EVENTS_COLL].find_one({"id": int(sys.argv[2])}, {"name": 1})
+        doc = db[NEIGHBORS_COLL].find_one({"_id": ev["_id"]}) if ev else None
+        if not doc:
+            print("❌ no neighbour list for that event")
+            return
+        print(f"Events like: {ev.get('name', '')}")
+        names = {e["_id"]: e.get("name", "") for e in
+                 db[EVENTS_COLL].find({"_id": {"$in": [x["_id"] for x in doc["neighbors"]]}}, {"name": 1})}
+        for x in doc["neighbors"]:
+            print(f"- {names.get(x['_id'], '')[:48]:48s} | overlap={x['overlap']:2d} | "
+                  f"jaccard={x['jaccard']:.3f} | cosine={x['cosine']:.3f}")
+    else:
+        refresh(db)
+
+if __name__ == "__main__":
+    main()
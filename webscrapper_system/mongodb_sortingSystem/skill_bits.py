@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Bit-packed skill vectors + vectorized batch scoring.
+
+The skill vocabulary is closed (SKILLS in usermaker/fakeusers.py, ~230
+entries) so every user's skill set fits in a handful of uint64 words. Scoring
+one viewer against everybody is then `popcount(M & v)` over an (n, words)
+matrix instead of a Python set intersection per candidate, and all-pairs
+overlap is a dense 0/1 matrix product done in row blocks.
+
+Skills outside SKILLS (older hand-made profiles) get appended to the
+vocabulary on the fly, so nothing is dropped.
+
+Ranking matches the sort key in sorting.py:
+    (overlap, jaccard, cosine, updatedAt) descending, ties in input order.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from sorting import norm_skills
+from vocab import load_fakeusers_constant
+
+FAKEUSERS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "usermaker", "fakeusers.py"
+)
+
+WORD_BITS = 64
+EPOCH     = datetime(1970, 1, 1)
+PAIR_BYTES = 64   # per cell of an all-pairs block: product, overlap, union, jaccard, cosine + temporaries
+
+# --- helpers ---
+def load_skill_vocab(path=FAKEUSERS_PATH):
+    """normalized SKILLS from fakeusers.py, in file order"""
+    out, seen = [], set()
+    for s in load_fakeusers_constant("SKILLS", path):
+        t = s.strip().lower()
+        if t and t not in seen:
+            seen.add(t)
+            out.append(t)
+    return out
+
+if hasattr(np, "bitwise_count"):
+    def popcount(words):
+        """per-row popcount of an (n, words) uint64 array"""
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        """per-row popcount of an (n, words) uint64 array"""
+        b = np.ascontiguousarray(words).view(np.uint8)
+        return _POP8[b].sum(axis=-1, dtype=np.int64)
+
+def ts_ms(dt):
+    """updatedAt -> int ms for the tiebreak column (missing counts as 0, like `or 0` in sorting.py)"""
+    if dt is None:
+        return 0
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - EPOCH) // timedelta(milliseconds=1)
+
+
+class SkillBits:
+    def __init__(self, vocab=None):
+        self.vocab = {}                     # normalized skill -> bit
+        for s in vocab if vocab is not None else load_skill_vocab():
+            self.vocab.setdefault(s, len(self.vocab))
+        self.ids = []                       # row -> _id
+        self.row = {}                       # _id -> row
+        self.bits = np.zeros((0, self.words), dtype=np.uint64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.updated = np.zeros(0, dtype=np.int64)
+        self._inv = []                      # bit -> skill, rebuilt when the vocabulary grows
+
+    @property
+    def words(self):
+        return max(1, -(-len(self.vocab) // WORD_BITS))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def pack(self, skills):
+        """normalized skill set -> uint64 word vector (grows the vocabulary if needed)"""
+        for s in skills:
+            self.vocab.setdefault(s, len(self.vocab))
+        v = np.zeros(self.words, dtype=np.uint64)
+        for s in skills:
+            b = self.vocab[s]
+            v[b // WORD_BITS] |= np.uint64(1) << np.uint64(b % WORD_BITS)
+        return v
+
+    def _widen(self):
+        if self.bits.shape[1] < self.words:
+            pad = np.zeros((len(self.bits), self.words - self.bits.shape[1]), dtype=np.uint64)
+            self.bits = np.hstack([self.bits, pad])
+
+    @classmethod
+    def from_docs(cls, docs, vocab=None):
+        """rows from user docs with _id, skills, updatedAt (users with no skills are skipped)"""
+        sb = cls(vocab)
+        sets, ids, upd = [], [], []
+        for d in docs:
+            B = norm_skills(d.get("skills", []))
+            if not B:
+                continue
+            for s in B:
+                sb.vocab.setdefault(s, len(sb.vocab))
+            sets.append(B)
+            ids.append(d["_id"])
+            upd.append(ts_ms(d.get("updatedAt")))
+
+        sb.ids = ids
+        sb.row = {i: r for r, i in enumerate(ids)}
+        sb.bits = np.zeros((len(sets), sb.words), dtype=np.uint64)
+        for r, B in enumerate(sets):
+            sb.bits[r] = sb.pack(B)
+        sb.sizes = popcount(sb.bits)
+        sb.updated = np.array(upd, dtype=np.int64)
+        return sb
+
+    @classmethod
+    def from_csr(cls, ids, indptr, indices, updated, vocab):
+        """rows from CSR term-id arrays (snapshot.py); `vocab` lists the terms by id"""
+        sb = cls(vocab)
+        n = len(ids)
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        sb.ids = list(ids)
+        sb.row = {i: r for r, i in enumerate(sb.ids)}
+        sb.bits = np.zeros((n, sb.words), dtype=np.uint64)
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        np.bitwise_or.at(sb.bits, (rows, indices // WORD_BITS),
+                         np.left_shift(np.uint64(1), (indices % WORD_BITS).astype(np.uint64)))
+        sb.sizes = np.diff(indptr)
+        sb.updated = np.array(updated, dtype=np.int64)
+        return sb
+
+    @classmethod
+    def from_collection(cls, coll, vocab=None):
+        q = {"skills": {"$exists": True, "$ne": []}}
+        return cls.from_docs(coll.find(q, {"skills": 1, "updatedAt": 1}), vocab)
+
+    def append(self, _id, skills, updated=None):
+        v = self.pack(skills)
+        self._widen()
+        self.row[_id] = len(self.ids)
+        self.ids.append(_id)
+        self.bits = np.vstack([self.bits, v[None, :]])
+        self.sizes = np.append(self.sizes, len(skills))
+        self.updated = np.append(self.updated, ts_ms(updated))
+
+    def upsert(self, _id, skills, updated=None):
+        """overwrite a row in place (or append); an emptied skill set just zeroes the row"""
+        r = self.row.get(_id)
+        if r is None:
+            if skills:
+                self.append(_id, skills, updated)
+            return
+        v = self.pack(skills)
+        self._widen()
+        self.bits[r] = v
+        self.sizes[r] = len(skills)
+        self.updated[r] = ts_ms(updated)
+
+    def upsert_many(self, items):
+        """
+        upsert for a batch of (_id, skills, updated): known rows are overwritten
+        in place and every new one is appended with a single copy of the matrix
+        """
+        new = {}
+        for _id, skills, updated in items:
+            if _id in self.row:
+                self.upsert(_id, skills, updated)
+            elif skills or _id in new:
+                new[_id] = (self.pack(skills), len(skills), ts_ms(updated))
+        if not new:
+            return
+        self._widen()
+        block = np.zeros((len(new), self.words), dtype=np.uint64)
+        for i, (v, _, _) in enumerate(new.values()):
+            block[i, :len(v)] = v
+        for _id in new:
+            self.row[_id] = len(self.ids)
+            self.ids.append(_id)
+        self.bits = np.vstack([self.bits, block])
+        self.sizes = np.append(self.sizes, [n for _, n, _ in new.values()])
+        self.updated = np.append(self.updated, [u for _, _, u in new.values()])
+
+    def copy(self):
+        """independent copy (vocabulary included) that can be updated while this one is read"""
+        sb = type(self)(vocab=())
+        sb.vocab = dict(self.vocab)
+        sb.ids = list(self.ids)
+        sb.row = dict(self.row)
+        sb.bits, sb.sizes, sb.updated = self.bits.copy(), self.sizes.copy(), self.updated.copy()
+        return sb
+
+    def skills_of(self, row):
+        """normalized skill set stored in one row"""
+        if len(self._inv) != len(self.vocab):  # the vocabulary only ever grows
+            self._inv = sorted(self.vocab, key=self.vocab.get)
+        inv = self._inv
+        b = np.ascontiguousarray(self.bits[row]).view(np.uint8)
+        on = np.nonzero(np.unpackbits(b, bitorder="little"))[0]
+        return {inv[i] for i in on.tolist()}
+
+    # --- scoring ---
+    def score(self, v, a_size=None):
+        """overlap / jaccard / cosine of one packed viewer vector against every row"""
+        a = int(popcount(v[None, :])[0]) if a_size is None else a_size
+        width = self.bits.shape[1]
+        if len(v) < width:
+            v = np.concatenate([v, np.zeros(width - len(v), dtype=np.uint64)])
+        elif len(v) > width:
+            v = v[:width]  # bits past the matrix are skills nobody else has
+        overlap = popcount(self.bits & v)
+        union = a + self.sizes - overlap
+        with np.errstate(divide="ignore", invalid="ignore"):
+            jac = np.where(union > 0, overlap / union, 0.0)
+            cos = np.where(self.sizes > 0, overlap / np.sqrt(a * self.sizes), 0.0) if a else np.zeros(len(overlap))
+        return overlap, jac, cos
+
+    def rank(self, A, exclude=None, min_overlap=1, k=None, ties=None):
+        """
+        rows ordered like sorting.py's results.sort for a normalized skill set A.
+        `ties` are extra descending tiebreak columns after cosine, primary first
+        (default: updatedAt). returns (rows, overlap, jaccard, cosine) in rank order.
+        """
+        v = self.pack(A)
+        overlap, jac, cos = self.score(v, len(A))
+        keep = overlap >= min_overlap
+        if exclude in self.row:
+            keep[self.row[exclude]] = False
+        rows = np.nonzero(keep)[0]
+        # lexsort is stable and the last key is primary; negate for descending
+        ties = (self.updated,) if ties is None else ties
+        keys = [-t[rows] for t in reversed(ties)] + [-cos[rows], -jac[rows], -overlap[rows]]
+        order = np.lexsort(keys)
+        rows = rows[order]
+        if k is not None:
+            rows = rows[:k]
+        return rows, overlap[rows], jac[rows], cos[rows]
+
+    def dense(self, rows=slice(None)):
+        """0/1 float32 incidence matrix for the given rows (exact integer dot products below 2**24)"""
+        b = np.ascontiguousarray(self.bits[rows]).view(np.uint8)
+        return np.unpackbits(b, axis=1, bitorder="little")[:, :len(self.vocab)].astype(np.float32)
+
+    def all_pairs(self, block=2048, max_mb=512):
+        """
+        yields (start, overlap, jaccard, cosine) for row blocks [start, start+block) x all rows.
+        diagonal entries are the self-pairs; callers mask them as needed. a block is
+        block x n result cells plus two block x vocab dense slices (the rows, and the
+        column block they are multiplied with), so block shrinks with n to keep it
+        under max_mb; the whole n x vocab matrix is never densified.
+        """
+        n = len(self.ids)
+        cell = PAIR_BYTES * max(n, 1) + 2 * 4 * len(self.vocab)
+        block = max(1, min(block, (max_mb << 20) // cell))
+        b = self.sizes[None, :]
+        for start in range(0, n, block):
+            X = self.dense(slice(start, start + block))
+            overlap = np.empty((len(X), n), dtype=np.int64)
+            for col in range(0, n, block):
+                Y = X if col == start else self.dense(slice(col, col + block))
+                overlap[:, col:col + block] = X @ Y.T
+            a = self.sizes[start:start + block, None]
+            union = a + b - overlap
+            with np.errstate(divide="ignore", invalid="ignore"):
+                jac = np.where(union > 0, overlap / union, 0.0)
+                cos = np.where((a > 0) & (b > 0), overlap / np.sqrt(a * b), 0.0)
+            yield start, overlap, jac, cos
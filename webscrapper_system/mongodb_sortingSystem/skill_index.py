@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Inverted skill -> user index for the users_tag_spam matcher.
+
+Instead of streaming every user and rebuilding a set per document, we keep
+one posting list (set of dense user slots) per normalized skill. Scoring a
+viewer is a merge of the viewer's posting lists: only users that share at
+least one skill are ever touched, and overlap/jaccard/cosine fall out of the
+per-user hit count plus the stored skill-set sizes.
+
+The index is pickled to INDEX_PATH and kept fresh with an updatedAt watermark
+(`refresh`) so it is built once and then updated incrementally.
+"""
+import os
+import pickle
+from collections import Counter
+from math import sqrt
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+from sorting import norm_skills
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = "cappuconnect"
+COLL_NAME   = "users_tag_spam"
+INDEX_PATH  = os.getenv(
+    "SKILL_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_index.pkl"),
+)
+
+PROJECTION = {"skills": 1, "updatedAt": 1}
+
+
+class SkillIndex:
+    def __init__(self):
+        self.postings = {}      # skill -> set of slots
+        self.ids = []           # slot -> ObjectId (None once removed)
+        self.slot = {}          # ObjectId -> slot
+        self.skills = []        # slot -> frozenset of normalized skills
+        self.updated = []       # slot -> updatedAt (ranking tiebreak)
+        self.free = []          # slots released by remove(), reused on add
+        self.watermark = None   # newest updatedAt applied so far
+
+    def __len__(self):
+        return len(self.slot)
+
+    # --- maintenance ---
+    def upsert(self, doc):
+        """(re)index one user doc with _id, skills, updatedAt"""
+        oid = doc["_id"]
+        skills = frozenset(norm_skills(doc.get("skills", [])))
+        updated = doc.get("updatedAt")
+
+        s = self.slot.get(oid)
+        if s is None:
+            if not skills:
+                return
+            if self.free:
+                s = self.free.pop()
+                self.ids[s] = oid
+                self.skills[s] = frozenset()
+                self.updated[s] = None
+            else:
+                s = len(self.ids)
+                self.ids.append(oid)
+                self.skills.append(frozenset())
+                self.updated.append(None)
+            self.slot[oid] = s
+        elif not skills:
+            self.remove(oid)
+            return
+
+        old = self.skills[s]
+        for k in old - skills:
+            plist = self.postings.get(k)
+            if plist is not None:
+                plist.discard(s)
+                if not plist:
+                    del self.postings[k]
+        for k in skills - old:
+            self.postings.setdefault(k, set()).add(s)
+
+        self.skills[s] = skills
+        self.updated[s] = updated
+        if updated is not None and (self.watermark is None or updated > self.watermark):
+            self.watermark = updated
+
+    def remove(self, oid):
+        s = self.slot.pop(oid, None)
+        if s is None:
+            return
+        for k in self.skills[s]:
+            plist = self.postings.get(k)
+            if plist is not None:
+                plist.discard(s)
+                if not plist:
+                    del self.postings[k]
+        self.ids[s] = None
+        self.skills[s] = frozenset()
+        self.updated[s] = None
+        self.free.append(s)
+
+    def build(self, coll):
+        """full rebuild from the users collection"""
+        self.__init__()
+        for doc in coll.find({"skills": {"$exists": True, "$ne": []}}, PROJECTION):
+            self.upsert(doc)
+        return self
+
+    def refresh(self, coll):
+        """apply users changed since the watermark; returns how many were applied"""
+        q = {}
+        if self.watermark is not None:
+            q["updatedAt"] = {"$gt": self.watermark}
+        n = 0
+        for doc in coll.find(q, PROJECTION):
+            self.upsert(doc)
+            n += 1
+        return n
+
+    def prune(self, coll):
+        """drop users that were deleted from the collection (watermark can't see deletes)"""
+        alive = {d["_id"] for d in coll.find({}, {"_id": 1})}
+        gone = [oid for oid in self.slot if oid not in alive]
+        for oid in gone:
+            self.remove(oid)
+        return len(gone)
+
+    # --- scoring ---
+    def score(self, A, exclude=None, min_overlap=1):
+        """
+        posting-list merge for a normalized viewer skill set A.
+        yields (ObjectId, overlap, jaccard, cosine, other_size, updatedAt) for
+        every indexed user sharing >= min_overlap skills with A.
+        """
+        if not A:
+            return
+        counts = Counter()
+        for k in A:
+            plist = self.postings.get(k)
+            if plist:
+                counts.update(plist)
+
+        skip = self.slot.get(exclude) if exclude is not None else None
+        a = len(A)
+        for s, inter in counts.items():
+            if inter < min_overlap or s == skip:
+                continue
+            b = len(self.skills[s])
+            union = a + b - inter
+            yield (
+                self.ids[s],
+                inter,
+                inter / union if union else 0.0,
+                inter / sqrt(a * b),
+                b,
+                self.updated[s],
+            )
+
+    # --- persistence ---
+    def save(self, path=INDEX_PATH):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        idx = cls()
+        with open(path, "rb") as f:
+            idx.__dict__.update(pickle.load(f))
+        return idx
+
+
+def load_or_build(coll, path=INDEX_PATH):
+    """load the pickled index and catch it up, or build it from scratch"""
+    if os.path.exists(path):
+        idx = SkillIndex.load(path)
+        if idx.refresh(coll):
+            idx.save(path)
+        return idx
+    idx = SkillIndex().build(coll)
+    idx.save(path)
+    return idx
+
+
+def main():
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+
+    client = MongoClient(MONGODB_URI)
+    users = client[DB_NAME][COLL_NAME]
+
+    idx = SkillIndex().build(users)
+    idx.save()
+    sizes = sorted((len(p) for p in idx.postings.values()), reverse=True)
+    print(f"✅ Indexed {len(idx)} users over {len(idx.postings)} skills -> {INDEX_PATH}")
+    if sizes:
+        print(f"   longest posting list: {sizes[0]} | median: {sizes[len(sizes) // 2]}")
+
+
+if __name__ == "__main__":
+    main()
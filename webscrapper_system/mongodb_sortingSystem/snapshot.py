@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Columnar on-disk snapshot of users and events for fast cold starts.
+
+A snapshot is a directory of plain .npy arrays plus meta.json:
+
+    users_oid.npy      (n, 12) uint8   ObjectId bytes
+    users_indptr.npy   (n+1,)  int64   CSR row offsets into users_indices
+    users_indices.npy  (nnz,)  int32   term ids into meta["user_terms"] (norm_skills strings)
+    users_updated.npy  (n,)    int64   updatedAt, ms since epoch (0 = missing)
+    events_oid.npy / events_indptr.npy / events_indices.npy (canonical vocab tag ids)
+    events_attendees.npy int32, events_starts.npy int64 (ms, -1 = undated), events_id.npy int64
+
+User terms keep sorting.py's normalization (lowercase/trim) so user-user
+scores are unchanged; events use the vocab.py ids sort_events.py matches on.
+
+`Snapshot.load()` memory-maps every array (mmap_mode="r"), so loading is a
+few page-table entries and worker processes share the same page cache.
+`delta()` brings a snapshot up to date from Mongo: users changed since the
+users watermark are replaced in place (same row order), and the events,
+which are small, are re-read. Deleted users are only dropped by a full export.
+
+`python snapshot.py export [DIR]`   full export from Mongo
+`python snapshot.py delta [DIR]`    apply changes since the snapshot was taken
+`python snapshot.py info [DIR]`     sizes and watermarks
+"""
+import json
+import os
+import shutil
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+from attendees_count import with_counts
+from skill_bits import SkillBits, ts_ms
+from sorting import norm_skills
+from vocab import get_vocab
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI   = os.getenv("MONGODB_URI")
+DB_NAME       = os.getenv("DB_NAME", "cappuconnect")
+USERS_COLL    = "users_tag_spam"
+EVENTS_COLL   = "events"
+SNAPSHOT_DIR  = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot"))
+FORMAT        = 1
+
+USER_PROJ  = {"skills": 1, "updatedAt": 1}
+EVENT_PROJ = {"tags": 1, "tag_ids": 1, "attendees_count": 1, "id": 1, "starts_at": 1}
+
+# --- helpers ---
+def oid_bytes(oids):
+    return np.frombuffer(b"".join(o.binary for o in oids), dtype=np.uint8).reshape(-1, 12)
+
+def ms_to_dt(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc) if ms else None
+
+
+class CSRBuilder:
+    """appends one term-id row at a time"""
+    def __init__(self):
+        self.indptr = array("q", [0])
+        self.indices = array("i")
+
+    def add(self, ids):
+        self.indices.extend(sorted(ids))
+        self.indptr.append(len(self.indices))
+
+    def arrays(self):
+        return np.frombuffer(self.indptr, dtype=np.int64).copy(), np.frombuffer(self.indices, dtype=np.int32).copy()
+
+
+class Snapshot:
+    def __init__(self, arrays, meta):
+        self.a = arrays      # name -> ndarray (memory-mapped after load)
+        self.meta = meta
+
+    # --- building ---
+    @staticmethod
+    def user_columns(docs, terms=None, keep_empty=False):
+        """user docs -> (columns, term list); `terms` extends an existing term list"""
+        terms = list(terms or [])
+        tid = {t: i for i, t in enumerate(terms)}
+        oids, updated = [], array("q")
+        csr = CSRBuilder()
+        for d in docs:
+            B = norm_skills(d.get("skills", []))
+            if not B and not keep_empty:
+                continue
+            row = []
+            for s in B:
+                i = tid.get(s)
+                if i is None:
+                    i = tid[s] = len(terms)
+                    terms.append(s)
+                row.append(i)
+            csr.add(row)
+            oids.append(d["_id"])
+            updated.append(ts_ms(d.get("updatedAt")))
+        indptr, indices = csr.arrays()
+        cols = {
+            "users_oid": oid_bytes(oids),
+            "users_indptr": indptr,
+            "users_indices": indices,
+            "users_updated": np.frombuffer(updated, dtype=np.int64).copy(),
+        }
+        return cols, terms
+
+    @staticmethod
+    def event_columns(docs, vocab):
+        oids, attendees, starts, ids = [], array("i"), array("q"), array("q")
+        csr = CSRBuilder()
+        for ev in docs:
+            terms = ev.get("tag_ids") or vocab.encode(ev.get("tags", []))
+            if not terms:
+                continue
+            csr.add(terms)
+            oids.append(ev["_id"])
+            attendees.append(ev["attendees_count"])
+            starts.append(ts_ms(ev["starts_at"]) if ev.get("starts_at") is not None else -1)
+            ids.append(ev.get("id") or 0)
+        indptr, indices = csr.arrays()
+        return {
+            "events_oid": oid_bytes(oids),
+            "events_indptr": indptr,
+            "events_indices": indices,
+            "events_attendees": np.frombuffer(attendees, dtype=np.int32).copy(),
+            "events_starts": np.frombuffer(starts, dtype=np.int64).copy(),
+            "events_id": np.frombuffer(ids, dtype=np.int64).copy(),
+        }
+
+    @classmethod
+    def export(cls, db, vocab=None):
+        vocab = get_vocab() if vocab is None else vocab
+        users, terms = cls.user_columns(db[USERS_COLL].find({"skills": {"$exists": True, "$ne": []}}, USER_PROJ))
+        events = cls.event_columns(with_counts(db[EVENTS_COLL], db[EVENTS_COLL].find({}, EVENT_PROJ)), vocab)
+        meta = {
+            "format": FORMAT,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "user_terms": terms,
+            "vocab_size": len(vocab),
+            "users": int(len(users["users_updated"])),
+            "events": int(len(events["events_id"])),
+            "users_watermark_ms": int(users["users_updated"].max()) if len(users["users_updated"]) else 0,
+        }
+        return cls({**users, **events}, meta)
+
+    # --- io ---
+    def save(self, path=SNAPSHOT_DIR):
+        """write to a sibling temp dir, then swap it in, so readers never see a half-written snapshot"""
+        tmp = path.rstrip("/") + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, arr in self.a.items():
+            np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(arr))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        old = path.rstrip("/") + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_DIR, mmap=True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"snapshot format {meta.get('format')} != {FORMAT}; re-export it")
+        arrays = {}
+        for fn in os.listdir(path):
+            if fn.endswith(".npy"):
+                arrays[fn[:-4]] = np.load(os.path.join(path, fn), mmap_mode="r" if mmap else None)
+        return cls(arrays, meta)
+
+    # --- views ---
+    def user_ids(self):
+        return [ObjectId(b.tobytes()) for b in self.a["users_oid"]]
+
+    def event_ids(self):
+        return [ObjectId(b.tobytes()) for b in self.a["events_oid"]]
+
+    def user_bits(self):
+        """SkillBits over the users, built straight from the CSR arrays (no per-user sets)"""
+        return SkillBits.from_csr(self.user_ids(), self.a["users_indptr"], self.a["users_indices"],
+                                  self.a["users_updated"], vocab=self.meta["user_terms"])
+
+    def user_sets(self):
+        """_id -> normalized skill set (for the set-based matchers)"""
+        terms, indptr, indices = self.meta["user_terms"], self.a["users_indptr"], self.a["users_indices"]
+        return {oid: {terms[t] for t in indices[indptr[r]:indptr[r + 1]].tolist()}
+                for r, oid in enumerate(self.user_ids())}
+
+    # --- delta ---
+    def apply_users(self, docs):
+        """replace changed users' rows in place (new users appended); returns rows touched"""
+        # emptied skill lists become zero-length rows (they can no longer match anyone)
+        new_cols, terms = self.user_columns(docs, self.meta["user_terms"], keep_empty=True)
+        row_of = self.user_ids_index()
+        indptr = np.asarray(self.a["users_indptr"])
+        indices = np.asarray(self.a["users_indices"])
+        lengths = np.diff(indptr)
+        oids = np.array(self.a["users_oid"])
+        updated = np.array(self.a["users_updated"])
+
+        rows_new = []
+        appended = []
+        c_indptr, c_indices = new_cols["users_indptr"], new_cols["users_indices"]
+        for j, b in enumerate(new_cols["users_oid"]):
+            r = row_of.get(b.tobytes())
+            row_terms = c_indices[c_indptr[j]:c_indptr[j + 1]]
+            if r is None:
+                appended.append((b, row_terms, new_cols["users_updated"][j]))
+            else:
+                rows_new.append((r, row_terms))
+                updated[r] = new_cols["users_updated"][j]
+        if not rows_new and not appended:
+            self.meta["user_terms"] = terms
+            return 0
+
+        lengths = lengths.copy()
+        is_changed = np.zeros(len(lengths), dtype=bool)
+        for r, row_terms in rows_new:
+            lengths[r] = len(row_terms)
+            is_changed[r] = True
+        all_lengths = np.concatenate([lengths, [len(t) for _, t, _ in appended]]).astype(np.int64)
+        out_ptr = np.zeros(len(all_lengths) + 1, dtype=np.int64)
+        np.cumsum(all_lengths, out=out_ptr[1:])
+        out_idx = np.empty(out_ptr[-1], dtype=np.int32)
+
+        # unchanged rows: one vectorized scatter of their elements to the new offsets
+        el_row = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        keep = ~is_changed[el_row]
+        src = np.nonzero(keep)[0]
+        out_idx[out_ptr[el_row[src]] + (src - indptr[el_row[src]])] = indices[src]
+        for r, row_terms in rows_new:
+            out_idx[out_ptr[r]:out_ptr[r + 1]] = row_terms
+        base = len(lengths)
+        for k, (_, row_terms, _) in enumerate(appended):
+            out_idx[out_ptr[base + k]:out_ptr[base + k + 1]] = row_terms
+
+        if appended:
+            oids = np.vstack([oids, np.stack([b for b, _, _ in appended])])
+            updated = np.concatenate([updated, np.array([u for _, _, u in appended], dtype=np.int64)])
+        self.a.update({"users_oid": oids, "users_indptr": out_ptr, "users_indices": out_idx, "users_updated": updated})
+        self.meta["user_terms"] = terms
+        self.meta["users"] = int(len(updated))
+        self.meta["users_watermark_ms"] = int(updated.max()) if len(updated) else 0
+        return len(rows_new) + len(appended)
+
+    def user_ids_index(self):
+        return {b.tobytes(): r for r, b in enumerate(self.a["users_oid"])}
+
+    def delta(self, db, vocab=None):
+        """pull users changed since the watermark and re-read events; returns users touched"""
+        vocab = get_vocab() if vocab is None else vocab
+        mark = ms_to_dt(self.meta.get("users_watermark_ms", 0))
+        q = {"updatedAt": {"$gt": mark}} if mark else {}
+        touched = self.apply_users(db[USERS_COLL].find(q, USER_PROJ))
+        self.a.update(self.event_columns(with_counts(db[EVENTS_COLL], db[EVENTS_COLL].find({}, EVENT_PROJ)), vocab))
+        self.meta["events"] = int(len(self.a["events_id"]))
+        self.meta["vocab_size"] = len(vocab)
+        self.meta["created_at"] = datetime.now(timezone.utc).isoformat()
+        return touched
+
+    def info(self):
+        size = sum(a.nbytes for a in self.a.values())
+        return (f"{self.meta['users']} users ({len(self.meta['user_terms'])} terms, "
+                f"{len(self.a['users_indices'])} skill refs) | {self.meta['events']} events | "
+                f"{size / 1024 / 1024:.1f} MiB | users watermark {ms_to_dt(self.meta['users_watermark_ms'])} | "
+                f"taken {self.meta['created_at']}")
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "info"
+    path = sys.argv[2] if len(sys.argv) > 2 else SNAPSHOT_DIR
+    if cmd == "info":
+        t0 = time.perf_counter()
+        snap = Snapshot.load(path)
+        print(f"loaded in {(time.perf_counter() - t0) * 1000:.1f} ms: {snap.info()}")
+        return
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    db = MongoClient(MONGODB_URI)[DB_NAME]
+    t0 = time.perf_counter()
+    if cmd == "export":
+        snap = Snapshot.export(db)
+    elif cmd == "delta":
+        snap = Snapshot.load(path, mmap=False)
+        n = snap.delta(db)
+        print(f"{n} users changed since the snapshot")
+    else:
+        print("usage: python snapshot.py export|delta|info [DIR]")
+        return
+    snap.save(path)
+    print(f"✅ {snap.info()} -> {path} in {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
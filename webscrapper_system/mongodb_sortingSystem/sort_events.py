@@ -3,8 +3,16 @@ from pymongo import MongoClient
 from bson import ObjectId
 from math import sqrt
 import os
+import time
+from datetime import timezone
 from dotenv import load_dotenv
 
+import instrument
+from attendees_count import COUNT_EXPR, with_counts
+from event_time import window_filter
+from ranking import TopK
+from vocab import get_vocab, slugify
+
 # Load .env for MONGODB_URI and optional names
 load_dotenv()
 
@@ -18,6 +26,9 @@ USER_ID       = ObjectId("68cf43d576605996e6594c5b")  # << replace with your vie
 LIMIT         = 50
 MIN_OVERLAP   = 1    # set to 2/3 to hide weak matches
 PREFILTER     = True # use $in prefilter on events.tags (faster)
+RANK_MODE     = "server"  # "server": aggregation pipeline, "client": score in Python, "compare": run both
+USE_TAG_IDS   = True # match on canonical vocab ids (vocab.py); events without tag_ids fall back to their tags
+WINDOW_DAYS   = 14   # only events starting in the next N days (+ undated recurring ones); None = no time filter
 
 # --- helpers ---
 def norm_list_str(values):
@@ -49,82 +60,59 @@ def main():
         print("❌ MONGODB_URI is missing. Set it in your .env")
         return
 
-    client = MongoClient(MONGODB_URI)
+    inst = instrument.start("sort_events")  # MATCH_INSTRUMENT=1 to record stage timings
+    client = MongoClient(MONGODB_URI, event_listeners=inst.listeners())
     db = client[DB_NAME]
     users  = db["users_tag_spam"]
     events = db["events"]
 
     # 1) Load viewer and skills
-    me = users.find_one(
-        {"_id": USER_ID},
-        {"firstname": 1, "lastname": 1, "email": 1, "skills": 1}
-    )
+    with inst.stage("load_viewer"):
+        me = users.find_one(
+            {"_id": USER_ID},
+            {"firstname": 1, "lastname": 1, "email": 1, "skills": 1}
+        )
     if not me:
         print("❌ Viewer not found; check USER_ID.")
         return
 
-    A = norm_list_str(me.get("skills", []))
+    with inst.stage("viewer_terms"):
+        A = viewer_terms(me)
     if not A:
         print("❌ Viewer has no skills.")
         return
 
     print(f"\nViewer: {me.get('firstname','')} {me.get('lastname','')} <{me.get('email','')}>")
-    print("Skills:", ", ".join(sorted(A)))
+    print("Skills:", ", ".join(show_terms(A)))
 
     # 2) Fetch events; optional prefilter on tags
-    q = {"tags": {"$exists": True, "$ne": []}}
-    if PREFILTER and A:
-        q["tags"] = {"$in": list(A)}
-
-    proj = {
-        "id": 1, "name": 1, "time": 1, "venue": 1, "address": 1, "host": 1,
-        "image_url": 1, "cleaned_url": 1, "map_url": 1,
-        "tags": 1, "attendees": 1
-    }
-
-    results = []
-    for ev in events.find(q, proj):
-        tags = norm_list_str(ev.get("tags", []))
-        if not tags:
-            continue
-        inter = A & tags
-        if len(inter) < MIN_OVERLAP:
-            continue
-
-        row = {
-            "_id": str(ev["_id"]),
-            "id": ev.get("id"),
-            "name": ev.get("name", ""),
-            "time": ev.get("time", ""),
-            "venue": ev.get("venue", ""),
-            "address": ev.get("address", ""),
-            "host": ev.get("host", ""),
-            "image_url": ev.get("image_url", ""),
-            "cleaned_url": ev.get("cleaned_url", ""),
-            "map_url": ev.get("map_url", ""),
-            "tags": sorted(list(tags)),
-            "attendees_count": len(ev.get("attendees") or []),
-
-            "overlap": len(inter),
-            "jaccard": jaccard(A, tags),
-            "cosine": cosine_binary(A, tags),
-            "common": sorted(list(inter)),
-        }
-        results.append(row)
+    q = event_query(A)
+
+    if RANK_MODE == "compare":
+        t0 = time.perf_counter()
+        client_rows = rank_client(events, A, q)
+        t1 = time.perf_counter()
+        results = rank_server(events, A, q)
+        t2 = time.perf_counter()
+        same = [r["_id"] for r in client_rows] == [r["_id"] for r in results]
+        print(f"\nclient: {(t1 - t0) * 1000:.1f} ms | server: {(t2 - t1) * 1000:.1f} ms | "
+              f"same order: {'✅' if same else '❌'}")
+    elif RANK_MODE == "server":
+        with inst.stage("rank_server"):
+            results = rank_server(events, A, q)
+    else:
+        with inst.stage("rank_client"):
+            results = rank_client(events, A, q)
+    inst.count("returned", len(results))
+    inst.finish(rank_mode=RANK_MODE, limit=LIMIT, use_tag_ids=USE_TAG_IDS, window_days=WINDOW_DAYS)
 
     if not results:
         print("\nNo matching events found.")
         return
 
-    # 3) Sort strong matches first
-    results.sort(
-        key=lambda r: (r["overlap"], r["jaccard"], r["cosine"], r["attendees_count"], r.get("id") or 0),
-        reverse=True
-    )
-
     # 4) Print top N
     print(f"\nTop events (MIN_OVERLAP={MIN_OVERLAP}):")
-    for r in results[:LIMIT]:
+    for r in results:
         name = (r["name"] or "").strip()
         print(
             f"- {name[:48]:48s} | overlap={r['overlap']:2d} | "
@@ -132,6 +120,206 @@ def main():
             f"common={', '.join(r['common'])}"
         )
 
+def viewer_terms(me):
+    # always from `skills`: the app edits skills and never rewrites a stored skill_ids
+    if USE_TAG_IDS:
+        return set(get_vocab().encode(me.get("skills", [])))
+    return norm_list_str(me.get("skills", []))
+
+def event_terms(ev):
+    if USE_TAG_IDS:
+        # events written outside ingest_events / `vocab.py migrate` have no tag_ids yet
+        return set(ev.get("tag_ids") or slug_terms(ev.get("tags", [])))
+    return norm_list_str(ev.get("tags", []))
+
+def slug_terms(tags):
+    """
+    vocab ids for tags the vocab knows, the slug itself for the rest: unknown
+    tags can never match a viewer id but still count towards the event's size,
+    exactly as the server pipeline's slug fallback counts them
+    """
+    vocab = get_vocab()
+    return {vocab.ids.get(t, t) for t in map(slugify, tags or []) if t}
+
+def show_terms(terms):
+    """sorted display strings for a term set (canonical slugs when matching on ids)"""
+    if USE_TAG_IDS:
+        # ids another host added since this process loaded the vocab are reloaded (or dropped) by decode
+        ids = [t for t in terms if isinstance(t, int)]
+        return sorted(get_vocab().decode(ids) + [t for t in terms if not isinstance(t, int)])
+    return sorted(terms)
+
+def tag_field():
+    return "tag_ids" if USE_TAG_IDS else "tags"
+
+def event_query(A, now=None):
+    field = tag_field()
+    q = {field: {"$exists": True, "$ne": []}}
+    if PREFILTER and A:
+        q[field] = {"$in": sorted(A)}
+    if USE_TAG_IDS:
+        # plus events with no tag_ids, prefiltered on the slugs events store (vocab.slugify)
+        untagged = {"tag_ids": {"$exists": False}, "tags": {"$exists": True, "$ne": []}}
+        if PREFILTER and A:
+            untagged["tags"] = {"$in": get_vocab().decode(sorted(A))}
+        q = {"$or": [q, untagged]}
+    if WINDOW_DAYS is not None:
+        # past events never reach scoring (index on starts_at; `python event_time.py backfill`)
+        q = {"$and": [q, window_filter(now, WINDOW_DAYS)]}
+    return q
+
+def starts_key(starts_at):
+    """(dated, -start) so sooner events rank first and undated ones after all dated ones"""
+    if starts_at is None:
+        return (0, 0.0)
+    if starts_at.tzinfo is None:
+        starts_at = starts_at.replace(tzinfo=timezone.utc)
+    return (1, -starts_at.timestamp())
+
+DISPLAY_FIELDS = ["id", "name", "time", "starts_at", "venue", "address", "host", "image_url", "cleaned_url", "map_url"]
+# what scoring reads; attendees_count is kept in step with attendees by the app (attendees_count.py),
+# events without it yet are filled in by with_counts
+SCORE_FIELDS   = ["id", "starts_at", "attendees_count"]
+
+def rank_client(events, A, q):
+    """
+    two phases: score every candidate on a minimal projection, then fetch
+    display fields for the LIMIT winners only with one $in
+    """
+    # score on the fly; only the best LIMIT survive the bounded heap
+    ranked = TopK(LIMIT)
+    for key, item in score_events(events, A, q):
+        ranked.push(key, item)
+
+    # 3) Strong matches first; display rows are built for the winners only
+    inst = instrument.current()
+    winners = ranked.results()
+    with inst.stage("fetch_display"):
+        shown = fetch_display(events, [oid for _, (oid, _) in winners])
+    with inst.stage("rows"):
+        return [event_row(shown[oid], A, tags, key) for key, (oid, tags) in winners if oid in shown]
+
+def score_events(events, A, q):
+    """(key, (_id, tags)) for every candidate reaching MIN_OVERLAP, read on the minimal projection"""
+    proj = {f: 1 for f in SCORE_FIELDS}
+    proj[tag_field()] = 1
+    proj["tags"] = 1  # only read when tag_ids is missing (event_terms)
+
+    inst = instrument.current()
+    terms_of = inst.timed(event_terms, "normalize")
+    scanned = kept = 0
+    for ev in inst.iter(with_counts(events, events.find(q, proj)), "cursor"):
+        scanned += 1
+        tags = terms_of(ev)
+        if not tags:
+            continue
+        overlap = len(A & tags)
+        if overlap < MIN_OVERLAP:
+            continue
+        kept += 1
+        key = (overlap, jaccard(A, tags), cosine_binary(A, tags),
+               ev["attendees_count"], *starts_key(ev.get("starts_at")), ev.get("id") or 0)
+        yield key, (ev["_id"], tags)
+
+    inst.count("scanned", scanned)
+    inst.count("kept", kept)
+
+def fetch_display(events, oids):
+    """_id -> display document for the winners, one round trip"""
+    if not oids:
+        return {}
+    cursor = events.find({"_id": {"$in": oids}}, {f: 1 for f in DISPLAY_FIELDS})
+    return {ev["_id"]: ev for ev in instrument.current().iter(cursor, "display_cursor")}
+
+def event_pipeline(A, q):
+    """
+    same scoring as rank_client, expressed server-side: tags are normalized the
+    same way as event_terms, scored with set intersection + $size, and $sort+$limit keeps only
+    the top LIMIT documents, so nothing else crosses the wire.
+    """
+    A = sorted(A)
+    a = len(A)
+    # an event without tag_ids is scored on its slugs, so match those against A's slugs too
+    match = A + get_vocab().decode(A) if USE_TAG_IDS else A
+    return [
+        {"$match": q},
+        {"$project": {
+            **{f: 1 for f in DISPLAY_FIELDS},
+            "attendees_count": COUNT_EXPR,
+            "undated": {"$cond": [{"$eq": [{"$ifNull": ["$starts_at", None]}, None]}, 1, 0]},
+            "tags": normalized_tags_expr(),
+        }},
+        # tags are already a set here, so this is $setIntersection(tags, A); written as
+        # $filter/$in so the same pipeline also runs under mongomock
+        {"$addFields": {"common": {"$filter": {"input": "$tags", "cond": {"$in": ["$$this", match]}}}}},
+        {"$addFields": {
+            "overlap": {"$size": "$common"},
+            "other_size": {"$size": "$tags"},
+        }},
+        {"$match": {"overlap": {"$gte": MIN_OVERLAP}, "other_size": {"$gt": 0}}},
+        {"$addFields": {
+            "jaccard": {"$divide": ["$overlap", {"$subtract": [{"$add": [a, "$other_size"]}, "$overlap"]}]},
+            "cosine": {"$divide": ["$overlap", {"$sqrt": {"$multiply": [a, "$other_size"]}}]},
+        }},
+        # soonest start breaks ties (undated last); _id last so ties come back in a stable order
+        {"$sort": {"overlap": -1, "jaccard": -1, "cosine": -1, "attendees_count": -1,
+                   "undated": 1, "starts_at": 1, "id": -1, "_id": 1}},
+        {"$limit": LIMIT},
+    ]
+
+def normalized_tags_expr():
+    if USE_TAG_IDS:
+        # tag_ids are already canonical, sorted and unique; see slug_terms for the fallback
+        return {"$ifNull": ["$tag_ids", slug_tags_expr()]}
+    return slug_tags_expr()
+
+def slug_tags_expr():
+    # lowercase + dedupe, dropping blanks. stored tags are slugs with no
+    # surrounding whitespace, so no $trim (which mongomock also lacks)
+    return {"$setUnion": [{"$filter": {
+        "input": {"$map": {
+            "input": {"$ifNull": ["$tags", []]},
+            "in": {"$toLower": "$$this"},
+        }},
+        "cond": {"$ne": ["$$this", ""]},
+    }}]}
+
+def rank_server(events, A, q):
+    """run event_pipeline; only the top LIMIT scored documents come back"""
+    results = []
+    # the server scans and scores; only the cursor (round trip + decoding of LIMIT docs) is ours
+    for ev in instrument.current().iter(events.aggregate(event_pipeline(A, q)), "aggregate_cursor"):
+        tags = set(ev.get("tags") or [])
+        if USE_TAG_IDS and any(isinstance(t, str) for t in tags):
+            tags = slug_terms(tags)
+        key = (ev["overlap"], float(ev["jaccard"]), float(ev["cosine"]),
+               ev["attendees_count"], *starts_key(ev.get("starts_at")), ev.get("id") or 0)
+        results.append(event_row(ev, A, tags, key))
+    return results
+
+def event_row(ev, A, tags, key):
+    overlap, jac, cos, attendees_count, *_ = key
+    return {
+        "_id": str(ev["_id"]),
+        "id": ev.get("id"),
+        "name": ev.get("name", ""),
+        "time": ev.get("time", ""),
+        "starts_at": ev.get("starts_at"),
+        "venue": ev.get("venue", ""),
+        "address": ev.get("address", ""),
+        "host": ev.get("host", ""),
+        "image_url": ev.get("image_url", ""),
+        "cleaned_url": ev.get("cleaned_url", ""),
+        "map_url": ev.get("map_url", ""),
+        "tags": show_terms(tags),
+        "attendees_count": attendees_count,
+
+        "overlap": overlap,
+        "jaccard": jac,
+        "cosine": cos,
+        "common": show_terms(A & tags),
+    }
+
 if __name__ == "__main__":
     main()
 
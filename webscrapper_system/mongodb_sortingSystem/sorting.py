@@ -4,6 +4,9 @@ import os
 from math import sqrt
 from dotenv import load_dotenv
 
+import instrument
+from ranking import top_k
+
 # Load .env for MONGODB_URI
 load_dotenv()
 
@@ -16,8 +19,6 @@ TEST_ID = ObjectId("68cf43d576605996e6594c5b") # kai
 TEST_ID = ObjectId("68cfc4760856c6c4332c55da") # alice
 TEST_ID = ObjectId("68cfc4760856c6c4332c55da") # alice
 
-print("\n")
-
 
 # --- CONFIG ---
 MONGODB_URI = os.getenv("MONGODB_URI")
@@ -27,6 +28,16 @@ COLL_NAME   = "users_tag_spam"
 # <<< put Alice's ObjectId here >>>
 ALICE_ID = ObjectId("68d051df54ca4d057ba91bed")
 
+# "index": inverted skill index (skill_index.py), "bits": packed NumPy scorer (skill_bits.py),
+# "lsh": approximate MinHash/LSH candidates (minhash_lsh.py) -- not a speedup on this data: recall@50 >= 0.9
+#        needs ~61% of users as candidates, which is slower than both "index" and "bits",
+# "scan": stream the whole collection,
+# "idf": rare skills count for more (idf_scoring.py; run `python idf_scoring.py rebuild` first),
+# "partition": Alice's state first, other states only if TOP_N isn't filled (sharding.py),
+# "coattend": skill cosine blended with shared event attendance (coattendance.py; build the graph first)
+MATCHER = "index"
+TOP_N   = 50
+
 # --- helpers ---
 def norm_skills(skills):
     if not skills:
@@ -53,13 +64,21 @@ def cosine_binary(a, b):
     denom = sqrt(len(a) * len(b))
     return inter / denom if denom else 0.0
 
+def rank_key(overlap, jac, cos, updated):
+    # overlap desc, then jaccard desc, then cosine desc, then most recent
+    return (overlap, jac, cos, updated or 0)
+
 def main():
-    client = MongoClient(MONGODB_URI)
+    print("\n")
+    inst = instrument.start("sorting")  # MATCH_INSTRUMENT=1 to record stage timings
+    client = MongoClient(MONGODB_URI, event_listeners=inst.listeners())
     db = client[DB_NAME]
     users = db[COLL_NAME]
 
     # 1) Load Alice
-    alice = users.find_one({"_id": ALICE_ID}, {"firstname": 1, "lastname": 1, "email": 1, "skills": 1})
+    with inst.stage("load_viewer"):
+        alice = users.find_one({"_id": ALICE_ID}, {"firstname": 1, "lastname": 1, "email": 1, "skills": 1,
+                                                   "state": 1, "industry": 1})
     if not alice:
         print("❌ Alice not found; check ALICE_ID.")
         return
@@ -72,49 +91,164 @@ def main():
     print(f"Test user (Alice): {alice.get('firstname','')} {alice.get('lastname','')} <{alice.get('email','')}>")
     print("Alice skills:", ", ".join(sorted(A)))
 
-    # 2) Fetch others (simple version: pull all; uncomment prefilter to speed up)
+    # 2) Score candidates -> (key, (_id, other_size, doc or None))
+    if MATCHER == "index":
+        candidates = match_with_index(users, A)
+    elif MATCHER == "bits":
+        candidates = match_with_bits(users, A)
+    elif MATCHER == "lsh":
+        candidates = match_with_lsh(users, A)
+    elif MATCHER == "idf":
+        candidates = match_with_idf(users, A)
+    elif MATCHER == "partition":
+        candidates = match_with_partition(users, A, alice)
+    elif MATCHER == "coattend":
+        candidates = match_with_coattendance(users, A)
+    else:
+        candidates = match_with_scan(users, A)
+
+    # 3) Keep the best TOP_N in a bounded heap; same order as a full sort on rank_key
+    with inst.stage("match"):  # matchers are lazy: scoring happens as top_k pulls
+        winners = top_k(candidates, TOP_N)
+    if MATCHER == "idf":  # idf keys lead with the weighted scores; back to display order
+        winners = [(rank_key(o, j, c, u), item) for (c, j, o, u), item in winners]
+    elif MATCHER == "coattend":  # (blended, overlap, jaccard, cosine, updated)
+        winners = [(rank_key(*key[1:]), item) for key, item in winners]
+    with inst.stage("build_rows"):
+        results = build_rows(users, A, winners)
+    inst.count("returned", len(results))
+    inst.finish(matcher=MATCHER, top_n=TOP_N)
+
+    # 4) Print top 50
+    if not results:
+        print("\nNo overlapping users found.")
+        return
+
+    print("\nTop matches:")
+    for r in results:
+        name = f"{r['firstname']} {r['lastname']}".strip()
+        print(f"- {name:24s} | overlap={r['overlap']:2d} | jaccard={r['jaccard']:.3f} | "
+              f"cosine={r['cosine']:.3f} ")
+
+def match_with_index(users, A, index=None):
+    """score every user sharing a skill with A through posting-list merges"""
+    from skill_index import load_or_build
+
+    if index is None:
+        index = load_or_build(users)
+    for oid, overlap, jac, cos, other_size, updated in index.score(A, exclude=ALICE_ID):
+        yield rank_key(overlap, jac, cos, updated), (oid, other_size, None)
+
+def match_with_bits(users, A, sb=None):
+    """score everyone at once with packed skill bitsets"""
+    from skill_bits import SkillBits
+
+    if sb is None:
+        sb = SkillBits.from_collection(users)
+    rows, overlap, jac, cos = sb.rank(A, exclude=ALICE_ID, k=TOP_N)
+    for r, o, j, c in zip(rows.tolist(), overlap.tolist(), jac.tolist(), cos.tolist()):
+        yield rank_key(o, j, c, int(sb.updated[r])), (sb.ids[r], int(sb.sizes[r]), None)
+
+def match_with_lsh(users, A, lsh=None):
+    """approximate: exact re-rank of the MinHash/LSH bucket-mates only"""
+    from minhash_lsh import load_or_build
+
+    if lsh is None:
+        lsh = load_or_build(users)
+    return lsh.query(A, exclude=ALICE_ID, k=TOP_N)
+
+def match_with_idf(users, A, index=None):
+    """weighted cosine / jaccard with MaxScore pruning; keys are (wcos, wjac, overlap, updated)"""
+    from idf_scoring import WeightedIndex
+
+    if index is None:
+        index = WeightedIndex.from_collection(users)
+    rows, overlap, jac, cos, _ = index.query(A, exclude=ALICE_ID, k=TOP_N)
+    sb = index.sb
+    for r, o, j, c in zip(rows.tolist(), overlap.tolist(), jac.tolist(), cos.tolist()):
+        yield (c, j, o, int(sb.updated[r])), (sb.ids[r], int(sb.sizes[r]), None)
+
+def match_with_partition(users, A, viewer, parts=None):
+    """score the viewer's own partition, fanning out only while fewer than TOP_N matched"""
+    from sharding import PartitionedBits, partition_of
+
+    if parts is None:
+        parts = PartitionedBits.lazy(users)  # reads the viewer's partition, others only if needed
+    winners, _ = parts.rank(A, partition_of(viewer, parts.by_industry), exclude=ALICE_ID, k=TOP_N)
+    for key, (oid, other_size, doc) in winners:
+        yield rank_key(*key), (oid, other_size, doc)
+
+def match_with_coattendance(users, A, graph=None, sb=None):
+    """skill matches plus people Alice keeps meeting at events, ranked on the blended score"""
+    import numpy as np
+    from coattendance import CoAttendance, blend_scores, neighbour_oids
+    from skill_bits import SkillBits
+
+    if graph is None:
+        graph = CoAttendance.load()
+    if sb is None:
+        sb = SkillBits.from_collection(users)
+    overlap, jac, cos = sb.score(sb.pack(A), len(A))
+    met = [sb.row[o] for o in neighbour_oids(graph, ALICE_ID) if o in sb.row]
+    rows = np.union1d(np.nonzero(overlap > 0)[0], np.array(met, dtype=np.int64))
+    if ALICE_ID in sb.row:
+        rows = rows[rows != sb.row[ALICE_ID]]
+    blended, _ = blend_scores(graph, ALICE_ID, [sb.ids[r] for r in rows.tolist()], cos[rows])
+    for r, b in zip(rows.tolist(), blended.tolist()):
+        key = (b, int(overlap[r]), float(jac[r]), float(cos[r]), int(sb.updated[r]))
+        yield key, (sb.ids[r], int(sb.sizes[r]), None)
+
+def match_with_scan(users, A):
+    # Fetch others (simple version: pull all; uncomment prefilter to speed up)
     query = {"_id": {"$ne": ALICE_ID}, "skills": {"$exists": True, "$ne": []}}
     # Speed-up for big collections: only fetch users sharing ANY skill with Alice
     # query["skills"] = {"$in": list(A)}
 
     projection = {"firstname": 1, "lastname": 1, "email": 1, "skills": 1, "updatedAt": 1}
-    cursor = users.find(query, projection)
-
-    results = []
-    for u in cursor:
-        B = norm_skills(u.get("skills", []))
+    inst = instrument.current()
+    norm = inst.timed(norm_skills, "normalize")
+    scanned = kept = 0
+    for u in inst.iter(users.find(query, projection), "cursor"):
+        scanned += 1
+        B = norm(u.get("skills", []))
         if not B:
             continue
-        inter = A & B
-        if not inter:
+        overlap = len(A & B)
+        if not overlap:
             continue
-        row = {
-            "_id": str(u["_id"]),
+        kept += 1
+        key = rank_key(overlap, jaccard(A, B), cosine_binary(A, B), u.get("updatedAt"))
+        yield key, (u["_id"], len(B), u)
+    inst.count("scanned", scanned)
+    inst.count("kept", kept)
+
+def build_rows(users, A, winners):
+    """display rows for the winners only; docs the matcher didn't keep are fetched with one $in"""
+    missing = [oid for _, (oid, _, doc) in winners if doc is None]
+    fetched = {}
+    if missing:
+        proj = {"firstname": 1, "lastname": 1, "email": 1, "skills": 1, "updatedAt": 1}
+        cursor = instrument.current().iter(users.find({"_id": {"$in": missing}}, proj), "fetch_cursor")
+        fetched = {u["_id"]: u for u in cursor}
+
+    results = []
+    for (overlap, jac, cos, _), (oid, other_size, doc) in winners:
+        u = doc if doc is not None else fetched.get(oid)
+        if u is None:
+            continue  # deleted since the index was last pruned
+        results.append({
+            "_id": str(oid),
             "firstname": u.get("firstname", ""),
             "lastname": u.get("lastname", ""),
             "email": u.get("email", ""),
-            "overlap": len(inter),
-            "jaccard": jaccard(A, B),
-            "cosine": cosine_binary(A, B),
-            "common": sorted(inter),
-            "other_size": len(B),
+            "overlap": overlap,
+            "jaccard": jac,
+            "cosine": cos,
+            "common": sorted(A & norm_skills(u.get("skills", []))),
+            "other_size": other_size,
             "updatedAt": u.get("updatedAt"),
-        }
-        results.append(row)
-
-    # 3) Sort: overlap desc, then jaccard desc, then cosine desc, then most recent
-    results.sort(key=lambda r: (r["overlap"], r["jaccard"], r["cosine"], r["updatedAt"] or 0), reverse=True)
-
-    # 4) Print top 50
-    if not results:
-        print("\nNo overlapping users found.")
-        return
-
-    print("\nTop matches:")
-    for r in results[:50]:
-        name = f"{r['firstname']} {r['lastname']}".strip()
-        print(f"- {name:24s} | overlap={r['overlap']:2d} | jaccard={r['jaccard']:.3f} | "
-              f"cosine={r['cosine']:.3f} ")
+        })
+    return results
 
 if __name__ == "__main__":
     main()
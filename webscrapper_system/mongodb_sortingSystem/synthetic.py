@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic users and events for benchmarks.
+
+Users follow make_payload() in usermaker/fakeusers.py: 40-120 distinct
+SKILLS, a state from US_STATES, an industry from INDUSTRIES. Events follow
+eventbrite_webscraper/master_events.csv: the tag-count distribution and tag
+frequencies are taken from its `tags` column, and tags are stored as slugs
+the way the events API stores them. Both carry the canonical id arrays
+(skill_ids / tag_ids) that `vocab.py migrate` would write. About a third of
+the events are recurring listings with no `starts_at`; the rest start within
+120 days of NOW, which benchmarks pass to the time-windowed queries.
+
+Same (n, seed) -> same documents, including _ids, so runs are comparable.
+
+`python synthetic.py USERS EVENTS [SEED]` loads into $BENCH_MONGODB_URI
+(default mongodb://localhost:27017), database cappuconnect_bench.
+"""
+import csv
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from vocab import get_vocab, load_fakeusers_constant, slugify
+
+HERE        = os.path.dirname(os.path.abspath(__file__))
+EVENTS_CSV  = os.path.join(HERE, "..", "eventbrite_webscraper", "master_events.csv")
+
+BENCH_URI   = os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+BENCH_DB    = "cappuconnect_bench"   # never the real database: load() drops collections
+USERS_COLL  = "users_tag_spam"
+EVENTS_COLL = "events"
+
+SEED        = 42
+MIN_TAGS    = 40     # same bounds as fakeusers.py
+MAX_TAGS    = 120
+BATCH       = 10000
+BASE_TIME   = datetime(2025, 9, 1)
+ATTEND_RATE = 0.05   # share of events with any attendees
+UNDATED_RATE = 0.34  # recurring listings ("Monthly", "Every two weeks on Mon") in master_events.csv
+# "now" for time-windowed event queries on this data: dated events start 0-120 days after it
+NOW         = BASE_TIME.replace(tzinfo=timezone.utc)
+RECURRING   = ["Monthly", "Every two weeks on Mon", "Every two weeks on Wed", "Every Thu"]
+
+FIRST = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST  = ["Smith", "Lee", "Garcia", "Patel", "Kim", "Nguyen", "Brown", "Lopez", "Chen", "Davis"]
+
+# --- helpers ---
+def oid_for(kind, i, seed):
+    """stable ObjectId: 4-byte fake timestamp, 1-byte kind, 3-byte seed, 4-byte counter"""
+    ts = int((BASE_TIME - datetime(1970, 1, 1)).total_seconds()) + i // 1000
+    return ObjectId(ts.to_bytes(4, "big") + bytes([kind]) + (seed % 2**24).to_bytes(3, "big")
+                    + i.to_bytes(4, "big"))
+
+def event_tag_model(path=EVENTS_CSV):
+    """(tag counts, tag counts' weights, tags, tag weights) observed in the scraped events"""
+    sizes, freq = Counter(), Counter()
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                tags = {slugify(t) for t in (row.get("tags") or "").split(" | ")} - {""}
+                if tags:
+                    sizes[len(tags)] += 1
+                    freq.update(tags)
+    except OSError:
+        pass
+    if not freq:  # no CSV: fall back to the user skill list
+        freq = Counter(slugify(s) for s in load_fakeusers_constant("SKILLS"))
+        sizes = Counter({5: 1})
+    return list(sizes), list(sizes.values()), list(freq), list(freq.values())
+
+def make_users(n, seed=SEED):
+    rnd = random.Random(seed)
+    skills = load_fakeusers_constant("SKILLS")
+    states = load_fakeusers_constant("US_STATES") or ["California", "New York"]
+    industries = load_fakeusers_constant("INDUSTRIES") or ["Other"]
+    vocab = get_vocab()
+    for i in range(n):
+        first, last = rnd.choice(FIRST), rnd.choice(LAST)
+        picked = rnd.sample(skills, rnd.randint(MIN_TAGS, min(MAX_TAGS, len(skills))))
+        stamp = BASE_TIME + timedelta(seconds=rnd.randint(0, 90 * 86400))
+        yield {
+            "_id": oid_for(1, i, seed),
+            "firstname": first,
+            "lastname": last,
+            "email": f"{first}.{last}.{i}@example.com".lower(),
+            "state": rnd.choice(states),
+            "industry": rnd.choice(industries),
+            "skills": picked,
+            "skill_ids": vocab.encode(picked),
+            "photo": "pfpLink",
+            "createdAt": stamp,
+            "updatedAt": stamp,
+        }
+
+def make_events(n, seed=SEED, n_users=0):
+    rnd = random.Random(seed + 1)
+    sizes, size_w, tags, tag_w = event_tag_model()
+    vocab = get_vocab()
+    for i in range(n):
+        k = min(rnd.choices(sizes, size_w)[0], len(tags))
+        picked = set()
+        while len(picked) < k:
+            picked.update(rnd.choices(tags, tag_w, k=k - len(picked)))
+        when = BASE_TIME + timedelta(days=rnd.randint(0, 120), minutes=30 * rnd.randint(16, 42))
+        attendees = []
+        if n_users and rnd.random() < ATTEND_RATE:
+            attendees = [oid_for(1, rnd.randrange(n_users), seed) for _ in range(rnd.randint(1, 5))]
+        tag_list = sorted(picked)
+        if rnd.random() < UNDATED_RATE:
+            time_str, starts_at = rnd.choice(RECURRING), None
+        else:
+            # what event_time.parse_event_time makes of the display string
+            time_str = f"{when:%a, %b} {when.day} · {when.hour % 12 or 12}:{when:%M %p} EDT"
+            starts_at = (when + timedelta(hours=4)).replace(tzinfo=timezone.utc)
+        doc = {
+            "_id": oid_for(2, i, seed),
+            "id": 300000000 + i,
+            "name": f"Synthetic event {i}",
+            "time": time_str,
+            "host": "",
+            "venue": "undefined",
+            "address": "undefined",
+            "cleaned_url": f"https://www.meetup.com/synthetic/events/{300000000 + i}/",
+            "image_url": "Image not found",
+            "map_url": "Map link not found",
+            "tags": tag_list,
+            "tag_ids": vocab.encode(tag_list),
+            "attendees": attendees,
+            "attendees_count": len(attendees),
+        }
+        if starts_at is not None:
+            doc["starts_at"] = starts_at
+        yield doc
+
+def insert_batched(coll, docs, batch=BATCH):
+    buf, n = [], 0
+    for d in docs:
+        buf.append(d)
+        if len(buf) >= batch:
+            coll.insert_many(buf, ordered=False)
+            n += len(buf)
+            buf = []
+    if buf:
+        coll.insert_many(buf, ordered=False)
+        n += len(buf)
+    return n
+
+def load(db, n_users, n_events, seed=SEED):
+    """drop and refill the bench collections; returns (users, events) inserted"""
+    db[USERS_COLL].drop()
+    db[EVENTS_COLL].drop()
+    nu = insert_batched(db[USERS_COLL], make_users(n_users, seed))
+    ne = insert_batched(db[EVENTS_COLL], make_events(n_events, seed, n_users))
+    db[USERS_COLL].create_index("skills")
+    db[USERS_COLL].create_index("skill_ids")
+    db[EVENTS_COLL].create_index("tags")
+    db[EVENTS_COLL].create_index("tag_ids")
+    db[EVENTS_COLL].create_index("starts_at")
+    return nu, ne
+
+def main():
+    if len(sys.argv) < 3:
+        print("usage: python synthetic.py USERS EVENTS [SEED]")
+        return
+    n_users, n_events = int(sys.argv[1]), int(sys.argv[2])
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else SEED
+    db = MongoClient(BENCH_URI)[BENCH_DB]
+    t0 = time.perf_counter()
+    nu, ne = load(db, n_users, n_events, seed)
+    print(f"✅ {nu} users + {ne} events -> {BENCH_DB} in {time.perf_counter() - t0:.1f}s (seed {seed})")
+
+if __name__ == "__main__":
+    main()
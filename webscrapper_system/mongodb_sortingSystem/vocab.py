@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Canonical tag vocabulary shared by users (skills) and events (tags).
+
+Every spelling of a term is reduced to the slug form the events collection
+already stores (same rules as `slugify` in src/app/api/events/parse_tags:
+lowercase, "&" -> "and", anything else non-alphanumeric -> "-"), so
+"Project Management", "project management" and "project-management" are one
+term. Each slug gets a dense integer id.
+
+The vocabulary is seeded from SKILLS in usermaker/fakeusers.py,
+eventbrite_webscraper/unique_tags.csv and the tags of the scraped event
+CSVs ingest_events.py reads, and committed as tag_vocab.json. Ids must stay
+stable once they are written to Mongo, and every host must agree on them,
+so the authority is the `tag_vocab` collection ({_id: id, slug, label},
+unique on slug): the committed seed only fills an empty collection, and a
+term first seen at runtime (ingest, migrate) is inserted at the next free
+_id, retrying after a reload if another host took that id or the same slug
+first, so ids stay dense. Without MONGODB_URI the seed is used as is and
+new terms stay in the process.
+
+A process that meets an id it has not loaded (another host added the term)
+reloads the collection; `decode` drops ids that are still unknown.
+
+The rankers always encode a user's current `skills` (the app edits skills
+and never touches skill_ids) and fall back to encoding `tags` for events
+written without tag_ids, so the stored id arrays are an index aid, never
+the source of truth.
+
+`python vocab.py build`    rebuild the committed tag_vocab.json from the seeds (keeps existing ids;
+                          starts from the tag_vocab collection when MONGODB_URI is set)
+`python vocab.py migrate`  write users.skill_ids / events.tag_ids + multikey indexes
+"""
+import ast
+import csv
+import json
+import os
+import re
+import sys
+
+import time
+
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from dotenv import load_dotenv
+
+# Load .env for MONGODB_URI
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME     = "cappuconnect"
+USERS_COLL  = "users_tag_spam"
+EVENTS_COLL = "events"
+VOCAB_COLL  = "tag_vocab"
+
+HERE            = os.path.dirname(os.path.abspath(__file__))
+VOCAB_PATH      = os.path.join(HERE, "tag_vocab.json")   # committed seed, only written by `build`
+FAKEUSERS_PATH  = os.path.join(HERE, "..", "usermaker", "fakeusers.py")
+UNIQUE_TAGS_CSV = os.path.join(HERE, "..", "eventbrite_webscraper", "unique_tags.csv")
+EVENT_CSVS      = [os.path.join(HERE, "..", "eventbrite_webscraper", f)
+                   for f in ("master_events.csv", "master_events_2.csv")]
+
+BATCH = 1000
+RELOAD_S = 30   # a term unknown here re-reads the collection at most this often
+
+# --- helpers ---
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+def slugify(s):
+    """canonical form of a skill/tag; mirrors slugify() in src/app/api/events/parse_tags"""
+    return _NON_ALNUM.sub("-", str(s).lower().replace("&", " and ")).strip("-")
+
+def load_fakeusers_constant(name, path=FAKEUSERS_PATH):
+    """a literal list from fakeusers.py, parsed instead of imported (it pulls in faker/aiohttp)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+    except OSError:
+        return []
+    for node in tree.body:
+        if isinstance(node, ast.AnnAssign):
+            target = node.target
+        elif isinstance(node, ast.Assign):
+            target = node.targets[0]
+        else:
+            continue
+        if getattr(target, "id", None) == name:
+            return ast.literal_eval(node.value)
+    return []
+
+def load_unique_tags(path=UNIQUE_TAGS_CSV):
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            return [row["tag"] for row in csv.DictReader(f) if row.get("tag")]
+    except OSError:
+        return []
+
+
+def load_event_csv_tags(paths=EVENT_CSVS):
+    """every tag of the " | "-joined `tags` column of the scraped event CSVs, in file order"""
+    out = []
+    for path in paths:
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    out.extend(t.strip() for t in (row.get("tags") or "").split("|") if t.strip())
+        except OSError:
+            continue
+    return out
+
+
+class Vocab:
+    def __init__(self, terms=(), labels=(), coll=None):
+        self.terms = []     # id -> slug
+        self.labels = []    # id -> first human spelling seen
+        self.ids = {}       # slug -> id
+        self.coll = coll    # tag_vocab collection when Mongo is the authority
+        self.loaded_at = 0.0
+        for t, l in zip(terms, labels):
+            self._append(t, l)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _append(self, t, label):
+        self.ids[t] = len(self.terms)
+        self.terms.append(t)
+        self.labels.append(label)
+
+    def add(self, value):
+        t = slugify(value)
+        if not t:
+            return None
+        i = self.ids.get(t)
+        if i is None and self.coll is not None:
+            return self._allocate(t, str(value).strip())
+        if i is None:
+            i = len(self.terms)
+            self._append(t, str(value).strip())
+        return i
+
+    def _allocate(self, t, label):
+        """insert at the next free id; a duplicate means another host was first, so reload and retry"""
+        while True:
+            self.reload()
+            if t in self.ids:
+                return self.ids[t]
+            try:
+                self.coll.insert_one({"_id": len(self.terms), "slug": t, "label": label})
+            except DuplicateKeyError:
+                continue
+            self._append(t, label)
+            return self.ids[t]
+
+    def reload(self):
+        """append the terms other processes have added since the last load"""
+        if self.coll is None:
+            return
+        for d in self.coll.find({"_id": {"$gte": len(self.terms)}}).sort("_id", ASCENDING):
+            if d["_id"] != len(self.terms):
+                break  # an insert in flight; picked up on the next reload
+            self._append(d["slug"], d.get("label", d["slug"]))
+        self.loaded_at = time.monotonic()
+
+    def id(self, value):
+        t = slugify(value)
+        i = self.ids.get(t)
+        if i is None and t and self.coll is not None and time.monotonic() - self.loaded_at > RELOAD_S:
+            self.reload()
+            i = self.ids.get(t)
+        return i
+
+    def encode(self, values, add=False):
+        """skills/tags -> sorted unique int ids (unknown terms dropped unless add=True)"""
+        out = set()
+        for v in values or []:
+            if not isinstance(v, str):
+                continue
+            i = self.add(v) if add else self.id(v)
+            if i is not None:
+                out.add(i)
+        return sorted(out)
+
+    def decode(self, ids):
+        """ids -> slugs; ids not loaded yet trigger one reload, ids still unknown are dropped"""
+        n = len(self.terms)
+        if any(i >= n for i in ids):
+            self.reload()
+            n = len(self.terms)
+        return [self.terms[i] for i in ids if 0 <= i < n]
+
+    def seed(self):
+        for s in load_fakeusers_constant("SKILLS"):
+            self.add(s)
+        for t in load_unique_tags():
+            self.add(t)
+        for t in load_event_csv_tags():
+            self.add(t)
+        return self
+
+    def save(self, path=VOCAB_PATH):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"terms": self.terms, "labels": self.labels}, f, ensure_ascii=False, indent=0)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=VOCAB_PATH):
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        return cls(d["terms"], d["labels"])
+
+    @classmethod
+    def from_db(cls, db, seed=None):
+        """the tag_vocab collection, filled from the seed (ids kept) when it is empty"""
+        coll = db[VOCAB_COLL]
+        coll.create_index("slug", unique=True)
+        if coll.estimated_document_count() == 0:
+            seed = seed_vocab() if seed is None else seed
+            docs = [{"_id": i, "slug": t, "label": l} for i, (t, l) in enumerate(zip(seed.terms, seed.labels))]
+            try:
+                for i in range(0, len(docs), BATCH):
+                    coll.insert_many(docs[i:i + BATCH], ordered=False)
+            except BulkWriteError:
+                pass  # another host seeded it at the same time
+        vocab = cls(coll=coll)
+        vocab.reload()
+        return vocab
+
+
+def seed_vocab():
+    """the committed seed (built from the seed sources if that is missing)"""
+    return Vocab.load(VOCAB_PATH) if os.path.exists(VOCAB_PATH) else Vocab().seed()
+
+_VOCAB = None
+
+def get_vocab():
+    """process-wide vocabulary, loaded once: from Mongo when MONGODB_URI is set, else the seed"""
+    global _VOCAB
+    if _VOCAB is None:
+        _VOCAB = Vocab.from_db(MongoClient(MONGODB_URI)[DB_NAME]) if MONGODB_URI else seed_vocab()
+    return _VOCAB
+
+# --- jobs ---
+def migrate(db, vocab):
+    """store int id arrays next to the string fields and index them"""
+    for coll, src, dst in ((db[USERS_COLL], "skills", "skill_ids"), (db[EVENTS_COLL], "tags", "tag_ids")):
+        ops, n = [], 0
+        for d in coll.find({src: {"$exists": True}}, {src: 1, dst: 1}):
+            ids = vocab.encode(d.get(src), add=True)
+            if d.get(dst) != ids:
+                ops.append(UpdateOne({"_id": d["_id"]}, {"$set": {dst: ids}}))
+            if len(ops) >= BATCH:
+                coll.bulk_write(ops, ordered=False)
+                n += len(ops)
+                ops = []
+        if ops:
+            coll.bulk_write(ops, ordered=False)
+            n += len(ops)
+        coll.create_index(dst)
+        print(f"✅ {coll.name}.{dst}: {n} docs updated")
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if cmd == "build":
+        if MONGODB_URI:
+            vocab = Vocab(get_vocab().terms, get_vocab().labels)  # the deployment's ids, detached from Mongo
+        else:
+            vocab = Vocab.load(VOCAB_PATH) if os.path.exists(VOCAB_PATH) else Vocab()
+        before = len(vocab)
+        vocab.seed().save(VOCAB_PATH)
+        print(f"✅ {len(vocab)} terms ({len(vocab) - before} new) -> {VOCAB_PATH}")
+        return
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    vocab = get_vocab()
+    migrate(MongoClient(MONGODB_URI)[DB_NAME], vocab)
+    print(f"Vocabulary now has {len(vocab)} terms")
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,243 @@
-import os
+"""
+Profile photos for the fake users: download, then resize into WebP/AVIF variants.
+
+    python downloadImages.py [download] [N]   fetch N portraits into images_dir + variants
+    python downloadImages.py thumbs [DIR]     (re)build variants for the JPEGs already in DIR
+
+Downloads run with at most CONCURRENCY requests in flight, retry with
+backoff, and write through a thread (temp file + rename) so the event loop
+never blocks on disk. images_dir/manifest.json records each photo's sha256
+as downloads complete (rewritten atomically every SAVE_EVERY photos or
+SAVE_EVERY_S seconds, and on the way out), so an interrupted run keeps what
+it fetched; a slot whose file still hashes to the recorded value is skipped
+on the next run, and variants are only rebuilt for content that changed.
+
+Resizing is CPU-bound and runs in a process pool: every photo becomes a
+square crop at each of SIZES (never upscaled) in each of FORMATS under
+images_dir/variants/. The manifest maps each photo (user_0002 ...) to its
+variants so the frontend can serve a small WebP/AVIF instead of the original.
+
+PHOTOS_API points the downloader at another randomuser-compatible endpoint,
+e.g. the local stand-in: `python mock_api.py` then
+PHOTOS_API=http://localhost:3000/api/ python downloadImages.py 20
+"""
 import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import aiohttp
+from PIL import Image, ImageOps
+
+SAVE_DIR    = "images_dir"
+VARIANT_DIR = "variants"          # inside SAVE_DIR
+MANIFEST    = "manifest.json"     # inside SAVE_DIR
+N_PHOTOS    = 100   # how many to grab (set as you like)
+API_URL     = os.getenv("PHOTOS_API", "https://randomuser.me/api/")
+
+CONCURRENCY = 16    # downloads in flight
+RETRIES     = 4
+BACKOFF_S   = 0.5   # doubled per attempt, plus jitter
+TIMEOUT_S   = 15
+CHUNK       = 64 * 1024
+SAVE_EVERY   = 20   # completed downloads between manifest writes
+SAVE_EVERY_S = 5.0  # ...or seconds, whichever comes first
+
+SIZES    = (64, 128)              # square px; randomuser "large" is 128x128
+FORMATS  = ("webp", "avif")
+QUALITY  = {"webp": 80, "avif": 55}
+PROCESSES = os.cpu_count() or 1
+
+# --- helpers ---
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def write_atomic(path, data):
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def load_manifest(save_dir):
+    try:
+        with open(os.path.join(save_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"users": {}}
 
-SAVE_DIR = "images_dir"
-N_PHOTOS = 100   # how many to grab (set as you like)
+def manifest_bytes(manifest):
+    manifest["updatedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+
+def save_manifest(save_dir, manifest):
+    write_atomic(os.path.join(save_dir, MANIFEST), manifest_bytes(manifest))
+
+async def save_manifest_async(save_dir, manifest):
+    """serialized on the loop (a consistent copy), written from a thread"""
+    await asyncio.to_thread(write_atomic, os.path.join(save_dir, MANIFEST), manifest_bytes(manifest))
+
+def variant_name(stem, size, fmt):
+    return f"{VARIANT_DIR}/{stem}-{size}.{fmt}"
+
+def make_variants(save_dir, stem, source, sizes=SIZES, formats=FORMATS):
+    """runs in a worker process: one source image -> every size x format, returns manifest entries"""
+    out = []
+    os.makedirs(os.path.join(save_dir, VARIANT_DIR), exist_ok=True)
+    with Image.open(os.path.join(save_dir, source)) as im:
+        im = ImageOps.exif_transpose(im).convert("RGB")
+        side = min(im.size)
+        for size in sorted({min(s, side) for s in sizes}):
+            thumb = ImageOps.fit(im, (size, size), Image.LANCZOS)
+            for fmt in formats:
+                rel = variant_name(stem, size, fmt)
+                path = os.path.join(save_dir, rel)
+                thumb.save(path + ".part", format=fmt.upper(), quality=QUALITY.get(fmt, 80))
+                os.replace(path + ".part", path)
+                out.append({"size": size, "format": fmt, "path": rel, "bytes": os.path.getsize(path)})
+    return out
+
+def variants_present(save_dir, entry):
+    v = entry.get("variants")
+    return bool(v) and all(os.path.exists(os.path.join(save_dir, x["path"])) for x in v)
+
+async def with_retries(what, fn):
+    for attempt in range(RETRIES + 1):
+        try:
+            return await fn()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == RETRIES:
+                raise
+            delay = BACKOFF_S * 2 ** attempt * (1 + random.random())
+            print(f"  retry {attempt + 1}/{RETRIES} for {what} in {delay:.1f}s ({e.__class__.__name__})")
+            await asyncio.sleep(delay)
 
 async def fetch_json(session, url):
-    async with session.get(url, timeout=15) as r:
-        r.raise_for_status()
-        return await r.json()
-
-async def download_file(session, url, path):
-    async with session.get(url, timeout=15) as r:
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            while True:
-                chunk = await r.content.read(8192)
-                if not chunk:
-                    break
-                f.write(chunk)
-
-async def main():
-    os.makedirs(SAVE_DIR, exist_ok=True)
-
-    api_url = f"https://randomuser.me/api/?results={N_PHOTOS}&inc=picture&noinfo"
+    async def go():
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=TIMEOUT_S)) as r:
+            r.raise_for_status()
+            return await r.json()
+    return await with_retries(url, go)
+
+async def fetch_bytes(session, url):
+    async def go():
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=TIMEOUT_S)) as r:
+            r.raise_for_status()
+            return await r.read()
+    return await with_retries(url, go)
+
+# --- pipeline ---
+async def download_one(session, slots, save_dir, stem, url, entry, counts):
+    """fetch one portrait unless the stored file still matches the manifest; returns the updated entry"""
+    source = f"{stem}.jpg"
+    path = os.path.join(save_dir, source)
+    if entry.get("sha256") and os.path.exists(path):
+        if await asyncio.to_thread(sha256_file, path) == entry["sha256"]:
+            counts["kept"] += 1
+            return entry
+    async with slots:
+        data = await fetch_bytes(session, url)
+    digest = hashlib.sha256(data).hexdigest()
+    await asyncio.to_thread(write_atomic, path, data)
+    counts["downloaded"] += 1
+    if digest != entry.get("sha256"):
+        entry = {"variants": []}  # new content: old variants no longer apply
+    return {**entry, "source": source, "url": url, "sha256": digest, "bytes": len(data)}
+
+async def build_variants(save_dir, manifest, counts):
+    """process-pool stage: resize every photo whose variants are missing"""
+    todo = [(stem, e) for stem, e in sorted(manifest["users"].items()) if not variants_present(save_dir, e)]
+    if not todo:
+        return
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=min(PROCESSES, len(todo))) as pool:
+        jobs = [loop.run_in_executor(pool, make_variants, save_dir, stem, e["source"]) for stem, e in todo]
+        for (stem, e), variants in zip(todo, await asyncio.gather(*jobs, return_exceptions=True)):
+            if isinstance(variants, Exception):
+                print(f"❌ {e['source']}: {variants}")
+                counts["failed"] += 1
+                continue
+            e["variants"] = variants
+            counts["resized"] += 1
+
+async def download(n=N_PHOTOS, save_dir=SAVE_DIR, api_url=API_URL):
+    os.makedirs(save_dir, exist_ok=True)
+    manifest = load_manifest(save_dir)
+    counts = {"downloaded": 0, "kept": 0, "resized": 0, "failed": 0}
+    t0 = time.perf_counter()
+
+    slots = asyncio.Semaphore(CONCURRENCY)
     async with aiohttp.ClientSession() as session:
-        data = await fetch_json(session, api_url)
+        data = await fetch_json(session, f"{api_url}?results={n}&inc=picture&noinfo")
         urls = [u["picture"]["large"] for u in data["results"]]
 
-        tasks = []
-        for i, url in enumerate(urls, start=1):
-            filename = f"user_{i:04d}.jpg"
-            path = os.path.join(SAVE_DIR, filename)
-            print(f"Downloading {url} -> {path}")
-            tasks.append(download_file(session, url, path))
+        async def one(stem, url):
+            try:
+                return stem, await download_one(session, slots, save_dir, stem, url,
+                                                manifest["users"].get(stem, {}), counts)
+            except Exception as e:  # recorded as a failure, like gather(return_exceptions=True)
+                return stem, e
+
+        stems = [f"user_{i:04d}" for i in range(1, len(urls) + 1)]
+        jobs = [asyncio.ensure_future(one(stem, url)) for stem, url in zip(stems, urls)]
+        unsaved, last_save = 0, time.monotonic()
+        try:
+            for fut in asyncio.as_completed(jobs):
+                stem, res = await fut
+                if isinstance(res, Exception):
+                    print(f"❌ {stem}: {res}")
+                    counts["failed"] += 1
+                    continue
+                manifest["users"][stem] = res
+                unsaved += 1
+                if unsaved >= SAVE_EVERY or time.monotonic() - last_save >= SAVE_EVERY_S:
+                    await save_manifest_async(save_dir, manifest)
+                    unsaved, last_save = 0, time.monotonic()
+        finally:
+            for j in jobs:
+                j.cancel()
+            # what finished so far is recorded even if the run is interrupted or resizing fails below
+            save_manifest(save_dir, manifest)
+
+    await build_variants(save_dir, manifest, counts)
+    save_manifest(save_dir, manifest)
+    print(f"\n✅ {counts['downloaded']} downloaded | {counts['kept']} unchanged | {counts['resized']} resized | "
+          f"{counts['failed']} failed | {time.perf_counter() - t0:.1f}s -> {save_dir}")
+    return counts
 
-        await asyncio.gather(*tasks)
+async def thumbs(save_dir=SAVE_DIR):
+    """index the JPEGs already in save_dir and build their variants (e.g. ../../public/images_dir)"""
+    manifest = load_manifest(save_dir)
+    counts = {"downloaded": 0, "kept": 0, "resized": 0, "failed": 0}
+    for name in sorted(os.listdir(save_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in (".jpg", ".jpeg"):
+            continue
+        digest = await asyncio.to_thread(sha256_file, os.path.join(save_dir, name))
+        entry = manifest["users"].get(stem, {})
+        if entry.get("sha256") != digest:
+            entry = {"source": name, "sha256": digest, "variants": []}
+        manifest["users"][stem] = entry
+    await build_variants(save_dir, manifest, counts)
+    save_manifest(save_dir, manifest)
+    print(f"✅ {len(manifest['users'])} photos | {counts['resized']} resized | {counts['failed']} failed")
+    return counts
 
-    print(f"\n✅ Saved {len(urls)} photos into {SAVE_DIR}")
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == "thumbs":
+        asyncio.run(thumbs(args[1] if len(args) > 1 else SAVE_DIR))
+        return
+    if args and args[0] == "download":
+        args = args[1:]
+    asyncio.run(download(int(args[0]) if args else N_PHOTOS))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,7 +1,12 @@
 import asyncio
+import os
 import random
 import string
-from typing import Dict, List
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
 import aiohttp
 from faker import Faker
 
@@ -16,6 +21,13 @@ RETRY_DUP     = 3
 MIN_TAGS      = 40
 MAX_TAGS      = 120
 
+# bulk mode (`python fakeusers.py bulk [COUNT]`): straight to Mongo, no API in the loop
+DB_NAME       = os.getenv("DB_NAME", "cappuconnect")
+USERS_COLL    = os.getenv("USERS_COLLECTION", os.getenv("USER_TABLE", "users"))  # same lookup as src/lib/config.ts
+BULK_BATCH    = 5000
+BULK_INFLIGHT = 4      # insert_many batches on the wire while the next one is generated
+BCRYPT_COST   = 12     # same cost factor as the POST /api/users handler
+
 # Match the browser-like headers in your sample
 BROWSER_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:143.0) Gecko/20100101 Firefox/143.0",
@@ -111,11 +123,11 @@ def random_skills(min_k=MIN_TAGS, max_k=MAX_TAGS) -> List[str]:
     k = random.randint(min_k, max_k)
     return random.sample(SKILLS, k=k)
 
-def make_payload(i: int) -> Dict:
+def make_payload(i: int, tail: Optional[str] = None) -> Dict:
     first = fake.first_name()
     last  = fake.last_name()
     handle = f"{slugify(first)}-{slugify(last)}"
-    tail   = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+    tail   = tail or "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
     email  = f"{handle}-{tail}@{EMAIL_DOMAIN}".lower()
 
     # EXACT keys/types your API sees from the form:
@@ -191,5 +203,75 @@ async def main():
     print(f"Created:         {ok}")
     print(f"Failed:          {COUNT - ok}")
 
+# ---------------- bulk mode ----------------
+def as_stored(payload: Dict, password_hash: str, now: datetime) -> Dict:
+    """the document POST /api/users would insert for this payload"""
+    return {
+        **payload,
+        "email": payload["email"].lower(),
+        "password": password_hash,
+        "matched": [],
+        "liked": [],
+        "passed": [],
+        "createdAt": now,
+        "updatedAt": now,
+    }
+
+def reserve_batch(coll, start: int, n: int, run: str) -> List[Dict]:
+    """
+    n payloads whose emails are unique by construction (run tag + index) and
+    checked against the collection once, instead of POST-and-retry on "exists"
+    """
+    payloads = [make_payload(i, tail=f"{run}{i:x}") for i in range(start, start + n)]
+    taken = {d["email"] for d in coll.find({"email": {"$in": [p["email"] for p in payloads]}}, {"email": 1})}
+    for p in payloads:
+        while p["email"] in taken:
+            at = p["email"].find("@")
+            suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=4))
+            p["email"] = p["email"][:at] + f"+{suffix}" + p["email"][at:]
+    return payloads
+
+def bulk_main(count: int = COUNT):
+    import bcrypt
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        print("❌ MONGODB_URI is missing. Set it in your .env")
+        return
+    coll = MongoClient(uri)[DB_NAME][USERS_COLL]
+    before = coll.estimated_document_count()
+
+    # every seeded user shares DEFAULT_PASS, so hash it once instead of per user
+    password_hash = bcrypt.hashpw(DEFAULT_PASS.encode(), bcrypt.gensalt(BCRYPT_COST)).decode()
+    run = "".join(random.choices(string.ascii_lowercase + string.digits, k=4))
+
+    t0 = time.perf_counter()
+    inserted = 0
+    pending = []
+    with ThreadPoolExecutor(max_workers=BULK_INFLIGHT) as pool:
+        for start in range(0, count, BULK_BATCH):
+            n = min(BULK_BATCH, count - start)
+            now = datetime.now(timezone.utc)
+            docs = [as_stored(p, password_hash, now) for p in reserve_batch(coll, start, n, run)]
+            pending.append(pool.submit(coll.insert_many, docs, ordered=False))
+            if len(pending) >= BULK_INFLIGHT:
+                inserted += len(pending.pop(0).result().inserted_ids)
+            done = start + n
+            rate = done / max(time.perf_counter() - t0, 1e-9)
+            print(f"[{done:>8d}/{count}] generated | {rate:,.0f} users/s")
+        for f in pending:
+            inserted += len(f.result().inserted_ids)
+    elapsed = time.perf_counter() - t0
+
+    print("\n==== Summary ====")
+    print(f"Inserted:        {inserted} in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} users/s)")
+    print(f"{USERS_COLL} count: {before} -> {coll.count_documents({})}")
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    if len(sys.argv) > 1 and sys.argv[1] == "bulk":
+        bulk_main(int(sys.argv[2]) if len(sys.argv) > 2 else COUNT)
+    else:
+        asyncio.run(main())
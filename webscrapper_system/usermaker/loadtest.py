@@ -0,0 +1,253 @@
+"""
+Load generator for POST /api/users.
+
+    open loop   : requests are scheduled at a fixed target rate whether or not
+                  earlier ones have finished, and latency is measured from the
+                  scheduled start, so a stalled server shows up as queueing
+                  delay instead of silently lowering the offered load.
+    closed loop : N virtual users, each sending its next request as soon as
+                  the previous one completes (throughput = what the server sustains).
+
+Latencies go into log-bucketed (HDR-style) histograms per status code, so
+p50/p95/p99/max stay accurate to ~1% without keeping every sample. A
+per-second timeline and a JSON results file are written at the end.
+
+    python loadtest.py --mode open --rps 200 --duration 30
+    python loadtest.py --mode closed --users 50 --duration 30 --out closed.json
+
+Run `python mock_api.py` first to test against a local stand-in instead of Next.js.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import string
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from fakeusers import BASE_URL, API_PATH, BROWSER_HEADERS, TIMEOUT_S, make_payload
+
+DURATION_S   = 30
+TARGET_RPS   = 100
+VUSERS       = 20
+MAX_INFLIGHT = 2000   # open loop: beyond this, scheduled requests are counted as dropped
+SIG_DIGITS   = 2      # histogram resolution: 10**-SIG_DIGITS relative error
+RESULTS_PATH = "loadtest_results.json"
+
+
+class LatencyHistogram:
+    """
+    log-linear buckets over microseconds: each power of two is split into
+    SUB linear sub-buckets, so relative error is bounded by 1/SUB
+    """
+    SUB = 2 ** math.ceil(math.log2(2 * 10 ** SIG_DIGITS))
+
+    def __init__(self):
+        self.counts: Dict[int, int] = defaultdict(int)
+        self.n = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, us: int) -> int:
+        if us < self.SUB:
+            return us
+        exp = us.bit_length() - self.SUB.bit_length()
+        return (exp + 1) * self.SUB + (us >> exp) - self.SUB
+
+    def _lower(self, idx: int) -> int:
+        if idx < self.SUB:
+            return idx
+        exp = idx // self.SUB - 1
+        return (self.SUB + idx % self.SUB) << exp
+
+    def record(self, seconds: float):
+        us = max(0, int(seconds * 1e6))
+        self.counts[self._index(us)] += 1
+        self.n += 1
+        self.total += us
+        self.max = max(self.max, us)
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, c in other.counts.items():
+            self.counts[i] += c
+        self.n += other.n
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """ms at percentile p (bucket lower bound, exact max at 100)"""
+        if not self.n:
+            return 0.0
+        if p >= 100:
+            return self.max / 1000
+        rank = math.ceil(p / 100 * self.n)
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= rank:
+                return min(self._lower(i), self.max) / 1000
+        return self.max / 1000
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.n,
+            "mean_ms": round(self.total / self.n / 1000, 3) if self.n else 0.0,
+            **{f"p{p}_ms": round(self.percentile(p), 3) for p in (50, 95, 99, 99.9)},
+            "max_ms": round(self.max / 1000, 3),
+        }
+
+    def to_dict(self) -> Dict:
+        """sparse buckets (lower bound in us -> count) for re-plotting / merging later"""
+        return {str(self._lower(i)): c for i, c in sorted(self.counts.items())}
+
+
+class Recorder:
+    def __init__(self):
+        self.by_status: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.timeline: Dict[int, Dict] = {}
+        self.dropped = 0
+        self.t0 = time.perf_counter()
+
+    def record(self, status, latency: float, done_at: float):
+        key = str(status)
+        self.by_status[key].record(latency)
+        sec = int(done_at - self.t0)
+        slot = self.timeline.get(sec)
+        if slot is None:
+            slot = self.timeline[sec] = {"hist": LatencyHistogram(), "status": defaultdict(int)}
+        slot["hist"].record(latency)
+        slot["status"][key] += 1
+
+    def overall(self) -> LatencyHistogram:
+        h = LatencyHistogram()
+        for part in self.by_status.values():
+            h.merge(part)
+        return h
+
+    def timeline_rows(self) -> List[Dict]:
+        return [
+            {"second": s, "completed": slot["hist"].n, "status": dict(slot["status"]),
+             "p50_ms": round(slot["hist"].percentile(50), 3), "p99_ms": round(slot["hist"].percentile(99), 3)}
+            for s, slot in sorted(self.timeline.items())
+        ]
+
+
+# --- requests ---
+RUN_TAG = "".join(random.choices(string.ascii_lowercase + string.digits, k=4))
+
+async def send_one(session: aiohttp.ClientSession, url: str, i: int, rec: Recorder, scheduled: Optional[float] = None):
+    """one POST; latency counts from `scheduled` when given (open loop), else from send"""
+    start = scheduled if scheduled is not None else time.perf_counter()
+    payload = make_payload(i, tail=f"lt{RUN_TAG}{i:x}")  # unique email: no "exists" retries skewing latency
+    try:
+        async with session.post(url, json=payload, headers=BROWSER_HEADERS) as resp:
+            await resp.read()
+            status = resp.status
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except aiohttp.ClientError as e:
+        status = type(e).__name__
+    now = time.perf_counter()
+    rec.record(status, now - start, now)
+
+async def open_loop(session, url, rps: float, duration: float, rec: Recorder):
+    interval = 1.0 / rps
+    inflight = set()
+    t0 = time.perf_counter()
+    i = 0
+    while True:
+        scheduled = t0 + i * interval
+        if scheduled - t0 >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(inflight) >= MAX_INFLIGHT:
+            rec.dropped += 1
+        else:
+            task = asyncio.create_task(send_one(session, url, i, rec, scheduled))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        i += 1
+    if inflight:
+        await asyncio.gather(*inflight)
+    return i
+
+async def closed_loop(session, url, users: int, duration: float, rec: Recorder):
+    deadline = time.perf_counter() + duration
+    counter = iter(range(10 ** 12))
+
+    async def vuser():
+        while time.perf_counter() < deadline:
+            await send_one(session, url, next(counter), rec)
+
+    await asyncio.gather(*[vuser() for _ in range(users)])
+    return next(counter)
+
+async def run(args) -> Dict:
+    url = f"{args.base_url.rstrip('/')}/{API_PATH.lstrip('/')}"
+    rec = Recorder()
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT_S)
+    connector = aiohttp.TCPConnector(limit=None, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        rec.t0 = time.perf_counter()
+        if args.mode == "open":
+            sent = await open_loop(session, url, args.rps, args.duration, rec)
+        else:
+            sent = await closed_loop(session, url, args.users, args.duration, rec)
+        elapsed = time.perf_counter() - rec.t0
+
+    total = rec.overall()
+    ok = sum(h.n for s, h in rec.by_status.items() if s in ("200", "201"))
+    return {
+        "config": {"mode": args.mode, "url": url, "duration_s": args.duration,
+                   "target_rps": args.rps if args.mode == "open" else None,
+                   "users": args.users if args.mode == "closed" else None},
+        "elapsed_s": round(elapsed, 3),
+        "scheduled": sent,
+        "completed": total.n,
+        "dropped": rec.dropped,
+        "ok": ok,
+        "throughput_rps": round(total.n / elapsed, 1) if elapsed else 0.0,
+        "ok_rps": round(ok / elapsed, 1) if elapsed else 0.0,
+        "latency": total.summary(),
+        "by_status": {s: {**h.summary(), "histogram_us": h.to_dict()} for s, h in sorted(rec.by_status.items())},
+        "timeline": rec.timeline_rows(),
+    }
+
+def print_report(res: Dict):
+    print("\n==== Load test ====")
+    cfg = res["config"]
+    load = f"{cfg['target_rps']} rps target" if cfg["mode"] == "open" else f"{cfg['users']} virtual users"
+    print(f"{cfg['mode']} loop, {load}, {res['elapsed_s']:.1f}s against {cfg['url']}")
+    print(f"completed {res['completed']} / scheduled {res['scheduled']} (dropped {res['dropped']}) | "
+          f"{res['throughput_rps']} rps, {res['ok_rps']} ok rps")
+    print(f"{'status':>10s} {'count':>8s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s}  (ms)")
+    rows = list(res["by_status"].items()) + [("all", res["latency"])]
+    for s, h in rows:
+        print(f"{s:>10s} {h['count']:8d} {h['p50_ms']:9.2f} {h['p95_ms']:9.2f} {h['p99_ms']:9.2f} {h['max_ms']:9.2f}")
+    print("\nper second: completed / p99 ms")
+    print("  " + " ".join(f"{t['completed']}/{t['p99_ms']:.0f}" for t in res["timeline"]))
+
+def main():
+    ap = argparse.ArgumentParser(description="load test POST /api/users")
+    ap.add_argument("--mode", choices=["open", "closed"], default="open")
+    ap.add_argument("--rps", type=float, default=TARGET_RPS, help="open loop: target request rate")
+    ap.add_argument("--users", type=int, default=VUSERS, help="closed loop: concurrent virtual users")
+    ap.add_argument("--duration", type=float, default=DURATION_S)
+    ap.add_argument("--base-url", default=BASE_URL)
+    ap.add_argument("--out", default=RESULTS_PATH)
+    args = ap.parse_args()
+
+    res = asyncio.run(run(args))
+    print_report(res)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(res, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Local stand-in for the Next.js user API, for running loadtest.py / fakeusers.py offline.
+
+POST /api/users behaves like src/app/api/users/route.ts: 400 on missing
+fields, 400 "User already exists" on a repeated email, else 201 with the
+created user (no password). Users are kept in memory. Service time is
+simulated: a fixed hash cost (bcrypt at cost 12 is ~200 ms of CPU on the
+real route) plus lognormal jitter, with at most WORKERS requests hashing
+at once so queueing shows up the way it does on a real server.
+
+It also stands in for randomuser.me for downloadImages.py: GET /api/?results=N
+returns N portrait URLs on this server, and GET /portraits/{n}.jpg serves
+the checked-in photos from public/images_dir. FAIL_RATE of portrait
+requests answer 503 so the downloader's retries get exercised.
+
+    python mock_api.py [PORT] [HASH_MS] [WORKERS] [FAIL_RATE]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+PORT     = 3000
+HASH_MS  = 5.0    # simulated password-hash time per request
+JITTER   = 0.5    # lognormal sigma applied to HASH_MS
+WORKERS  = 8      # concurrent "hashing" slots
+FAIL_RATE = 0.0   # share of portrait requests answered with 503
+PHOTO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "public", "images_dir")
+REQUIRED = ("firstname", "lastname", "email", "password", "state", "linkedin")
+
+
+def make_app(hash_ms=HASH_MS, workers=WORKERS, fail_rate=FAIL_RATE, photo_dir=PHOTO_DIR):
+    app = web.Application()
+    users = {}
+    slots = asyncio.Semaphore(workers)
+    stats = {"created": 0, "exists": 0, "invalid": 0, "portraits": 0, "portrait_errors": 0,
+             "started": time.time()}
+    photos = sorted(f for f in os.listdir(photo_dir) if f.endswith(".jpg")) if os.path.isdir(photo_dir) else []
+
+    async def create_user(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            stats["invalid"] += 1
+            return web.json_response({"error": "Invalid JSON"}, status=400)
+        if not all(body.get(f) for f in REQUIRED):
+            stats["invalid"] += 1
+            return web.json_response({"error": "Missing required fields"}, status=400)
+        email = body["email"].lower()
+        if email in users:
+            stats["exists"] += 1
+            return web.json_response({"error": "User already exists"}, status=400)
+
+        async with slots:
+            await asyncio.sleep(hash_ms * random.lognormvariate(0, JITTER) / 1000)
+        if email in users:  # lost the race while "hashing"
+            stats["exists"] += 1
+            return web.json_response({"error": "User already exists"}, status=400)
+
+        now = datetime.now(timezone.utc).isoformat()
+        user = {**body, "email": email, "matched": [], "liked": [], "passed": [],
+                "createdAt": now, "updatedAt": now}
+        user.pop("password", None)
+        users[email] = user
+        stats["created"] += 1
+        return web.json_response({"id": f"{len(users):024x}", **user}, status=201)
+
+    async def random_users(request):
+        n = int(request.query.get("results", 1))
+        base = f"{request.scheme}://{request.host}"
+        pics = [random.randrange(len(photos)) for _ in range(n)] if photos else []
+        return web.json_response({"results": [
+            {"picture": {"large": f"{base}/portraits/{i}.jpg", "medium": f"{base}/portraits/{i}.jpg",
+                         "thumbnail": f"{base}/portraits/{i}.jpg"}} for i in pics
+        ]})
+
+    async def portrait(request):
+        i = int(request.match_info["n"])
+        if not 0 <= i < len(photos):
+            raise web.HTTPNotFound()
+        if random.random() < fail_rate:
+            stats["portrait_errors"] += 1
+            raise web.HTTPServiceUnavailable()
+        stats["portraits"] += 1
+        return web.FileResponse(os.path.join(photo_dir, photos[i]))
+
+    async def get_stats(request):
+        return web.json_response({**stats, "users": len(users)})
+
+    app.router.add_post("/api/users", create_user)
+    app.router.add_get("/api/", random_users)
+    app.router.add_get(r"/portraits/{n:\d+}.jpg", portrait)
+    app.router.add_get("/_stats", get_stats)
+    return app
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    hash_ms = float(sys.argv[2]) if len(sys.argv) > 2 else HASH_MS
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else WORKERS
+    fail_rate = float(sys.argv[4]) if len(sys.argv) > 4 else FAIL_RATE
+    print(f"mock /api/users on :{port} (hash {hash_ms} ms, {workers} slots), "
+          f"/api/ portraits (fail rate {fail_rate})")
+    web.run_app(make_app(hash_ms, workers, fail_rate), port=port, print=None)
+
+if __name__ == "__main__":
+    main()